@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+scripts/analyze_query_log.py
+
+Offline query-log analysis: groups the aggregation queries in the query log
+(settings.QUERY_LOG_PATH, see src/execution/query_log.py) by table,
+grouping/filter columns and measures, and proposes a materialized view or
+summary table for each pattern that recurs, ranked by bytes scanned.
+
+Proposals are written as JSON for ingest_schema.py (config key
+summary_tables), which registers the summary tables that exist in the
+dataset so retrieval steers the generator to them.
+
+Inputs:
+  - config.yaml (with optional keys: query_log_path, bigquery_dataset, gcp_project)
+  - --log PATH: query log to read (default: query_log_path / QUERY_LOG_PATH)
+  - --min-queries N: minimum occurrences of a pattern
+  - --max-dimensions N: skip patterns with more grouping/filter columns
+  - --kind view|table: CREATE MATERIALIZED VIEW or CREATE OR REPLACE TABLE
+  - --output PATH: where to write the proposals (default: summary_tables.json)
+  - --apply: run the CREATE statements in BigQuery
+
+Outputs:
+  - Prints each proposal with its query count, bytes scanned and SQL.
+  - The proposals JSON file.
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import List
+
+import yaml
+
+def load_config(path: str = "config.yaml") -> dict:
+    """Load configuration from YAML, return empty dict if file not found."""
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return yaml.safe_load(f) or {}
+    return {}
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Propose summary tables from the query log.")
+    parser.add_argument("--log", default=None, help="Query log to analyze")
+    parser.add_argument("--min-queries", type=int, default=None,
+                        help="Minimum number of queries sharing a pattern")
+    parser.add_argument("--max-dimensions", type=int, default=None,
+                        help="Maximum grouping/filter columns of a summary table")
+    parser.add_argument("--kind", choices=["view", "table"], default="view",
+                        help="Create materialized views or summary tables")
+    parser.add_argument("--output", default="summary_tables.json",
+                        help="Where to write the proposals")
+    parser.add_argument("--apply", action="store_true",
+                        help="Create the proposed views/tables in BigQuery")
+    parser.add_argument("--config", default="config.yaml",
+                        help="Path to config.yaml")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+
+    # 1) Load config
+    cfg = load_config(args.config)
+    from src.config import settings
+    if "bigquery_dataset" in cfg:
+        settings.BIGQUERY_DATASET = cfg["bigquery_dataset"]
+    if "gcp_project" in cfg:
+        settings.GCP_PROJECT = cfg["gcp_project"]
+    log_path = args.log or cfg.get("query_log_path") or settings.QUERY_LOG_PATH
+    if not log_path or not os.path.exists(log_path):
+        sys.stderr.write(f"Query log '{log_path}' not found (set QUERY_LOG_PATH or --log).\n")
+        sys.exit(1)
+
+    # 2) Cluster logged queries into summary table proposals
+    from src.execution.query_log import read_query_log
+    from src.rag.summary_tables import propose_summary_tables
+    proposals = propose_summary_tables(
+        read_query_log(log_path),
+        min_queries=args.min_queries,
+        max_dimensions=args.max_dimensions,
+        kind=args.kind
+    )
+    if not proposals:
+        print("No recurring aggregation patterns found.")
+        return
+
+    for p in proposals:
+        print(f"\n{p['name']}: {p['queries']} queries, {p['bytes_processed'] / 1e9:.2f} GB scanned, {p['seconds']:.1f}s")
+        print(p["sql"])
+    with open(args.output, "w") as f:
+        json.dump(proposals, f, indent=2)
+    print(f"\n✅ Wrote {len(proposals)} proposals to {args.output}")
+
+    # 3) Optionally create them
+    if args.apply:
+        from src.execution.bigquery_client import get_client
+        client = get_client()
+        for p in proposals:
+            try:
+                client.query(p["sql"]).result()
+                print(f"✅ Created {p['name']}")
+            except Exception as e:
+                sys.stderr.write(f"Error creating {p['name']}: {e}\n")
+        print("Re-run ingest_schema.py with summary_tables set to register them.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+scripts/benchmark_vector_store.py
+
+Benchmarks query latency of the NumPy engine (src/store/numpy_store.py)
+against the LangChain FAISS wrapper on synthetic embeddings, so the
+embedding model is not part of the measurement.
+
+Inputs (CLI):
+  --docs N     number of schema docs (default: 3000)
+  --dim D      embedding dimension (default: 768)
+  --queries Q  number of queries (default: 500)
+  --k K        results per query (default: 5)
+
+Outputs:
+  - Prints mean per-query latency for single and batched search.
+"""
+
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from langchain.schema import Document
+
+from src.store.numpy_store import NumpyVectorStore
+
+
+def _timeit(fn, n: int) -> float:
+    """Return mean microseconds per query over n queries."""
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NumPy vs FAISS vector search.")
+    parser.add_argument("--docs", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.docs, args.dim)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    docs = [
+        Document(page_content=f"Table: t{i}\nColumns:\n- c ({i})", metadata={"table": f"t{i}"})
+        for i in range(args.docs)
+    ]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in ("float32", "float16"):
+            store = NumpyVectorStore(f"{tmp}/{dtype}", dtype=dtype)
+            store.add(docs, embeddings=vectors)
+            results[f"numpy[{dtype}] single"] = _timeit(
+                lambda: [store.similarity_search_by_vector(q, args.k) for q in queries], args.queries
+            )
+            results[f"numpy[{dtype}] batched"] = _timeit(
+                lambda: [store._to_documents(h) for h in store.search_by_vectors(queries, args.k)],
+                args.queries
+            )
+
+    try:
+        from langchain.vectorstores import FAISS
+        faiss_store = FAISS.from_embeddings(
+            list(zip([d.page_content for d in docs], vectors.tolist())),
+            embedding=None,
+            metadatas=[d.metadata for d in docs]
+        )
+        results["faiss (langchain) single"] = _timeit(
+            lambda: [faiss_store.similarity_search_by_vector(q.tolist(), args.k) for q in queries],
+            args.queries
+        )
+    except ImportError:
+        print("faiss not installed; skipping FAISS baseline")
+
+    print(f"docs={args.docs} dim={args.dim} queries={args.queries} k={args.k}")
+    for name, us in results.items():
+        print(f"  {name:28s} {us:10.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,33 @@
 scripts/ingest_schema.py
 
 Pulls BigQuery schemas, creates text docs, embeds them, and stores in a FAISS vector store.
+Also builds a join graph of the tables (declared keys, shared key columns,
+name heuristics) and saves it next to the vector store.
+
+Tables are streamed in batches with checkpoints (see src/ingestion/pipeline.py),
+so memory stays bounded and an interrupted run resumes where it stopped.
 
 Inputs:
  - config.yaml (with keys: gcp_project, bigquery_dataset, bigquery_credentials_path, embedding_model, vectorstore_path)
+   Optional: embed_workers: N to encode with N processes (-1 = one per core),
+   see src/embeddings/pool.py.
+   Optional: ingest_batch_size (tables per batch), checkpoint_dir
+   (default: <vectorstore_path>_ingest), resume: false to start over.
+   Optional: bigquery_datasets: [ds1, ds2, ...] to build one shard per
+   dataset under <vectorstore_path>/shards/ plus a router index, instead of
+   a single store for bigquery_dataset.
+   Optional: warm_cache: true to regenerate cached results for the most
+   frequent questions against the new schema once the store is saved.
+   Optional: summary_tables: path to the proposals written by
+   analyze_query_log.py; those present in the dataset are registered so
+   retrieval puts them ahead of the tables they summarize.
  - BigQuery credentials JSON, referenced by bigquery_credentials_path
 
 Output:
  - A FAISS vector store directory populated with schema embeddings.
+ - join_graph.json in the same directory.
+ - summary_tables.json in the same directory, if summary tables were registered.
+ - Per-stage throughput (fetch, text, embed, index) printed at the end.
 
 Note:
     Dependencies are listed in requirements.txt.
@@ -19,11 +39,11 @@ Note:
 
 import os
 import sys
+import json
 import yaml
 from src.config import settings
-from src.embedder import embed_texts
-from langchain.schema import Document
-from langchain.vectorstores import FAISS
+from src.ingestion.pipeline import run_ingestion
+from src.store.vector_store import LocalVectorStore, SHARDED_STORE_TYPES
 
 
 def load_config(path: str = "config.yaml") -> dict:
@@ -46,33 +66,55 @@ def apply_config(cfg: dict):
         settings.BIGQUERY_DATASET = cfg["bigquery_dataset"]
     if "embedding_model" in cfg:
         settings.EMBEDDING_MODEL = cfg["embedding_model"]
-
-
-def fetch_schemas(client, dataset_id: str) -> dict:
-    """Retrieve schema for each table in the dataset."""
-    schemas = {}
+    if "vector_store_type" in cfg:
+        settings.VECTOR_STORE_TYPE = cfg["vector_store_type"]
+    if "embed_workers" in cfg:
+        settings.EMBED_WORKERS = int(cfg["embed_workers"])
+    if "ingest_batch_size" in cfg:
+        settings.INGEST_BATCH_SIZE = int(cfg["ingest_batch_size"])
+
+
+def fetch_constraints(client, dataset_id: str) -> list:
+    """
+    Retrieve declared PRIMARY KEY / FOREIGN KEY columns for the dataset from
+    INFORMATION_SCHEMA. Returns an empty list if unavailable.
+    """
+    prefix = f"`{client.project}.{dataset_id}.INFORMATION_SCHEMA"
+    sql = f"""
+        SELECT
+          tc.constraint_type,
+          kcu.table_name,
+          kcu.column_name,
+          ccu.table_name AS ref_table,
+          ccu.column_name AS ref_column
+        FROM {prefix}.TABLE_CONSTRAINTS` AS tc
+        JOIN {prefix}.KEY_COLUMN_USAGE` AS kcu
+          USING (constraint_catalog, constraint_schema, constraint_name)
+        LEFT JOIN {prefix}.CONSTRAINT_COLUMN_USAGE` AS ccu
+          USING (constraint_catalog, constraint_schema, constraint_name)
+        WHERE tc.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY')
+    """
     try:
-        tables = client.list_tables(dataset_id)
+        return [dict(row.items()) for row in client.query(sql).result()]
     except Exception as e:
-        sys.stderr.write(f"Error listing tables for dataset '{dataset_id}': {e}\n")
-        return schemas
+        sys.stderr.write(f"Error fetching constraints for dataset '{dataset_id}': {e}\n")
+        return []
 
-    for table in tables:
-        full_ref = f"{dataset_id}.{table.table_id}"
-        try:
-            tbl = client.get_table(full_ref)
-            schemas[table.table_id] = tbl.schema
-        except Exception as e:
-            sys.stderr.write(f"Error fetching table '{full_ref}': {e}\n")
-    return schemas
+
+def load_summaries(path: str) -> list:
+    """Load summary table proposals written by analyze_query_log.py."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Error reading summary tables '{path}': {e}\n")
+        return []
 
 
-def schema_to_text(table_name: str, fields: list) -> str:
-    """Convert schema fields into a human-readable text document."""
-    lines = [f"Table: {table_name}", "Columns:"]
-    for field in fields:
-        lines.append(f"- {field.name} ({field.field_type})")
-    return "\n".join(lines)
+def print_report(report: dict):
+    """Print per-stage throughput of an ingestion run."""
+    for stage, st in report.items():
+        print(f"   {stage:6s} {st['items']:>8} items  {st['seconds']:>9.2f}s  {st['items_per_sec']:>9.1f}/s")
 
 
 def main(config_path: str = "config.yaml"):
@@ -90,29 +132,70 @@ def main(config_path: str = "config.yaml"):
         )
         return
 
-    # 3. Initialize BigQuery client and fetch schemas
+    # 3. Initialize BigQuery client
     client = bigquery.Client(project=settings.GCP_PROJECT)
-    schemas = fetch_schemas(client, settings.BIGQUERY_DATASET)
-    if not schemas:
-        sys.stderr.write(f"No schemas found for dataset '{settings.BIGQUERY_DATASET}'.\n")
-        return
-
-    # 4. Build Document objects and embed
-    docs = [
-        Document(page_content=schema_to_text(tbl, fields), metadata={"table": tbl})
-        for tbl, fields in schemas.items()
-    ]
-    texts = [d.page_content for d in docs]
-    embeddings = embed_texts(texts)
-
-    # 5. Prepare vector store
     vs_path = cfg.get("vectorstore_path", "./vector_store")
-    os.makedirs(vs_path, exist_ok=True)
-    embedding_fn = lambda txt: embed_texts([txt])[0]
-    store = FAISS.from_documents(docs, embedding=embedding_fn)
-    store.save_local(vs_path)
-
-    print(f"✅ Vector store built and saved to {vs_path}")
+    datasets = cfg.get("bigquery_datasets")
+    summaries = load_summaries(cfg["summary_tables"]) if cfg.get("summary_tables") else None
+
+    # 4. Stream tables through fetch -> text -> embed -> index in batches,
+    #    resuming from the last checkpoint of an interrupted run.
+    #    With bigquery_datasets, each dataset becomes its own shard.
+    if datasets:
+        store = LocalVectorStore(vs_path)
+        if store.store_type not in SHARDED_STORE_TYPES:
+            sys.stderr.write(
+                f"bigquery_datasets needs vector_store_type {' or '.join(SHARDED_STORE_TYPES)}, "
+                f"not '{store.store_type}'.\n"
+            )
+            return
+        checkpoint_root = cfg.get("checkpoint_dir") or f"{vs_path.rstrip(os.sep)}_ingest"
+        for dataset in datasets:
+            try:
+                report = run_ingestion(
+                    client,
+                    dataset,
+                    store.shard_path(dataset),
+                    constraints=fetch_constraints(client, dataset),
+                    checkpoint_dir=os.path.join(checkpoint_root, dataset),
+                    resume=cfg.get("resume", True),
+                    qualify_tables=True,
+                    summaries=summaries
+                )
+            except RuntimeError as e:
+                sys.stderr.write(f"Skipping dataset '{dataset}': {e}\n")
+                continue
+            print(f"✅ Shard '{dataset}' built and saved to {store.shard_path(dataset)}")
+            print_report(report)
+        try:
+            store.build_router()
+        except RuntimeError as e:
+            sys.stderr.write(f"{e}\n")
+            return
+        print(f"✅ Router index built for {len(store.shard_names())} shards")
+    else:
+        try:
+            report = run_ingestion(
+                client,
+                settings.BIGQUERY_DATASET,
+                vs_path,
+                constraints=fetch_constraints(client, settings.BIGQUERY_DATASET),
+                checkpoint_dir=cfg.get("checkpoint_dir"),
+                resume=cfg.get("resume", True),
+                summaries=summaries
+            )
+        except RuntimeError as e:
+            sys.stderr.write(f"{e}\n")
+            return
+        print(f"✅ Vector store built and saved to {vs_path}")
+        print_report(report)
+
+    # 5. Optionally pre-populate the cache for popular questions
+    if cfg.get("warm_cache"):
+        from src.cache.warmer import warm_cache
+        os.environ["VECTORSTORE_PATH"] = vs_path
+        stats = warm_cache(force=True, regenerate=True)
+        print(f"✅ Cache warmed: {stats['refreshed']} refreshed, {stats['failed']} failed")
 
 
 if __name__ == "__main__":
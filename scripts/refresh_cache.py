@@ -4,21 +4,35 @@
 """
 scripts/refresh_cache.py
 
-Invalidates (deletes) cache entries in Redis based on a key pattern.
+Invalidates (deletes) cache entries in Redis based on a key pattern, or only
+the entries that depend on specific tables.
 
 Inputs:
-  - config.yaml (with optional key: redis_url)
+  - config.yaml (with optional keys: redis_url, bigquery_dataset)
   - Optional CLI argument: key pattern (default: "query::*")
+  - --table NAME (repeatable): purge only cache entries whose SQL reads NAME,
+    given as dataset.table (a bare table name means one in bigquery_dataset)
+  - --scan-count N: keys requested per SCAN step (default: 1000)
+  - --batch-size N: keys removed per UNLINK round-trip (default: 500)
+  - --dry-run: only count matching keys
 
 Outputs:
-  - Prints the number of deleted cache keys.
+  - Prints the number of deleted (or matching, with --dry-run) cache keys.
+  - Publishes a flush on the cache invalidation channel so API workers clear
+    their in-process L1 cache.
 """
 
 import os
 import sys
+import argparse
+from typing import Iterable, List
+
 import yaml
 import redis
 
+from src.config import settings
+from src.cache.redis_cache import table_tag_key, publish_invalidation
+
 def load_config(path: str = "config.yaml") -> dict:
     """Load configuration from YAML, return empty dict if file not found."""
     if os.path.exists(path):
@@ -32,15 +46,75 @@ def apply_config(cfg: dict):
         os.environ["REDIS_URL"] = cfg["redis_url"]
     if "cache_ttl" in cfg:
         os.environ["CACHE_TTL"] = str(cfg["cache_ttl"])
+    if "bigquery_dataset" in cfg:
+        settings.BIGQUERY_DATASET = cfg["bigquery_dataset"]
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Invalidate cached query results in Redis.")
+    parser.add_argument("pattern", nargs="?", default="query::*",
+                        help="Key pattern to purge (ignored when --table is given)")
+    parser.add_argument("--table", action="append", default=[],
+                        help="Purge only entries that read this dataset.table (repeatable)")
+    parser.add_argument("--scan-count", type=int, default=1000,
+                        help="Keys requested per SCAN step")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Keys removed per UNLINK round-trip")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Count matching keys without deleting them")
+    parser.add_argument("--config", default="config.yaml",
+                        help="Path to config.yaml")
+    return parser.parse_args(argv)
+
+def unlink_in_batches(client: redis.Redis, keys: Iterable, batch_size: int) -> int:
+    """
+    Remove keys with non-blocking UNLINK, sending batch_size keys per
+    pipelined round-trip. Returns the number of keys removed.
+    """
+    removed = 0
+    batch = []
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        batch.append(key)
+        if len(batch) >= batch_size:
+            pipe.unlink(*batch)
+            removed += sum(pipe.execute())
+            batch = []
+    if batch:
+        pipe.unlink(*batch)
+        removed += sum(pipe.execute())
+    return removed
+
+def purge_pattern(client: redis.Redis, pattern: str, scan_count: int,
+                  batch_size: int, dry_run: bool) -> int:
+    """Purge (or count) every key matching pattern."""
+    keys = client.scan_iter(match=pattern, count=scan_count)
+    if dry_run:
+        return sum(1 for _ in keys)
+    return unlink_in_batches(client, keys, batch_size)
+
+def purge_tables(client: redis.Redis, tables: List[str], scan_count: int,
+                 batch_size: int, dry_run: bool) -> int:
+    """Purge (or count) the cache entries tagged with any of the given tables."""
+    total = 0
+    for table in tables:
+        tag = table_tag_key(table)
+        if dry_run:
+            total += client.scard(tag)
+            continue
+        members = client.sscan_iter(tag, count=scan_count)
+        total += unlink_in_batches(client, members, batch_size)
+        client.unlink(tag)
+    return total
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
 
-def main():
     # 1) Load config and apply
-    cfg = load_config()
+    cfg = load_config(args.config)
     apply_config(cfg)
 
-    # 2) Determine Redis URL and pattern
+    # 2) Determine Redis URL
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-    pattern = sys.argv[1] if len(sys.argv) > 1 else "query::*"
 
     # 3) Connect to Redis
     try:
@@ -50,16 +124,22 @@ def main():
         sys.stderr.write(f"Error connecting to Redis at {redis_url}: {e}\n")
         sys.exit(1)
 
-    # 4) Scan and delete matching keys
-    deleted = 0
-    for key in client.scan_iter(match=pattern):
-        try:
-            client.delete(key)
-            deleted += 1
-        except Exception as e:
-            sys.stderr.write(f"Error deleting key {key}: {e}\n")
+    # 4) Scan and unlink matching keys
+    verb = "Found" if args.dry_run else "Deleted"
+    try:
+        if args.table:
+            count = purge_tables(client, args.table, args.scan_count, args.batch_size, args.dry_run)
+            print(f"✅ {verb} {count} keys depending on tables {', '.join(args.table)}")
+        else:
+            count = purge_pattern(client, args.pattern, args.scan_count, args.batch_size, args.dry_run)
+            print(f"✅ {verb} {count} keys matching pattern '{args.pattern}'")
+    except redis.RedisError as e:
+        sys.stderr.write(f"Error invalidating cache: {e}\n")
+        sys.exit(1)
 
-    print(f"✅ Deleted {deleted} keys matching pattern '{pattern}'")
+    # 5) Tell API workers to drop their in-process (L1) copies
+    if not args.dry_run and count:
+        publish_invalidation(client=client)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+scripts/warm_cache.py
+
+Refresh-ahead cache warmer: re-executes the SQL of the most frequently asked
+questions whose cached results are missing or about to expire. Intended to
+run on a schedule (e.g. cron every few minutes) alongside refresh_cache.py.
+
+Inputs:
+  - config.yaml (with optional keys: redis_url, cache_ttl)
+  - --top-n N: number of most frequent questions to consider
+  - --threshold SECONDS: refresh entries expiring within this many seconds
+  - --force: refresh every top question regardless of TTL
+  - --regenerate: re-run retrieval and SQL generation (use after re-ingestion)
+
+Outputs:
+  - Prints how many questions were checked, refreshed and failed.
+"""
+
+import os
+import sys
+import argparse
+from typing import List
+
+import yaml
+
+def load_config(path: str = "config.yaml") -> dict:
+    """Load configuration from YAML, return empty dict if file not found."""
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return yaml.safe_load(f)
+    return {}
+
+def apply_config(cfg: dict):
+    """Set environment variables for Redis connection if provided."""
+    if "redis_url" in cfg:
+        os.environ["REDIS_URL"] = cfg["redis_url"]
+    if "cache_ttl" in cfg:
+        os.environ["CACHE_TTL"] = str(cfg["cache_ttl"])
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Refresh cached results for frequent questions.")
+    parser.add_argument("--top-n", type=int, default=None,
+                        help="Number of most frequent questions to consider")
+    parser.add_argument("--threshold", type=int, default=None,
+                        help="Refresh entries expiring within this many seconds")
+    parser.add_argument("--force", action="store_true",
+                        help="Refresh every top question regardless of TTL")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="Regenerate SQL from the current schema index")
+    parser.add_argument("--config", default="config.yaml",
+                        help="Path to config.yaml")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+
+    # 1) Load config and apply (before the cache module reads the environment)
+    cfg = load_config(args.config)
+    apply_config(cfg)
+
+    from src.cache import redis_cache
+    from src.cache.warmer import warm_cache
+
+    # 2) Connect to Redis
+    if redis_cache.init_client() is None or not redis_cache.is_available():
+        sys.stderr.write(f"Error connecting to Redis at {redis_cache.REDIS_URL}\n")
+        sys.exit(1)
+
+    # 3) Warm the cache
+    stats = warm_cache(
+        top_n=args.top_n,
+        ttl_threshold=args.threshold,
+        force=args.force,
+        regenerate=args.regenerate
+    )
+    print(f"✅ Checked {stats['checked']} questions, refreshed {stats['refreshed']}, failed {stats['failed']}")
+
+if __name__ == "__main__":
+    main()
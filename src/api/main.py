@@ -1,10 +1,20 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import APIKeyHeader
-import uvicorn
 
 from src.config import settings
 from src.api.routes import router
+from src.api.warmup import run_warmup
+from src.api import profiling
+from src.execution import jobs, bigquery_client
+from src.cache import redis_cache, warmer
+
+logger = logging.getLogger(__name__)
 
 # Define API key header auth
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
@@ -21,11 +31,47 @@ async def verify_api_key(api_key: str = Depends(api_key_header)):
         )
     return api_key
 
+async def verify_admin(request: Request):
+    """
+    Require header 'X-Admin-Token' to match settings.ADMIN_TOKEN.
+    """
+    if not profiling.is_admin(request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or missing admin token"
+        )
+
+async def _warm_up(app: FastAPI):
+    # Runs off the event loop so /healthz keeps answering while we warm up
+    app.state.warmup = await asyncio.to_thread(run_warmup)
+    app.state.ready = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create network clients and start the warm-up on startup; release them on shutdown.
+    Nothing connects to Redis or BigQuery at import time.
+    """
+    app.state.ready = False
+    app.state.warmup = {}
+    await asyncio.to_thread(redis_cache.init_client)
+    redis_cache.start_invalidation_listener()
+    warmer.start_background_warmer()
+    warmup_task = asyncio.create_task(_warm_up(app))
+    yield
+    warmup_task.cancel()
+    warmer.stop_background_warmer()
+    await asyncio.to_thread(profiling.flush_sampled)
+    jobs.shutdown(wait=False)
+    redis_cache.close_client()
+    bigquery_client.close_client()
+
 # Instantiate FastAPI app
 app = FastAPI(
     title="Text2SQL API",
     description="Natural-language to BigQuery SQL service",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS middleware: allow origins provided in settings.CORS_ALLOW_ORIGINS (comma-separated)
@@ -38,6 +84,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (on demand for admins, or 1-in-N sampled).
+# Registered before the rate limiter so it runs inside it: the last
+# middleware registered is the outermost.
+app.middleware("http")(profiling.profiling_middleware)
+
 # Rate-limiting placeholder (implement as needed)
 @app.middleware("http")
 async def rate_limit_middleware(request, call_next):
@@ -53,19 +104,42 @@ app.include_router(
     tags=["query"]
 )
 
-# Startup event: initialize resources (e.g., database, cache, model)
-@app.on_event("startup")
-async def on_startup():
-    # e.g. initialize Redis client or load vector index
-    pass
+# Liveness probe: the process is up
+@app.get("/healthz", tags=["health"])
+async def healthz():
+    return {"status": "ok"}
 
-# Shutdown event: clean up resources
-@app.on_event("shutdown")
-async def on_shutdown():
-    # e.g. close DB or cache connections
-    pass
+# Readiness probe: fails until the warm-up phase has finished
+@app.get("/readyz", tags=["health"])
+async def readyz():
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Warming up"
+        )
+    return {"status": "ready", "warmup": app.state.warmup}
+
+# Cache metrics: Redis circuit breaker state, pool usage, L1 hit rates and
+# BigQuery result-cache (use_query_cache) hits
+@app.get("/metrics/cache", tags=["health"])
+async def cache_metrics():
+    stats = redis_cache.cache_stats()
+    stats["bigquery"] = bigquery_client.query_stats()
+    return stats
+
+# Download a profile recorded with the X-Profile header / ?profile= parameter
+@app.get("/admin/profiles/{profile_id}", tags=["admin"], dependencies=[Depends(verify_admin)])
+async def get_profile(profile_id: str):
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown profile '{profile_id}'"
+        )
+    return FileResponse(path)
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(
         "src.api.main:app",
         host=getattr(settings, "API_HOST", "0.0.0.0"),
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+src/api/profiling.py
+
+Opt-in sampling profiler for /query requests (pyinstrument, optional
+dependency: pip install pyinstrument).
+
+Two modes:
+  - On demand: a request with header "X-Profile: speedscope|html" or query
+    parameter ?profile=speedscope|html, plus header "X-Admin-Token" matching
+    settings.ADMIN_TOKEN, runs under the profiler. The profile is written to
+    settings.PROFILE_DIR and its id returned in the "X-Profile-Id" response
+    header; fetch it from GET /admin/profiles/{id}.
+  - Sampled: with settings.PROFILE_SAMPLE_RATE = N > 0, every N-th /query
+    request is profiled. Sessions are merged in memory and written to
+    PROFILE_DIR as one speedscope file per settings.PROFILE_FLUSH_EVERY
+    samples (and at shutdown).
+
+Only the newest settings.PROFILE_MAX_FILES files are kept in PROFILE_DIR.
+
+Speedscope files open at https://www.speedscope.app; HTML profiles open in a browser.
+"""
+
+import os
+import time
+import asyncio
+import uuid
+import logging
+import threading
+from typing import Optional
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAM = "profile"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILED_PATH_PREFIX = "/query"
+
+# Output format -> file extension
+FORMATS = {"speedscope": "speedscope.json", "html": "html"}
+
+_lock = threading.Lock()
+_request_count = 0
+_aggregate = None
+_aggregate_samples = 0
+
+
+def _render(session, fmt: str) -> str:
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+    renderer = SpeedscopeRenderer() if fmt == "speedscope" else HTMLRenderer()
+    return renderer.render(session)
+
+
+def _prune(keep: str) -> None:
+    # Delete the oldest profiles beyond PROFILE_MAX_FILES, never the one just written
+    limit = settings.PROFILE_MAX_FILES
+    if limit <= 0:
+        return
+    try:
+        entries = [e for e in os.scandir(settings.PROFILE_DIR) if e.is_file() and e.path != keep]
+        entries.sort(key=lambda e: e.stat().st_mtime_ns)
+    except OSError as e:
+        logger.error(f"Error listing profiles in {settings.PROFILE_DIR}: {e}")
+        return
+    for entry in entries[:max(0, len(entries) - (limit - 1))]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _write(name: str, content: str) -> str:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DIR, name)
+    with open(path, "w") as f:
+        f.write(content)
+    _prune(path)
+    return path
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """
+    Path of a stored on-demand profile, or None if there is none.
+    """
+    # Ids are hex; anything else could escape PROFILE_DIR
+    if not profile_id.isalnum():
+        return None
+    for ext in FORMATS.values():
+        path = os.path.join(settings.PROFILE_DIR, f"{profile_id}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def is_admin(request: Request) -> bool:
+    token = settings.ADMIN_TOKEN
+    return bool(token) and request.headers.get(ADMIN_TOKEN_HEADER) == token
+
+
+def _requested_format(request: Request) -> Optional[str]:
+    value = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_PARAM)
+    if value is None:
+        return None
+    return value.lower() if value.lower() in FORMATS else "speedscope"
+
+
+def _should_sample() -> bool:
+    global _request_count
+    rate = settings.PROFILE_SAMPLE_RATE
+    if rate <= 0:
+        return False
+    with _lock:
+        _request_count += 1
+        return _request_count % rate == 0
+
+
+def _add_sample(session) -> None:
+    global _aggregate, _aggregate_samples
+    from pyinstrument.session import Session
+    with _lock:
+        _aggregate = session if _aggregate is None else Session.combine(_aggregate, session)
+        _aggregate_samples += 1
+        if _aggregate_samples < settings.PROFILE_FLUSH_EVERY:
+            return
+    flush_sampled()
+
+
+def flush_sampled() -> Optional[str]:
+    """
+    Write the merged sampled profiles to disk and start a new aggregate.
+    Returns the file path, or None if nothing was sampled.
+    """
+    global _aggregate, _aggregate_samples
+    with _lock:
+        session, samples = _aggregate, _aggregate_samples
+        _aggregate, _aggregate_samples = None, 0
+    if session is None:
+        return None
+    name = f"sampled-{os.getpid()}-{int(time.time())}-{samples}req.speedscope.json"
+    try:
+        path = _write(name, _render(session, "speedscope"))
+    except Exception as e:
+        logger.error(f"Error writing sampled profile: {e}")
+        return None
+    logger.info(f"Wrote aggregated profile of {samples} requests to {path}")
+    return path
+
+
+async def profiling_middleware(request: Request, call_next):
+    """
+    Run /query requests under the profiler when asked for (admin only) or sampled.
+    """
+    if not request.url.path.startswith(PROFILED_PATH_PREFIX):
+        return await call_next(request)
+
+    fmt = _requested_format(request)
+    if fmt is not None and not is_admin(request):
+        return JSONResponse(
+            status_code=status.HTTP_403_FORBIDDEN,
+            content={"detail": "Profiling requires a valid admin token"}
+        )
+    sampled = fmt is None and _should_sample()
+    if fmt is None and not sampled:
+        return await call_next(request)
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("Profiling requested but pyinstrument is not installed")
+        return await call_next(request)
+
+    profiler = Profiler(interval=settings.PROFILE_INTERVAL, async_mode="enabled")
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        session = profiler.stop()
+
+    # Merging, rendering and writing profiles run off the event loop
+    if sampled:
+        await asyncio.to_thread(_add_sample, session)
+        return response
+
+    profile_id = uuid.uuid4().hex
+    try:
+        await asyncio.to_thread(lambda: _write(f"{profile_id}.{FORMATS[fmt]}", _render(session, fmt)))
+        response.headers[PROFILE_ID_HEADER] = profile_id
+    except Exception as e:
+        logger.error(f"Error writing profile {profile_id}: {e}")
+    return response
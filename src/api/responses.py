@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+src/api/responses.py
+
+Response classes for the API.
+"""
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from src.utils.serialization import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with the fast encoder in src.utils.serialization.
+    Returning it from an endpoint skips response_model validation, so the
+    content must already match the documented schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
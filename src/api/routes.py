@@ -2,39 +2,117 @@
 
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 
 from src.rag.retriever import retrieve_schema_docs
 from src.rag.generator import generate_sql
 from src.utils.validation import validate_sql
+from src.utils.sql_preview import to_preview_sql
 from src.execution.bigquery_client import run_query
-from src.cache.redis_cache import get_cache, set_cache
+from src.execution.jobs import submit_job, get_job, get_job_page, JOB_DONE, JOB_PENDING
+from src.cache.redis_cache import get_query_result, cache_query_result, query_cache_key, record_question
+from src.utils.serialization import dataframe_to_records
+from src.api.responses import FastJSONResponse
 
 router = APIRouter()
 
 class QueryRequest(BaseModel):
     question: str
     user_id: Optional[str] = None
+    # Dataset/tenant shard to search; the router picks shards when omitted
+    dataset: Optional[str] = None
+    # Return a job id right after validation instead of waiting for results
+    async_mode: bool = False
+    # Run a cheap approximate version of the query (sampled tables,
+    # approximate aggregates); resend with preview=False to get exact results
+    preview: bool = False
 
 class QueryResponse(BaseModel):
     sql: str
-    data: List[Any]
+    data: List[Any] = []
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+    # Set when a result budget (rows/bytes/columns) cut the result short
+    truncated: bool = False
+    truncation: Optional[Dict[str, Any]] = None
+    # Set for preview results; preview holds the sample info and exact SQL
+    approximate: bool = False
+    preview: Optional[Dict[str, Any]] = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    progress: float
+    sql: str
+    total_rows: Optional[int] = None
+    page: int = 0
+    num_pages: int = 0
+    data: List[Any] = []
+    truncation: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    approximate: bool = False
+    preview: Optional[Dict[str, Any]] = None
+
+def _query_response(
+    sql: str,
+    data: List[Any],
+    truncation: Optional[Dict[str, Any]] = None,
+    job_id: Optional[str] = None,
+    job_status: Optional[str] = None,
+    status_code: int = status.HTTP_200_OK,
+    preview: Optional[Dict[str, Any]] = None
+) -> FastJSONResponse:
+    """
+    Build a QueryResponse-shaped payload and encode it directly, skipping
+    per-row pydantic validation of `data`.
+    """
+    content = {
+        "sql": sql,
+        "data": data,
+        "job_id": job_id,
+        "status": job_status,
+        "truncated": bool(truncation and truncation["truncated"]),
+        "truncation": truncation,
+        "approximate": bool(preview and preview["approximate"]),
+        "preview": preview,
+    }
+    return FastJSONResponse(content=content, status_code=status_code)
 
 @router.post("/", response_model=QueryResponse)
-async def query_endpoint(payload: QueryRequest):
+def query_endpoint(payload: QueryRequest):
     # Build cache key (you can customize hashing if needed)
-    cache_key = f"query::{payload.question}"
+    cache_key = query_cache_key(payload.question, payload.dataset, preview=payload.preview)
 
     # 1) Check cache
-    cached = get_cache(cache_key)
+    cached = get_query_result(cache_key)
     if cached:
-        return QueryResponse(sql=cached["sql"], data=cached["data"])
+        if not payload.dataset:
+            record_question(payload.question)
+        return _query_response(
+            cached["sql"], cached["data"], cached.get("truncation"), preview=cached.get("preview")
+        )
 
-    # 2) Retrieve relevant schema docs
-    docs = retrieve_schema_docs(payload.question)
+    # Promoting a preview to an exact run reuses the SQL generated for it
+    sql = None
+    if not payload.preview:
+        preview_hit = get_query_result(query_cache_key(payload.question, payload.dataset, preview=True))
+        if preview_hit and preview_hit.get("preview"):
+            sql = preview_hit["preview"]["exact_sql"]
 
-    # 3) Generate SQL via RAG
-    sql = generate_sql(docs, payload.question)
+    if sql is None:
+        # 2) Retrieve relevant schema docs
+        try:
+            docs = retrieve_schema_docs(payload.question, dataset=payload.dataset)
+        except KeyError:
+            if not payload.dataset:
+                raise
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Unknown dataset '{payload.dataset}'"
+            )
+
+        # 3) Generate SQL via RAG
+        sql = generate_sql(docs, payload.question)
 
     # 4) Validate SQL safety (only SELECT, LIMIT, etc.)
     is_valid, err_msg = validate_sql(sql)
@@ -44,6 +122,35 @@ async def query_endpoint(payload: QueryRequest):
             detail=f"SQL validation failed: {err_msg}"
         )
 
+    # Track popularity so the cache warmer can keep frequent questions fresh
+    # (the warmer re-runs questions unscoped, so dataset-scoped ones are not tracked)
+    if not payload.dataset:
+        record_question(payload.question, sql)
+
+    # 4a) Preview mode: run the approximate rewrite, validated like any other SQL
+    preview = None
+    if payload.preview:
+        preview_sql, info = to_preview_sql(sql)
+        is_valid, err_msg = validate_sql(preview_sql)
+        if not is_valid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Preview SQL validation failed: {err_msg}"
+            )
+        preview = {**info, "exact_sql": sql}
+        sql = preview_sql
+
+    # 5a) Async mode: hand off to the background executor
+    if payload.async_mode:
+        job_id = submit_job(sql, cache_key=cache_key, preview=preview)
+        return _query_response(
+            sql, [],
+            job_id=job_id,
+            job_status=JOB_PENDING,
+            status_code=status.HTTP_202_ACCEPTED,
+            preview=preview
+        )
+
     # 5) Execute SQL against BigQuery
     try:
         df = run_query(sql)
@@ -54,9 +161,40 @@ async def query_endpoint(payload: QueryRequest):
         )
 
     # Convert DataFrame to list of records
-    data = df.to_dict(orient="records")
+    data = dataframe_to_records(df)
+    truncation = df.attrs.get("truncation")
 
     # 6) Cache the result
-    set_cache(cache_key, {"sql": sql, "data": data})
+    cache_query_result(
+        cache_key, sql, data, truncation, query_stats=df.attrs.get("query_stats"), preview=preview
+    )
+
+    return _query_response(sql, data, truncation, preview=preview)
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def job_endpoint(job_id: str, page: int = 0):
+    """
+    Return status, progress and one page of results for a background query job.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown or expired job '{job_id}'"
+        )
 
-    return QueryResponse(sql=sql, data=data)
\ No newline at end of file
+    data = get_job_page(job_id, page) if job["status"] == JOB_DONE else []
+    return FastJSONResponse(content={
+        "job_id": job_id,
+        "status": job["status"],
+        "progress": job.get("progress", 0.0),
+        "sql": job["sql"],
+        "total_rows": job.get("total_rows"),
+        "page": page,
+        "num_pages": job.get("num_pages", 0),
+        "data": data,
+        "truncation": job.get("truncation"),
+        "error": job.get("error"),
+        "approximate": bool(job.get("preview") and job["preview"]["approximate"]),
+        "preview": job.get("preview"),
+    })
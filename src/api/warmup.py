@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+src/api/warmup.py
+
+Warm-up phase run at API startup, before the readiness probe passes, so
+the first user request does not pay for imports, model loading or index
+loading.
+
+Steps are selected with settings.WARMUP_STEPS (comma-separated):
+  - index:      load the vector store into memory
+  - embeddings: import and initialize the embedding model
+  - search:     run a dummy retrieval end-to-end
+  - dry_run:    run a BigQuery dry run to create the client and check credentials
+"""
+
+import os
+import time
+import logging
+from typing import Callable, Dict
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_index() -> None:
+    from src.rag.retriever import is_sharded, load_sharded_store, load_store
+    vs_path = os.getenv("VECTORSTORE_PATH", "./vector_store")
+    if is_sharded(vs_path):
+        # Load the router only; shards load on demand
+        store = load_sharded_store(vs_path)
+        store.route(store.embedding_fn(["warm-up query"])[0])
+    else:
+        load_store(vs_path)
+
+
+def _warm_embeddings() -> None:
+    from src.embeddings.embedder import load_embedding_model
+    load_embedding_model()
+
+
+def _warm_search() -> None:
+    from src.rag.retriever import retrieve_schema_docs
+    retrieve_schema_docs("warm-up query", top_k=1)
+
+
+def _warm_dry_run() -> None:
+    from src.execution.bigquery_client import dry_run
+    dry_run("SELECT 1")
+
+
+WARMUP_STEPS: Dict[str, Callable[[], None]] = {
+    "index": _warm_index,
+    "embeddings": _warm_embeddings,
+    "search": _warm_search,
+    "dry_run": _warm_dry_run,
+}
+
+
+def run_warmup() -> Dict[str, str]:
+    """
+    Run the configured warm-up steps in order.
+    A failing step is logged and does not stop the others.
+    Returns a mapping of step name to "ok (<seconds>s)" or the error message.
+    """
+    results: Dict[str, str] = {}
+    steps = [s.strip() for s in settings.WARMUP_STEPS.split(",") if s.strip()]
+    for name in steps:
+        step = WARMUP_STEPS.get(name)
+        if step is None:
+            logger.warning(f"Unknown warm-up step '{name}', skipping")
+            continue
+        start = time.perf_counter()
+        try:
+            step()
+            results[name] = f"ok ({time.perf_counter() - start:.2f}s)"
+        except Exception as e:
+            logger.warning(f"Warm-up step '{name}' failed: {e}")
+            results[name] = f"failed: {e}"
+    logger.info(f"Warm-up finished: {results}")
+    return results
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+src/cache/freshness.py
+
+Freshness checks for cached query results, keyed on BigQuery table
+modification times.
+
+When settings.CACHE_FRESHNESS is on, a cached result records the tables its
+query job read (the job's referenced_tables) with their last-modified times.
+On lookup the entry is served only if none of those tables changed since, so
+results can be cached for a long TTL (settings.FRESHNESS_CACHE_TTL) and still
+be dropped as soon as their data changes.
+
+Table metadata is read with one batch of concurrent metadata calls and kept
+in-process for settings.FRESHNESS_CHECK_TTL seconds, so a burst of lookups
+costs at most one round of metadata calls.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# table -> (checked_at, modified) from the last metadata check
+_checked: Dict[str, Tuple[float, Optional[float]]] = {}
+_checked_lock = threading.Lock()
+
+
+def clear() -> None:
+    """
+    Forget all cached table metadata.
+    """
+    with _checked_lock:
+        _checked.clear()
+
+
+def modified_times(tables: List[str]) -> Dict[str, Optional[float]]:
+    """
+    Last-modified time (epoch seconds, or None if unknown) of each table,
+    using metadata fetched within the last FRESHNESS_CHECK_TTL seconds when
+    available and one batched check for the rest.
+    """
+    now = time.monotonic()
+    result: Dict[str, Optional[float]] = {}
+    missing = []
+    with _checked_lock:
+        for table in tables:
+            entry = _checked.get(table)
+            if entry is not None and now - entry[0] < settings.FRESHNESS_CHECK_TTL:
+                result[table] = entry[1]
+            else:
+                missing.append(table)
+    if not missing:
+        return result
+
+    from src.execution.bigquery_client import get_table_modified_times
+    try:
+        fetched = get_table_modified_times(missing)
+    except Exception as e:
+        logger.error(f"Error checking table metadata for {missing}: {e}")
+        fetched = {}
+    with _checked_lock:
+        for table in missing:
+            modified = fetched.get(table)
+            # Only remember successful checks; failures are retried next time
+            if modified is not None:
+                _checked[table] = (now, modified)
+            result[table] = modified
+    return result
+
+
+def snapshot(query_stats: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """
+    Map each table referenced by a finished query job to its modified time.
+    Returns None if the tables are unknown, a table's metadata could not be
+    read, or a table changed after the job started (the result may already
+    be out of date).
+    """
+    if not query_stats or not query_stats.get("referenced_tables"):
+        return None
+    times = modified_times(query_stats["referenced_tables"])
+    started_at = query_stats.get("started_at")
+    if any(t is None for t in times.values()):
+        return None
+    if started_at is not None and any(t > started_at for t in times.values()):
+        return None
+    return times
+
+
+def is_fresh(tables_modified: Dict[str, float]) -> bool:
+    """
+    True if none of the tables changed since their recorded modified time.
+    A table whose metadata cannot be read counts as changed.
+    """
+    current = modified_times(list(tables_modified))
+    return all(
+        current.get(table) is not None and current[table] <= recorded
+        for table, recorded in tables_modified.items()
+    )
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+src/cache/local_cache.py
+
+Bounded in-process LRU cache with per-entry TTL, used as the L1 tier in
+front of Redis. Capacity is measured in bytes of serialized payload.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class LocalLRUCache:
+    """
+    Thread-safe LRU cache. Each entry records its size in bytes (the length
+    of its serialized form) and an expiry time; least recently used entries
+    are evicted once max_bytes is exceeded.
+    """
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires_at, size, value)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[int] = None) -> None:
+        """
+        Store a value of the given size (bytes). Values larger than the whole
+        cache are not stored.
+        """
+        if size > self.max_bytes:
+            self.delete(key)
+            return
+        expires_at = time.monotonic() + min(ttl or self.ttl, self.ttl)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires_at, size, value)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        # Caller must hold the lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
@@ -5,15 +5,31 @@
 src/cache/redis_cache.py
 
 Simple Redis-backed cache for query results.
+
+The Redis client is created by init_client(), called from the API lifespan
+(or lazily on first use elsewhere), never at import time. It uses a sized
+connection pool with tight timeouts and reconnects automatically; a circuit
+breaker skips Redis entirely for a cooldown after repeated failures, so a
+degraded Redis turns into fast cache misses instead of slow requests.
+
+Hot keys are also held in a bounded in-process L1 cache (see
+src/cache/local_cache.py). Writes publish the key on a Redis pub/sub
+channel so other workers drop their stale L1 copy.
 """
 
 import os
-import json
+import time
+import uuid
 import logging
-from typing import Optional, Any
+import threading
+from typing import Optional, Any, Dict, Iterable, List, Tuple
 
 import redis
 
+from src.cache.circuit_breaker import CircuitBreaker, OPEN
+from src.cache.local_cache import LocalLRUCache
+from src.utils.serialization import dumps, loads
+
 # Initialize logger
 logger = logging.getLogger(__name__)
 
@@ -21,37 +37,532 @@ logger = logging.getLogger(__name__)
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # default TTL: 1 hour
 
-# Create Redis client
-try:
-    _redis_client = redis.Redis.from_url(REDIS_URL)
-    _redis_client.ping()
-except Exception as e:
-    logger.error(f"Error connecting to Redis at {REDIS_URL}: {e}")
+# Connection pool and timeouts (seconds)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "0.05"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.2"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.2"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# Circuit breaker: open after N consecutive failures, retry after cooldown
+REDIS_BREAKER_THRESHOLD = int(os.getenv("REDIS_BREAKER_THRESHOLD", "5"))
+REDIS_BREAKER_COOLDOWN = float(os.getenv("REDIS_BREAKER_COOLDOWN", "30"))
+
+# Errors that indicate Redis itself is unhealthy (and count against the breaker)
+_REDIS_ERRORS = (redis.ConnectionError, redis.TimeoutError)
+
+# Redis sets named tables::<table> hold the cache keys whose SQL reads <table>
+TABLE_TAG_PREFIX = "tables::"
+
+# Question frequency (sorted set) and last generated SQL per question (hash),
+# used by the refresh-ahead warmer in src/cache/warmer.py
+QUESTION_STATS_KEY = "stats::questions"
+QUESTION_SQL_KEY = "stats::question_sql"
+# Question counts are buffered in process and sent in one pipeline at most
+# every QUESTION_FLUSH_INTERVAL seconds, so a cache hit costs no Redis call
+QUESTION_FLUSH_INTERVAL = float(os.getenv("QUESTION_FLUSH_INTERVAL", "10"))
+# Decay drops questions scoring below QUESTION_STATS_MIN_SCORE and keeps at
+# most QUESTION_STATS_MAX of them
+QUESTION_STATS_MIN_SCORE = float(os.getenv("QUESTION_STATS_MIN_SCORE", "0.5"))
+QUESTION_STATS_MAX = int(os.getenv("QUESTION_STATS_MAX", "10000"))
+
+# In-process L1 cache (L1_CACHE_MAX_BYTES=0 disables it)
+L1_CACHE_MAX_BYTES = int(os.getenv("L1_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+L1_CACHE_TTL = int(os.getenv("L1_CACHE_TTL", "60"))
+# Only keys with these prefixes are held in L1 (comma-separated)
+L1_CACHE_PREFIXES = tuple(p for p in os.getenv("L1_CACHE_PREFIXES", "query::").split(",") if p)
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+# Sent on INVALIDATION_CHANNEL to make every worker clear its L1
+FLUSH_MESSAGE = "*"
+# Seconds between attempts to subscribe while the listener is down
+LISTENER_RETRY_INTERVAL = float(os.getenv("CACHE_LISTENER_RETRY_INTERVAL", "5"))
+
+_l1 = LocalLRUCache(L1_CACHE_MAX_BYTES, L1_CACHE_TTL) if L1_CACHE_MAX_BYTES > 0 else None
+# Identifies this process so it can ignore its own invalidation messages
+_instance_id = uuid.uuid4().hex
+_listener = None
+# Set by start_invalidation_listener: keep retrying until subscribed
+_listener_wanted = False
+_listener_retry_at = 0.0
+_listener_lock = threading.Lock()
+
+# Question counts / SQL not yet sent to Redis, see flush_question_stats()
+_question_lock = threading.Lock()
+_question_counts: Dict[str, float] = {}
+_question_sql: Dict[str, str] = {}
+_last_question_flush = time.monotonic()
+
+# Redis client, created by init_client()
+_redis_client: Optional[redis.Redis] = None
+_client_initialized = False
+_breaker = CircuitBreaker("redis", REDIS_BREAKER_THRESHOLD, REDIS_BREAKER_COOLDOWN)
+
+def init_client() -> Optional[redis.Redis]:
+    """
+    Create the pooled Redis client and check the connection with PING.
+    The client is kept even if Redis is down: connections are re-established
+    on demand and the circuit breaker decides when to try again.
+    """
+    global _redis_client, _client_initialized
+    _client_initialized = True
+    try:
+        pool = redis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL
+        )
+        _redis_client = redis.Redis(connection_pool=pool)
+    except Exception as e:
+        logger.error(f"Invalid Redis configuration '{REDIS_URL}': {e}")
+        _redis_client = None
+        return None
+    try:
+        _redis_client.ping()
+        _record_success()
+    except Exception as e:
+        logger.error(f"Error connecting to Redis at {REDIS_URL}: {e}")
+        _breaker.record_failure()
+    return _redis_client
+
+def close_client() -> None:
+    """
+    Flush buffered question stats, stop the invalidation listener and close
+    all pooled Redis connections.
+    """
+    global _redis_client, _client_initialized
+    flush_question_stats()
+    stop_invalidation_listener()
+    if _redis_client is not None:
+        try:
+            _redis_client.close()
+            _redis_client.connection_pool.disconnect()
+        except Exception as e:
+            logger.error(f"Error closing Redis connection: {e}")
     _redis_client = None
+    _client_initialized = False
+
+def _get_client() -> Optional[redis.Redis]:
+    # Create the client on first use when init_client() was not called explicitly
+    if not _client_initialized:
+        init_client()
+    return _redis_client
+
+def _acquire_client() -> Optional[redis.Redis]:
+    """
+    Return the client if a Redis call may be attempted now, else None
+    (no client, or the circuit breaker is open).
+    """
+    client = _get_client()
+    if client is None or not _breaker.allow():
+        return None
+    return client
+
+def cache_stats() -> Dict[str, Any]:
+    """
+    Cache health metrics: circuit breaker state/counters, pool usage and L1 stats.
+    """
+    stats: Dict[str, Any] = {"breaker": _breaker.stats()}
+    if _redis_client is not None:
+        pool = _redis_client.connection_pool
+        stats["pool"] = {
+            "max_connections": pool.max_connections,
+            "created_connections": len(getattr(pool, "_connections", [])),
+        }
+    if _l1 is not None:
+        stats["l1"] = {
+            "entries": len(_l1),
+            "bytes": _l1.current_bytes,
+            "hits": _l1.hits,
+            "misses": _l1.misses,
+        }
+    return stats
+
+def query_cache_key(question: str, dataset: Optional[str] = None, preview: bool = False) -> str:
+    """
+    Return the cache key for a question's query result, scoped to dataset
+    when the question was asked against a single dataset shard. Approximate
+    preview results are kept apart from exact ones.
+    """
+    key = f"query::{dataset}::{question}" if dataset else f"query::{question}"
+    return f"{key}::preview" if preview else key
+
+def table_tag_key(table: str) -> str:
+    """
+    Return the Redis set key listing cache entries that depend on a table.
+    Tags use the dataset-qualified name, so ds1.orders and ds2.orders are
+    purged separately; a bare name means a table of settings.BIGQUERY_DATASET.
+    """
+    from src.config import settings
+    from src.utils.sql_parsing import qualify_table_name
+    return f"{TABLE_TAG_PREFIX}{qualify_table_name(table, settings.BIGQUERY_DATASET)}"
+
+def is_available() -> bool:
+    """
+    Return True if Redis is configured and the circuit breaker is not open.
+    """
+    return _get_client() is not None and _breaker.state != OPEN
+
+def _use_l1(key: str) -> bool:
+    return _l1 is not None and key.startswith(L1_CACHE_PREFIXES)
+
+def _on_invalidation(message) -> None:
+    data = message.get("data")
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    sender, _, key = str(data).partition(":")
+    if sender == _instance_id or _l1 is None:
+        return
+    if key == FLUSH_MESSAGE:
+        _l1.clear()
+    else:
+        _l1.delete(key)
+
+def _record_error(e: Exception, action: str) -> None:
+    # Connection problems count against the breaker; other errors mean Redis answered
+    if isinstance(e, _REDIS_ERRORS):
+        _breaker.record_failure()
+    else:
+        _breaker.record_success()
+    logger.error(f"Error {action}: {e}")
+
+def _on_listener_error(e: Exception, pubsub, thread) -> None:
+    # Keep the listener alive while Redis is down; it reconnects on the next read
+    _record_error(e, f"reading from '{INVALIDATION_CHANNEL}'")
+    time.sleep(REDIS_BREAKER_COOLDOWN)
+
+def _record_success() -> None:
+    _breaker.record_success()
+    # Redis answers again: retry a subscription that failed
+    if _listener_wanted and _listener is None and time.monotonic() >= _listener_retry_at:
+        _subscribe()
+
+def _subscribe() -> None:
+    global _listener, _listener_retry_at
+    # Check before acquiring: a half-open breaker lets only one trial call through
+    if _l1 is None or _listener is not None or not _listener_lock.acquire(blocking=False):
+        return
+    try:
+        _listener_retry_at = time.monotonic() + LISTENER_RETRY_INTERVAL
+        client = _acquire_client()
+        if client is None:
+            return
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: _on_invalidation})
+            _listener = pubsub.run_in_thread(
+                sleep_time=1.0,
+                daemon=True,
+                exception_handler=_on_listener_error
+            )
+        except Exception as e:
+            _record_error(e, f"subscribing to '{INVALIDATION_CHANNEL}'")
+            return
+        # Invalidations sent while unsubscribed were missed
+        _l1.clear()
+        _breaker.record_success()
+    finally:
+        _listener_lock.release()
+
+def start_invalidation_listener() -> None:
+    """
+    Subscribe to INVALIDATION_CHANNEL in a background thread so writes made
+    by other workers evict this process's L1 entries. If Redis is
+    unavailable, the subscription is retried (at most every
+    LISTENER_RETRY_INTERVAL seconds) once a Redis call succeeds again.
+    """
+    global _listener_wanted
+    _listener_wanted = True
+    _subscribe()
+
+def stop_invalidation_listener() -> None:
+    """
+    Stop the background pub/sub listener, if running.
+    """
+    global _listener, _listener_wanted
+    _listener_wanted = False
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def publish_invalidation(key: str = FLUSH_MESSAGE, client: Optional[redis.Redis] = None) -> None:
+    """
+    Tell every worker to drop key from its L1 (or clear L1 entirely if key
+    is FLUSH_MESSAGE).
+    """
+    # An explicitly passed client (e.g. from a script) bypasses the breaker
+    own_client = client is None
+    client = _acquire_client() if own_client else client
+    if client is None:
+        return
+    try:
+        client.publish(INVALIDATION_CHANNEL, f"{_instance_id}:{key}")
+        if own_client:
+            _record_success()
+    except Exception as e:
+        if own_client:
+            _record_error(e, f"publishing invalidation for key '{key}'")
+        else:
+            logger.error(f"Error publishing invalidation for key '{key}': {e}")
 
 def get_cache(key: str) -> Optional[Any]:
     """
-    Fetch a cached value by key.
-    Returns the deserialized JSON object, or None if missing or on error.
+    Fetch a cached value by key, checking the in-process L1 before Redis.
+    Returns the deserialized JSON object, or None if missing, on error, or
+    while the circuit breaker is open.
     """
-    if _redis_client is None:
+    if _use_l1(key):
+        value = _l1.get(key)
+        if value is not None:
+            return value
+    client = _acquire_client()
+    if client is None:
+        return None
+    try:
+        raw = client.get(key)
+        _record_success()
+    except Exception as e:
+        _record_error(e, f"getting cache for key '{key}'")
+        return None
+    if raw is None:
         return None
     try:
-        raw = _redis_client.get(key)
-        if raw is None:
-            return None
-        return json.loads(raw)
+        value = loads(raw)
     except Exception as e:
-        logger.error(f"Error getting cache for key '{key}': {e}")
+        logger.error(f"Error decoding cache for key '{key}': {e}")
         return None
+    if _use_l1(key):
+        _l1.set(key, value, size=len(raw))
+    return value
 
-def set_cache(key: str, value: Any) -> None:
+def set_cache(
+    key: str,
+    value: Any,
+    ttl: Optional[int] = None,
+    tables: Optional[Iterable[str]] = None
+) -> bool:
     """
     Store a JSON-serializable value under the given key with TTL.
+    Uses CACHE_TTL unless an explicit ttl (seconds) is given.
+    If tables are given, the key is added to each table's tag set so that
+    scripts/refresh_cache.py --table can purge it when the table changes.
+    Returns True if the value was written to Redis.
+    """
+    expiry = ttl or CACHE_TTL
+    try:
+        raw = dumps(value)
+    except Exception as e:
+        logger.error(f"Error encoding cache value for key '{key}': {e}")
+        return False
+    if _use_l1(key):
+        _l1.set(key, value, size=len(raw), ttl=expiry)
+    client = _acquire_client()
+    if client is None:
+        return False
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.set(name=key, value=raw, ex=expiry)
+        for table in tables or ():
+            tag = table_tag_key(table)
+            pipe.sadd(tag, key)
+            # Tag set lives as long as its longest-lived member: set a TTL on a
+            # new set, then only ever extend it (EXPIRE NX / GT, Redis >= 7.0)
+            pipe.expire(tag, expiry, nx=True)
+            pipe.expire(tag, expiry, gt=True)
+        if _use_l1(key):
+            pipe.publish(INVALIDATION_CHANNEL, f"{_instance_id}:{key}")
+        pipe.execute()
+        _record_success()
+        return True
+    except Exception as e:
+        _record_error(e, f"setting cache for key '{key}'")
+        return False
+
+def delete_cache(key: str) -> None:
+    """
+    Remove key from Redis and from every worker's L1.
+    """
+    if _l1 is not None:
+        _l1.delete(key)
+    client = _acquire_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.unlink(key)
+        if _use_l1(key):
+            pipe.publish(INVALIDATION_CHANNEL, f"{_instance_id}:{key}")
+        pipe.execute()
+        _record_success()
+    except Exception as e:
+        _record_error(e, f"deleting cache for key '{key}'")
+
+def cache_query_result(
+    cache_key: str,
+    sql: str,
+    data: List[Any],
+    truncation: Optional[Dict[str, Any]] = None,
+    ttl: Optional[int] = None,
+    query_stats: Optional[Dict[str, Any]] = None,
+    preview: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Cache a query result payload, tagged with the tables its SQL reads.
+    In freshness mode (settings.CACHE_FRESHNESS), query_stats from run_query
+    are used to record the modified time of every table the job read; such
+    entries get the long FRESHNESS_CACHE_TTL and are validated on lookup by
+    get_query_result. preview holds the sampling info and exact SQL of an
+    approximate preview result.
+    """
+    from src.config import settings
+    from src.utils.sql_parsing import extract_table_refs
+    payload = {"sql": sql, "data": data, "truncation": truncation}
+    if preview:
+        payload["preview"] = preview
+    if settings.CACHE_FRESHNESS and ttl is None:
+        from src.cache.freshness import snapshot
+        tables_modified = snapshot(query_stats)
+        if tables_modified:
+            payload["tables_modified"] = tables_modified
+            ttl = settings.FRESHNESS_CACHE_TTL
+    set_cache(cache_key, payload, ttl=ttl, tables=extract_table_refs(sql))
+
+def get_query_result(cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch a cached query result. In freshness mode, an entry whose tables
+    changed since it was cached is deleted and reported as a miss.
+    """
+    from src.config import settings
+    cached = get_cache(cache_key)
+    if not cached or not settings.CACHE_FRESHNESS or not cached.get("tables_modified"):
+        return cached
+    from src.cache.freshness import is_fresh
+    if is_fresh(cached["tables_modified"]):
+        return cached
+    logger.info(f"Cached result '{cache_key}' is stale, underlying tables changed")
+    delete_cache(cache_key)
+    return None
+
+def record_question(question: str, sql: Optional[str] = None, count: int = 1) -> None:
+    """
+    Add count requests for question and remember the SQL generated for it.
+    Buffered in process; flushed once QUESTION_FLUSH_INTERVAL has passed.
+    """
+    with _question_lock:
+        if count:
+            _question_counts[question] = _question_counts.get(question, 0) + count
+        if sql:
+            _question_sql[question] = sql
+        due = time.monotonic() - _last_question_flush >= QUESTION_FLUSH_INTERVAL
+    if due:
+        flush_question_stats()
+
+def flush_question_stats() -> None:
     """
-    if _redis_client is None:
+    Send the buffered question counts and SQL to Redis in one pipeline.
+    If Redis is unavailable the buffered counts are dropped: they only rank
+    questions for the warmer.
+    """
+    global _question_counts, _question_sql, _last_question_flush
+    with _question_lock:
+        counts, sqls = _question_counts, _question_sql
+        _question_counts, _question_sql = {}, {}
+        _last_question_flush = time.monotonic()
+    if not counts and not sqls:
+        return
+    client = _acquire_client()
+    if client is None:
         return
     try:
-        _redis_client.set(name=key, value=json.dumps(value), ex=CACHE_TTL)
+        pipe = client.pipeline(transaction=False)
+        for question, count in counts.items():
+            pipe.zincrby(QUESTION_STATS_KEY, count, question)
+        if sqls:
+            pipe.hset(QUESTION_SQL_KEY, mapping=sqls)
+        pipe.execute()
+        _record_success()
+    except Exception as e:
+        _record_error(e, "recording question stats")
+
+def top_questions(n: int) -> List[Tuple[str, float, Optional[str]]]:
+    """
+    Return the n most frequent questions as (question, score, last SQL).
+    """
+    client = _acquire_client()
+    if client is None:
+        return []
+    try:
+        ranked = client.zrevrange(QUESTION_STATS_KEY, 0, n - 1, withscores=True)
+        questions = [q.decode("utf-8") if isinstance(q, bytes) else q for q, _ in ranked]
+        sqls = client.hmget(QUESTION_SQL_KEY, questions) if questions else []
+        _record_success()
+    except Exception as e:
+        _record_error(e, "reading question stats")
+        return []
+    return [
+        (q, score, sql.decode("utf-8") if isinstance(sql, bytes) else sql)
+        for q, (_, score), sql in zip(questions, ranked, sqls)
+    ]
+
+def decay_question_stats(factor: float) -> None:
+    """
+    Multiply every question count by factor (< 1) so old popularity fades,
+    then drop questions scoring below QUESTION_STATS_MIN_SCORE or ranked
+    beyond QUESTION_STATS_MAX, together with their SQL.
+    """
+    client = _acquire_client()
+    if client is None:
+        return
+    below = f"({QUESTION_STATS_MIN_SCORE}"
+    beyond = -(QUESTION_STATS_MAX + 1)
+    try:
+        pipe = client.pipeline(transaction=True)
+        pipe.zunionstore(QUESTION_STATS_KEY, {QUESTION_STATS_KEY: factor})
+        pipe.zrangebyscore(QUESTION_STATS_KEY, "-inf", below)
+        pipe.zremrangebyscore(QUESTION_STATS_KEY, "-inf", below)
+        pipe.zrange(QUESTION_STATS_KEY, 0, beyond)
+        pipe.zremrangebyrank(QUESTION_STATS_KEY, 0, beyond)
+        _, low, _, excess, _ = pipe.execute()
+        dropped = list(low) + list(excess)
+        if dropped:
+            client.hdel(QUESTION_SQL_KEY, *dropped)
+        _record_success()
+    except Exception as e:
+        _record_error(e, "decaying question stats")
+
+def get_ttls(keys: List[str]) -> List[int]:
+    """
+    Return remaining TTL in seconds for each key (-2 if missing, -1 if no
+    expiry). Returns [] if Redis is unavailable.
+    """
+    client = _acquire_client()
+    if client is None:
+        return []
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.ttl(key)
+        ttls = pipe.execute()
+        _record_success()
+        return ttls
+    except Exception as e:
+        _record_error(e, "reading key TTLs")
+        return []
+
+def try_lock(name: str, ttl: int) -> bool:
+    """
+    Take a best-effort lock shared by all workers for ttl seconds.
+    Returns True if this process got it.
+    """
+    client = _acquire_client()
+    if client is None:
+        return False
+    try:
+        acquired = bool(client.set(f"lock::{name}", _instance_id, nx=True, ex=ttl))
+        _record_success()
+        return acquired
     except Exception as e:
-        logger.error(f"Error setting cache for key '{key}': {e}")
\ No newline at end of file
+        _record_error(e, f"taking lock '{name}'")
+        return False
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+src/cache/warmer.py
+
+Refresh-ahead cache warmer for the most frequently asked questions.
+
+Question counts are recorded by the API (redis_cache.record_question) and
+flushed to Redis periodically. A warm-up pass looks at the top-N questions
+and re-executes the last SQL generated for each one whose cached result is
+missing or about to expire, so popular questions never fall back to the
+full retrieval+LLM+BigQuery path. After a schema re-ingestion, regenerate=True re-runs the whole
+pipeline so the SQL reflects the new schema.
+
+Runs from scripts/warm_cache.py, or in-process when settings.WARMER_INTERVAL > 0.
+"""
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from src.config import settings
+from src.cache import redis_cache
+
+logger = logging.getLogger(__name__)
+
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def refresh_question(question: str, sql: Optional[str] = None, regenerate: bool = False) -> None:
+    """
+    Execute the question's SQL (regenerating it if asked or unknown) and
+    store the fresh result in the cache.
+
+    Raises:
+        RuntimeError / ValueError: If generation, validation or execution fails.
+    """
+    from src.execution.bigquery_client import run_query
+    from src.utils.serialization import dataframe_to_records
+    from src.utils.validation import validate_sql
+
+    if regenerate or not sql:
+        from src.rag.retriever import retrieve_schema_docs
+        from src.rag.generator import generate_sql
+        sql = generate_sql(retrieve_schema_docs(question), question)
+
+    is_valid, err_msg = validate_sql(sql)
+    if not is_valid:
+        raise ValueError(f"SQL validation failed: {err_msg}")
+
+    df = run_query(sql)
+    redis_cache.cache_query_result(
+        redis_cache.query_cache_key(question),
+        sql,
+        dataframe_to_records(df),
+        df.attrs.get("truncation"),
+        query_stats=df.attrs.get("query_stats")
+    )
+    if regenerate:
+        redis_cache.record_question(question, sql, count=0)
+
+
+def warm_cache(
+    top_n: Optional[int] = None,
+    ttl_threshold: Optional[int] = None,
+    force: bool = False,
+    regenerate: bool = False
+) -> Dict[str, int]:
+    """
+    Refresh cached results for the top_n most frequent questions whose
+    entry expires within ttl_threshold seconds (or is missing). With force,
+    every top question is refreshed regardless of TTL.
+    Returns counts of questions checked, refreshed and failed.
+    """
+    top_n = top_n or settings.WARMER_TOP_N
+    threshold = settings.WARMER_TTL_THRESHOLD if ttl_threshold is None else ttl_threshold
+
+    redis_cache.flush_question_stats()
+    top = redis_cache.top_questions(top_n)
+    ttls = redis_cache.get_ttls([redis_cache.query_cache_key(q) for q, _, _ in top])
+    stats = {"checked": len(top), "refreshed": 0, "failed": 0}
+    if not ttls:
+        return stats
+
+    for (question, _, sql), ttl in zip(top, ttls):
+        # ttl: -2 = missing, -1 = no expiry
+        due = ttl == -2 or 0 <= ttl < threshold
+        if not (force or due):
+            continue
+        try:
+            refresh_question(question, sql, regenerate=regenerate)
+            stats["refreshed"] += 1
+        except Exception as e:
+            logger.warning(f"Cache warmer failed for question '{question}': {e}")
+            stats["failed"] += 1
+
+    # Regenerated SQL is buffered like any other question stat
+    redis_cache.flush_question_stats()
+    if settings.WARMER_DECAY < 1:
+        redis_cache.decay_question_stats(settings.WARMER_DECAY)
+    logger.info(f"Cache warmer: {stats}")
+    return stats
+
+
+def _loop(interval: int) -> None:
+    while not _stop.wait(interval):
+        # Only one worker per interval does the work
+        if redis_cache.try_lock("cache-warmer", interval):
+            try:
+                warm_cache()
+            except Exception as e:
+                logger.error(f"Cache warmer run failed: {e}")
+
+
+def start_background_warmer(interval: Optional[int] = None) -> None:
+    """
+    Start the in-process warmer thread if an interval is configured.
+    """
+    global _thread
+    interval = settings.WARMER_INTERVAL if interval is None else interval
+    if interval <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, args=(interval,), name="cache-warmer", daemon=True)
+    _thread.start()
+
+
+def stop_background_warmer() -> None:
+    """
+    Signal the warmer thread to exit.
+    """
+    global _thread
+    _stop.set()
+    _thread = None
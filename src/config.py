@@ -15,5 +15,87 @@ class Settings:
         self.LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
         self.TOP_K = int(os.getenv("TOP_K", 5))
 
+        # Vector store engine: "faiss", "chroma" or "numpy" (exact search, small catalogs)
+        self.VECTOR_STORE_TYPE = os.getenv("VECTOR_STORE_TYPE", "faiss")
+        # Matrix dtype for the numpy engine; float16 halves memory but matmul is slower on CPU
+        self.VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+
+        # Multi-process embedding at ingestion (0 = in-process, -1 = one worker per core)
+        self.EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", 0))
+        self.EMBED_CHUNK_SIZE = int(os.getenv("EMBED_CHUNK_SIZE", 2048))
+        self.EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+
+        # Streaming ingestion: tables per batch and concurrent schema fetches
+        self.INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 1000))
+        self.INGEST_FETCH_WORKERS = int(os.getenv("INGEST_FETCH_WORKERS", 8))
+
+        # Sharded stores: shards searched per query when no dataset is given,
+        # and the on-disk size of loaded shards kept per worker before LRU eviction
+        self.SHARD_ROUTER_TOP = int(os.getenv("SHARD_ROUTER_TOP", 2))
+        self.SHARD_CACHE_MAX_BYTES = int(os.getenv("SHARD_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+        # Join-graph expansion of retrieved tables
+        self.JOIN_EXPANSION = os.getenv("JOIN_EXPANSION", "true").lower() == "true"
+        self.JOIN_MAX_HOPS = int(os.getenv("JOIN_MAX_HOPS", 3))
+        self.JOIN_TOKEN_BUDGET = int(os.getenv("JOIN_TOKEN_BUDGET", 1000))
+
+        # Result budgets enforced while reading BigQuery pages (0 = unlimited)
+        self.MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", 10000))
+        self.MAX_RESULT_BYTES = int(os.getenv("MAX_RESULT_BYTES", 20_000_000))
+        self.MAX_RESULT_COLUMNS = int(os.getenv("MAX_RESULT_COLUMNS", 100))
+        self.RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", 5000))
+
+        # Startup warm-up steps run before /readyz passes (empty disables)
+        self.WARMUP_STEPS = os.getenv("WARMUP_STEPS", "index,embeddings,search,dry_run")
+
+        # Refresh-ahead cache warmer
+        self.WARMER_TOP_N = int(os.getenv("WARMER_TOP_N", 50))
+        self.WARMER_TTL_THRESHOLD = int(os.getenv("WARMER_TTL_THRESHOLD", 300))
+        self.WARMER_DECAY = float(os.getenv("WARMER_DECAY", 0.9))
+        # Seconds between in-process warmer runs (0 disables the background task)
+        self.WARMER_INTERVAL = int(os.getenv("WARMER_INTERVAL", 0))
+
+        # Freshness-aware result caching: validate cached results against the
+        # modified time of the tables they read, allowing a much longer TTL
+        self.CACHE_FRESHNESS = os.getenv("CACHE_FRESHNESS", "false").lower() == "true"
+        self.FRESHNESS_CACHE_TTL = int(os.getenv("FRESHNESS_CACHE_TTL", 7 * 24 * 3600))
+        # Seconds a table metadata check is reused before asking BigQuery again
+        self.FRESHNESS_CHECK_TTL = float(os.getenv("FRESHNESS_CHECK_TTL", 5))
+
+        # Preview mode (src/utils/sql_preview.py): percent of each FROM table sampled
+        self.PREVIEW_SAMPLE_PERCENT = float(os.getenv("PREVIEW_SAMPLE_PERCENT", 10))
+        if not 0 < self.PREVIEW_SAMPLE_PERCENT <= 100:
+            raise ValueError(
+                f"PREVIEW_SAMPLE_PERCENT must be in (0, 100], got {self.PREVIEW_SAMPLE_PERCENT}"
+            )
+
+        # Query log of executed SQL (src/execution/query_log.py; empty disables)
+        self.QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "")
+        self.QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", 100 * 1024 * 1024))
+
+        # Summary tables (src/rag/summary_tables.py): how often an aggregation
+        # pattern must occur before one is proposed, the most GROUP BY/filter
+        # columns it may have, and whether retrieval puts them first
+        self.SUMMARY_MIN_QUERIES = int(os.getenv("SUMMARY_MIN_QUERIES", 5))
+        self.SUMMARY_MAX_DIMENSIONS = int(os.getenv("SUMMARY_MAX_DIMENSIONS", 6))
+        self.SUMMARY_ROUTING = os.getenv("SUMMARY_ROUTING", "true").lower() == "true"
+
+        # Request profiling (src/api/profiling.py): admin token for on-demand
+        # profiles, and 1-in-N sampling of /query requests (0 disables)
+        self.ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+        self.PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", 0))
+        self.PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.001))
+        self.PROFILE_FLUSH_EVERY = int(os.getenv("PROFILE_FLUSH_EVERY", 20))
+        self.PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+        # Oldest files in PROFILE_DIR are deleted beyond this many (0 = keep all)
+        self.PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 200))
+
+        # Background query jobs
+        self.JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+        self.JOB_PAGE_SIZE = int(os.getenv("JOB_PAGE_SIZE", 1000))
+        self.JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))
+        # Seconds between job status polls in the Streamlit UI
+        self.JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+
 
 settings = Settings()
@@ -9,12 +9,36 @@ Supports:
   - Open-source Sentence-Transformers
   - Google Vertex AI free embedding
   - (No OpenAI fallback in this version)
+
+Model clients are imported and created on first use and then reused;
+call load_embedding_model() to pay that cost up front (e.g. at warm-up).
 """
 
 import os
+from functools import lru_cache
 from typing import List
 from src.config import settings
 
+@lru_cache(maxsize=4)
+def _get_sentence_transformer(model: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model)
+
+@lru_cache(maxsize=1)
+def _get_vertex_client():
+    from google.cloud import aiplatform
+    return aiplatform.EmbeddingServiceClient()
+
+def load_embedding_model() -> None:
+    """
+    Import and initialize the client for settings.EMBEDDING_MODEL.
+    """
+    model = settings.EMBEDDING_MODEL
+    if model.startswith("sentence-transformers/"):
+        _get_sentence_transformer(model)
+    elif model.startswith("textembedding-gecko"):
+        _get_vertex_client()
+
 def embed_texts(texts: List[str]) -> List[List[float]]:
     """
     Generate embeddings for a list of texts.
@@ -26,15 +50,13 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
 
     # Open-source Sentence-Transformers
     if model.startswith("sentence-transformers/"):
-        from sentence_transformers import SentenceTransformer
-        encoder = SentenceTransformer(model)
+        encoder = _get_sentence_transformer(model)
         embeddings = encoder.encode(texts)
         return [list(map(float, emb)) for emb in embeddings]
 
     # Google Vertex AI free embedding
     if model.startswith("textembedding-gecko"):
-        from google.cloud import aiplatform
-        client = aiplatform.EmbeddingServiceClient()
+        client = _get_vertex_client()
         model_name = f"projects/{settings.GCP_PROJECT}/locations/us-central1/publishers/google/models/{model}"
         response = client.embed_text(request={"model": model_name, "instances": texts})
         # predictions is a list of dicts with 'embeddings': { 'values': [...] }
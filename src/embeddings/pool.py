@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+src/embeddings/pool.py
+
+Multi-process Sentence-Transformers encoding for large ingestion runs.
+
+Texts are sorted by length (longest first) and cut into chunks, so each
+batch inside a chunk pads to a similar length and the slowest chunks are
+scheduled first. Chunks are spread over a pool of worker processes that
+each load the model once; workers write their vectors straight into a
+shared-memory float32 matrix and only send back a row count, so large
+arrays are never pickled back to the parent. EmbeddingPool keeps the
+workers alive across calls for batch-by-batch (streaming) ingestion.
+
+Vertex AI models are remote calls and go through embed_texts unchanged.
+"""
+
+import os
+import logging
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import settings
+from src.embeddings.embedder import embed_texts
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, set by _init_worker
+_encoder = None
+_batch_size = 64
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+
+def _init_worker(model: str, batch_size: int, threads: int) -> None:
+    global _encoder, _batch_size
+    # Split the cores between workers instead of every worker using all of them
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from src.embeddings.embedder import _get_sentence_transformer
+    _encoder = _get_sentence_transformer(model)
+    _batch_size = batch_size
+
+
+def _embedding_dim() -> int:
+    return int(_encoder.get_sentence_embedding_dimension())
+
+
+def _attach(name: str, shape: Tuple[int, int]) -> np.ndarray:
+    if name not in _attached:
+        # Release segments from earlier embed() calls; the parent has unlinked them
+        for old in list(_attached):
+            old_shm, old_buf = _attached.pop(old)
+            del old_buf
+            old_shm.close()
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = (shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf))
+    return _attached[name][1]
+
+
+def _encode_chunk(task: Tuple[str, Tuple[int, int], int, List[str]]) -> int:
+    """
+    Encode one chunk and write it into rows [start, start + len(texts)) of
+    the shared matrix. Returns the number of rows written.
+    """
+    shm_name, shape, start, texts = task
+    out = _attach(shm_name, shape)
+    vectors = _encoder.encode(texts, batch_size=_batch_size, convert_to_numpy=True)
+    out[start:start + len(texts)] = vectors
+    return len(texts)
+
+
+def length_sorted_chunks(texts: List[str], chunk_size: int) -> Tuple[List[int], List[Tuple[int, List[str]]]]:
+    """
+    Sort texts longest first and split them into chunks.
+    Returns (order, chunks): order[j] is the original index of sorted row j,
+    and each chunk is (start row in sorted order, texts).
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    chunks = [
+        (start, [texts[i] for i in order[start:start + chunk_size]])
+        for start in range(0, len(order), chunk_size)
+    ]
+    return order, chunks
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """
+    Number of worker processes: settings.EMBED_WORKERS unless given,
+    with -1 meaning one per CPU core.
+    """
+    workers = settings.EMBED_WORKERS if workers is None else workers
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+class EmbeddingPool:
+    """
+    Worker pool that stays up across embed() calls, so streaming ingestion
+    loads the model once per worker rather than once per batch.
+    Use as a context manager, or call close().
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.workers = resolve_workers(workers)
+        self.chunk_size = chunk_size or settings.EMBED_CHUNK_SIZE
+        self.batch_size = batch_size or settings.EMBED_BATCH_SIZE
+        self.model = settings.EMBEDDING_MODEL
+        self._pool = None
+        self._dim: Optional[int] = None
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _in_process(self, texts: List[str]) -> bool:
+        return (
+            self.workers <= 1
+            or len(texts) <= self.batch_size
+            or not self.model.startswith("sentence-transformers/")
+        )
+
+    def _get_pool(self):
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # spawn, not fork: forking after torch has started threads can deadlock
+            ctx = mp.get_context("spawn")
+            self._pool = ctx.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.model, self.batch_size, threads)
+            )
+            self._dim = self._pool.apply(_embedding_dim)
+        return self._pool
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Return a (len(texts), dim) float32 matrix in input order.
+        """
+        if self._in_process(texts):
+            return np.asarray(embed_texts(texts), dtype=np.float32)
+
+        pool = self._get_pool()
+        # Small inputs still get one chunk per worker
+        chunk_size = min(self.chunk_size, -(-len(texts) // self.workers))
+        order, chunks = length_sorted_chunks(texts, chunk_size)
+        shape = (len(texts), self._dim)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(texts) * self._dim * 4))
+        buf = None
+        try:
+            buf = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            tasks = [(shm.name, shape, start, chunk) for start, chunk in chunks]
+            done = 0
+            for n in pool.imap_unordered(_encode_chunk, tasks):
+                done += n
+                logger.debug(f"Embedded {done}/{len(texts)} texts")
+            # Undo the length sort
+            result = np.empty(shape, dtype=np.float32)
+            result[order] = buf
+        finally:
+            del buf
+            shm.close()
+            shm.unlink()
+        return result
+
+
+def embed_texts_parallel(
+    texts: List[str],
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    batch_size: Optional[int] = None
+) -> np.ndarray:
+    """
+    Embed texts with a pool of worker processes started for this call.
+    Returns a (len(texts), dim) float32 matrix in input order.
+    Falls back to in-process embed_texts for a single worker, an input that
+    fits in one encode batch, or a non Sentence-Transformers model.
+    """
+    with EmbeddingPool(workers, chunk_size, batch_size) as pool:
+        return pool.embed(texts)
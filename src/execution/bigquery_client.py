@@ -10,24 +10,233 @@ Inputs:
 
 Outputs:
  - pandas.DataFrame containing the query results.
+
+Result budgets (max rows, max bytes, max columns) are enforced while result
+pages are read, so oversized results are never fully materialized. Truncation
+details are attached to the returned DataFrame as df.attrs["truncation"].
+
+Queries run with BigQuery's own result cache enabled (use_query_cache). Job
+statistics (cache hit, bytes processed, referenced tables, start time) are
+attached as df.attrs["query_stats"] and counted in query_stats(). Each
+successful query is also appended to the query log when
+settings.QUERY_LOG_PATH is set (see src/execution/query_log.py).
 """
 
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
 import pandas as pd
-from google.cloud import bigquery
 from src.config import settings
+from src.execution.query_log import log_query
+
+# Called after each page with (rows_read, total_rows)
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+# Shared BigQuery client, created on first use (or at API startup)
+_client = None
+
+# Process-wide query counters, see query_stats()
+_stats = {"queries": 0, "cache_hits": 0, "bytes_processed": 0}
+_stats_lock = threading.Lock()
+
+
+def _estimate_size(values: Sequence) -> int:
+    """
+    Roughly estimate the serialized (JSON) size of a row in bytes.
+    """
+    size = 0
+    for v in values:
+        if v is None:
+            size += 4
+        elif isinstance(v, (str, bytes)):
+            size += len(v) + 2
+        elif isinstance(v, (bool, int, float)):
+            size += 8
+        else:
+            size += len(str(v)) + 2
+    return size
+
+
+def _read_pages(
+    result,
+    max_rows: int,
+    max_bytes: int,
+    max_columns: int,
+    progress_callback: Optional[ProgressCallback] = None
+) -> pd.DataFrame:
+    """
+    Read a RowIterator page by page, stopping as soon as a budget is exceeded.
+    A budget of 0 means unlimited.
+    """
+    all_columns = [field.name for field in result.schema]
+    columns = all_columns[:max_columns] if max_columns else all_columns
+    ncols = len(columns)
+    total_rows = result.total_rows
+
+    rows = []
+    nbytes = 0
+    truncated_by = []
+    if len(columns) < len(all_columns):
+        truncated_by.append("max_columns")
+
+    for page in result.pages:
+        for row in page:
+            if max_rows and len(rows) >= max_rows:
+                truncated_by.append("max_rows")
+                break
+            values = row.values()[:ncols]
+            nbytes += _estimate_size(values)
+            if max_bytes and nbytes > max_bytes:
+                truncated_by.append("max_bytes")
+                break
+            rows.append(values)
+        else:
+            if progress_callback:
+                progress_callback(len(rows), total_rows)
+            continue
+        break
+
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df.attrs["truncation"] = {
+        "truncated": bool(truncated_by),
+        "truncated_by": truncated_by,
+        "total_rows": total_rows,
+        "returned_rows": len(rows),
+        "total_columns": len(all_columns),
+        "returned_columns": ncols,
+    }
+    return df
+
+
+def get_client():
+    """
+    Return the shared BigQuery client for the configured project, creating it
+    on first use. google-cloud-bigquery is imported here so that importing
+    this module stays cheap.
+    """
+    global _client
+    if _client is None:
+        from google.cloud import bigquery
+        _client = bigquery.Client(project=settings.GCP_PROJECT)
+    return _client
+
+
+def close_client() -> None:
+    """
+    Close and drop the shared BigQuery client.
+    """
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
 
-def run_query(sql: str) -> pd.DataFrame:
+
+def dry_run(sql: str) -> int:
+    """
+    Validate sql with a BigQuery dry run and return the bytes it would process.
+
+    Raises:
+        RuntimeError: If the dry run fails.
+    """
+    from google.cloud import bigquery
+    client = get_client()
+    try:
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        query_job = client.query(sql, job_config=job_config)
+        return query_job.total_bytes_processed or 0
+    except Exception as e:
+        raise RuntimeError(f"Error in query dry run: {e}")
+
+
+def run_query(
+    sql: str,
+    max_rows: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    max_columns: Optional[int] = None,
+    progress_callback: Optional[ProgressCallback] = None
+) -> pd.DataFrame:
     """
     Execute the given SQL query against BigQuery and return the results as a DataFrame.
 
+    Budgets default to settings.MAX_RESULT_ROWS / MAX_RESULT_BYTES / MAX_RESULT_COLUMNS;
+    pass 0 to disable one. With every budget disabled and no progress callback,
+    the result is downloaded in one go via to_dataframe().
+
     Raises:
         RuntimeError: If the query execution fails.
     """
-    client = bigquery.Client(project=settings.GCP_PROJECT)
+    max_rows = settings.MAX_RESULT_ROWS if max_rows is None else max_rows
+    max_bytes = settings.MAX_RESULT_BYTES if max_bytes is None else max_bytes
+    max_columns = settings.MAX_RESULT_COLUMNS if max_columns is None else max_columns
+
+    from google.cloud import bigquery
+    client = get_client()
+    start = time.perf_counter()
     try:
-        query_job = client.query(sql)
-        result = query_job.result()
-        df = result.to_dataframe()
-        return df
+        job_config = bigquery.QueryJobConfig(use_query_cache=True)
+        query_job = client.query(sql, job_config=job_config)
+        if not (max_rows or max_bytes or max_columns or progress_callback):
+            result = query_job.result()
+            df = result.to_dataframe()
+        else:
+            result = query_job.result(page_size=settings.RESULT_PAGE_SIZE)
+            df = _read_pages(result, max_rows, max_bytes, max_columns, progress_callback)
     except Exception as e:
-        raise RuntimeError(f"Error executing query: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Error executing query: {e}")
+    df.attrs["query_stats"] = _job_stats(query_job)
+    log_query(sql, time.perf_counter() - start, df.attrs["query_stats"], len(df))
+    return df
+
+
+def _job_stats(query_job) -> Dict[str, Any]:
+    """
+    Summarize a finished query job and add it to the process-wide counters.
+    """
+    started = getattr(query_job, "started", None)
+    stats = {
+        "cache_hit": bool(getattr(query_job, "cache_hit", False)),
+        "bytes_processed": getattr(query_job, "total_bytes_processed", None) or 0,
+        "referenced_tables": [
+            f"{t.project}.{t.dataset_id}.{t.table_id}"
+            for t in getattr(query_job, "referenced_tables", None) or []
+        ],
+        "started_at": started.timestamp() if started else None,
+    }
+    with _stats_lock:
+        _stats["queries"] += 1
+        _stats["cache_hits"] += int(stats["cache_hit"])
+        _stats["bytes_processed"] += stats["bytes_processed"]
+    return stats
+
+
+def query_stats() -> Dict[str, Any]:
+    """
+    Counters of queries run by this process: total, BigQuery cache hits,
+    hit rate and bytes processed.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["cache_hit_rate"] = stats["cache_hits"] / stats["queries"] if stats["queries"] else 0.0
+    return stats
+
+
+def get_table_modified_times(tables: List[str]) -> Dict[str, Optional[float]]:
+    """
+    Fetch the last-modified time (epoch seconds) of each fully-qualified
+    table with concurrent metadata calls (no query job, no bytes billed).
+    Tables whose metadata cannot be read map to None.
+    """
+    client = get_client()
+
+    def modified(table: str) -> Optional[float]:
+        try:
+            return client.get_table(table).modified.timestamp()
+        except Exception:
+            return None
+
+    if not tables:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(8, len(tables))) as pool:
+        return dict(zip(tables, pool.map(modified, tables)))
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+src/execution/jobs.py
+
+Runs validated SQL in the background for long-running queries.
+
+Jobs are executed by `run_query` on a thread pool. Job status and paged
+results are stored in Redis so that any API worker can answer
+/query/jobs/{id}. The store is chosen once, when the job is submitted: if
+Redis is unavailable then, the job id gets the "local-" prefix and the job
+lives in an in-process store for its whole life. A Redis write that fails
+later is kept in the in-process store too, so the worker running the job
+still answers with its latest state.
+"""
+
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.cache import redis_cache
+from src.execution.bigquery_client import run_query
+from src.utils.serialization import dataframe_to_records
+
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Fallback store for local jobs and failed Redis writes: key -> (expires_at, value)
+_local_store: Dict[str, Tuple[float, Any]] = {}
+_local_lock = threading.Lock()
+
+# Prefix of ids of jobs kept in the in-process store
+LOCAL_JOB_PREFIX = "local-"
+
+# Status records of the jobs running in this process; _update changes this
+# copy, so a missed read can never drop fields such as sql
+_running: Dict[str, Dict[str, Any]] = {}
+_running_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Lazily create the shared thread pool used to run query jobs.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.JOB_WORKERS,
+                thread_name_prefix="query-job"
+            )
+        return _executor
+
+
+def shutdown(wait: bool = False) -> None:
+    """
+    Stop the job thread pool. Running jobs finish if wait is True.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+def _job_key(job_id: str) -> str:
+    return f"job::{job_id}"
+
+
+def _page_key(job_id: str, page: int) -> str:
+    return f"job::{job_id}::page::{page}"
+
+
+def _is_local(job_id: str) -> bool:
+    return job_id.startswith(LOCAL_JOB_PREFIX)
+
+
+def _store_local(key: str, value: Any) -> None:
+    now = time.time()
+    with _local_lock:
+        # Drop expired entries so the fallback store stays bounded by TTL
+        for k in [k for k, (exp, _) in _local_store.items() if exp <= now]:
+            del _local_store[k]
+        _local_store[key] = (now + settings.JOB_RESULT_TTL, value)
+
+
+def _store(job_id: str, key: str, value: Any) -> None:
+    if not _is_local(job_id) and redis_cache.set_cache(key, value, ttl=settings.JOB_RESULT_TTL):
+        # Redis now holds the latest value
+        with _local_lock:
+            _local_store.pop(key, None)
+        return
+    _store_local(key, value)
+
+
+def _load(job_id: str, key: str) -> Optional[Any]:
+    # The in-process copy, if any, is newer than Redis'
+    with _local_lock:
+        entry = _local_store.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+    if _is_local(job_id):
+        return None
+    return redis_cache.get_cache(key)
+
+
+def _update(job_id: str, **fields) -> Dict[str, Any]:
+    with _running_lock:
+        job = _running[job_id]
+        job.update(fields)
+        job = dict(job)
+    _store(job_id, _job_key(job_id), job)
+    return job
+
+
+def _run_job(
+    job_id: str,
+    sql: str,
+    cache_key: Optional[str],
+    preview: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Execute the job's SQL, then write result pages and the final status.
+    """
+    try:
+        _execute(job_id, sql, cache_key, preview)
+    finally:
+        with _running_lock:
+            _running.pop(job_id, None)
+
+
+def _execute(
+    job_id: str,
+    sql: str,
+    cache_key: Optional[str],
+    preview: Optional[Dict[str, Any]]
+) -> None:
+    _update(job_id, status=JOB_RUNNING, started_at=time.time())
+    def on_progress(rows_read: int, total_rows: Optional[int]) -> None:
+        if total_rows:
+            _update(job_id, progress=min(rows_read / total_rows, 0.99))
+
+    try:
+        df = run_query(sql, progress_callback=on_progress)
+    except Exception as e:
+        logger.error(f"Query job {job_id} failed: {e}")
+        _update(job_id, status=JOB_FAILED, error=str(e), finished_at=time.time())
+        return
+
+    data = dataframe_to_records(df)
+    truncation = df.attrs.get("truncation")
+    page_size = settings.JOB_PAGE_SIZE
+    pages = [data[i:i + page_size] for i in range(0, len(data), page_size)] or [[]]
+    for page, rows in enumerate(pages):
+        _store(job_id, _page_key(job_id, page), rows)
+
+    if cache_key:
+        redis_cache.cache_query_result(
+            cache_key, sql, data, truncation,
+            query_stats=df.attrs.get("query_stats"), preview=preview
+        )
+
+    _update(
+        job_id,
+        status=JOB_DONE,
+        progress=1.0,
+        total_rows=len(data),
+        num_pages=len(pages),
+        truncation=truncation,
+        finished_at=time.time()
+    )
+
+
+def submit_job(
+    sql: str,
+    cache_key: Optional[str] = None,
+    preview: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Queue a validated SQL query for background execution.
+    Returns the job id. If cache_key is given, the full result is also
+    written to the query cache on success. preview marks an approximate
+    preview query (see src/utils/sql_preview.py) and is kept on the job.
+    """
+    job_id = uuid.uuid4().hex
+    if not redis_cache.is_available():
+        job_id = f"{LOCAL_JOB_PREFIX}{job_id}"
+    job = {
+        "job_id": job_id,
+        "sql": sql,
+        "status": JOB_PENDING,
+        "progress": 0.0,
+        "total_rows": None,
+        "num_pages": 0,
+        "truncation": None,
+        "error": None,
+        "preview": preview,
+        "submitted_at": time.time(),
+    }
+    with _running_lock:
+        _running[job_id] = dict(job)
+    _store(job_id, _job_key(job_id), job)
+    try:
+        _get_executor().submit(_run_job, job_id, sql, cache_key, preview)
+    except Exception:
+        with _running_lock:
+            _running.pop(job_id, None)
+        raise
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the job's status record, or None if unknown or expired.
+    """
+    return _load(job_id, _job_key(job_id))
+
+
+def get_job_page(job_id: str, page: int = 0) -> List[Any]:
+    """
+    Return one page of a finished job's result rows (empty if unavailable).
+    """
+    return _load(job_id, _page_key(job_id, page)) or []
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+src/execution/query_log.py
+
+Append-only log of the SQL executed against BigQuery, one JSON object per
+line with the bytes processed, BigQuery cache hit, referenced tables,
+latency and returned row count of each query.
+
+Enabled by setting settings.QUERY_LOG_PATH. Once the file grows past
+settings.QUERY_LOG_MAX_BYTES it is moved to <path>.1 (replacing the previous
+one) and a new file is started. scripts/analyze_query_log.py reads it to
+propose summary tables for frequent aggregation patterns.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+def log_query(
+    sql: str,
+    seconds: float,
+    query_stats: Optional[Dict[str, Any]] = None,
+    rows: Optional[int] = None
+) -> None:
+    """
+    Append one executed query to the log (no-op unless QUERY_LOG_PATH is set).
+    """
+    path = settings.QUERY_LOG_PATH
+    if not path:
+        return
+    stats = query_stats or {}
+    line = json.dumps({
+        "ts": time.time(),
+        "sql": sql,
+        "bytes_processed": stats.get("bytes_processed", 0),
+        "cache_hit": stats.get("cache_hit", False),
+        "referenced_tables": stats.get("referenced_tables", []),
+        "seconds": round(seconds, 3),
+        "rows": rows,
+    })
+    try:
+        with _lock:
+            if os.path.exists(path) and os.path.getsize(path) > settings.QUERY_LOG_MAX_BYTES:
+                os.replace(path, f"{path}.1")
+            with open(path, "a") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        logger.error(f"Error writing query log {path}: {e}")
+
+
+def read_query_log(path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield logged queries, oldest first, including the rotated <path>.1.
+    Unreadable lines are skipped.
+    """
+    path = path or settings.QUERY_LOG_PATH
+    for name in (f"{path}.1", path):
+        if not os.path.exists(name):
+            continue
+        with open(name, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
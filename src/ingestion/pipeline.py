@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+src/ingestion/pipeline.py
+
+Streaming, checkpointed schema ingestion: fetch -> text -> embed -> index.
+
+Tables are processed in fixed-size batches (settings.INGEST_BATCH_SIZE), so
+only one batch of schemas, docs and embeddings is held in memory at a time.
+Each finished batch is written as a part file under the checkpoint
+directory (<vectorstore_path>_ingest by default):
+
+  - plan.json           : dataset, embedding model, batch size, table list
+  - part-NNNNN.npy      : the batch's embeddings
+  - part-NNNNN.json     : the batch's texts, metadatas and column names,
+                          written last, so its presence marks the batch done
+
+An interrupted run resumes from the parts already written, provided the
+plan (dataset, model, batch size, tables) is unchanged. The index stage
+then appends the parts to the vector store one at a time and builds the join
+graph; the checkpoint directory is removed once the store is saved.
+
+Summary tables proposed by scripts/analyze_query_log.py that exist in the
+dataset get a note in their doc text and are registered next to the store
+(see src/rag/summary_tables.py), so retrieval puts them first.
+
+Per-stage throughput (items/s) is logged and returned.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import settings
+from src.embeddings.embedder import embed_texts
+from src.embeddings.pool import EmbeddingPool
+from src.rag.join_graph import build_join_graph, save_join_graph
+from src.rag.summary_tables import save_summary_tables, summary_note
+
+logger = logging.getLogger(__name__)
+
+PLAN_FILENAME = "plan.json"
+STAGES = ("fetch", "text", "embed", "index")
+
+
+class StageStats:
+    """
+    Items processed and seconds spent per pipeline stage.
+    """
+
+    def __init__(self):
+        self.items = {stage: 0 for stage in STAGES}
+        self.seconds = {stage: 0.0 for stage in STAGES}
+
+    @contextmanager
+    def measure(self, stage: str, items: int) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+            self.items[stage] += items
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                "items": self.items[stage],
+                "seconds": round(self.seconds[stage], 3),
+                "items_per_sec": round(self.items[stage] / self.seconds[stage], 1) if self.seconds[stage] else 0.0,
+            }
+            for stage in STAGES
+        }
+
+
+def schema_to_text(table_name: str, fields: list) -> str:
+    """Convert schema fields into a human-readable text document."""
+    lines = [f"Table: {table_name}", "Columns:"]
+    for field in fields:
+        lines.append(f"- {field.name} ({field.field_type})")
+    return "\n".join(lines)
+
+
+def _write_json(path: str, data: Any) -> None:
+    # Write then rename, so a crash never leaves a half-written file behind
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _part_paths(checkpoint_dir: str, batch: int) -> Tuple[str, str]:
+    base = os.path.join(checkpoint_dir, f"part-{batch:05d}")
+    return f"{base}.npy", f"{base}.json"
+
+
+def _prepare_checkpoint(checkpoint_dir: str, plan: Dict[str, Any], resume: bool) -> int:
+    """
+    Start or resume a checkpoint directory for plan.
+    Returns the number of batches already done.
+    """
+    plan_path = os.path.join(checkpoint_dir, PLAN_FILENAME)
+    if resume and os.path.exists(plan_path):
+        with open(plan_path, "r") as f:
+            previous = json.load(f)
+        if previous == plan:
+            done = 0
+            while os.path.exists(_part_paths(checkpoint_dir, done)[1]):
+                done += 1
+            return done
+        logger.warning("Ingestion plan changed since the last checkpoint, starting over")
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir)
+    _write_json(plan_path, plan)
+    return 0
+
+
+def _fetch_schemas(client, dataset_id: str, tables: List[str]) -> Dict[str, list]:
+    """
+    Fetch the schemas of a batch of tables with concurrent metadata calls.
+    Tables dropped since they were listed are logged and skipped.
+
+    Raises:
+        RuntimeError: If any other table cannot be read, so the batch is not
+            checkpointed and a resumed run fetches it again.
+    """
+    from google.api_core.exceptions import NotFound
+
+    def fetch(table: str):
+        try:
+            return client.get_table(f"{dataset_id}.{table}").schema, None
+        except NotFound:
+            logger.warning(f"Table '{dataset_id}.{table}' no longer exists, skipping")
+            return None, None
+        except Exception as e:
+            logger.error(f"Error fetching table '{dataset_id}.{table}': {e}")
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=settings.INGEST_FETCH_WORKERS) as pool:
+        results = dict(zip(tables, pool.map(fetch, tables)))
+    failed = [t for t, (_, error) in results.items() if error is not None]
+    if failed:
+        raise RuntimeError(f"Error fetching tables {failed} from dataset '{dataset_id}'; rerun to resume.")
+    return {t: schema for t, (schema, _) in results.items() if schema is not None}
+
+
+def _iter_parts(checkpoint_dir: str, num_batches: int) -> Iterator[Tuple[np.ndarray, dict]]:
+    for batch in range(num_batches):
+        npy_path, json_path = _part_paths(checkpoint_dir, batch)
+        with open(json_path, "r") as f:
+            part = json.load(f)
+        yield np.load(npy_path), part
+
+
+def _build_index(
+    checkpoint_dir: str,
+    num_batches: int,
+    vs_path: str,
+    stats: StageStats
+) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """
+    Append every part to the configured vector store and save it.
+    Returns the column names and schema text per table for the join graph.
+    """
+    columns: Dict[str, List[str]] = {}
+    docs: Dict[str, str] = {}
+    numpy_store = settings.VECTOR_STORE_TYPE.lower() == "numpy"
+    store = None
+    if numpy_store:
+        from src.store.numpy_store import NumpyVectorStore
+        store = NumpyVectorStore(vs_path)
+        store.clear()
+    embedding_fn = lambda txt: embed_texts([txt])[0]
+
+    for embeddings, part in _iter_parts(checkpoint_dir, num_batches):
+        texts, metadatas = part["texts"], part["metadatas"]
+        columns.update(part["columns"])
+        docs.update((m["table"], t) for m, t in zip(metadatas, texts))
+        if not texts:
+            continue
+        with stats.measure("index", len(texts)):
+            if numpy_store:
+                store.add_embeddings(texts, metadatas, embeddings)
+            elif store is None:
+                from langchain.vectorstores import FAISS
+                store = FAISS.from_embeddings(
+                    list(zip(texts, embeddings)), embedding=embedding_fn, metadatas=metadatas
+                )
+            else:
+                store.add_embeddings(list(zip(texts, embeddings)), metadatas=metadatas)
+
+    if store is None or (numpy_store and not store.texts):
+        raise RuntimeError("No schema documents were ingested; nothing to index.")
+    with stats.measure("index", 0):
+        if numpy_store:
+            store.save()
+        else:
+            store.save_local(vs_path)
+    return columns, docs
+
+
+def run_ingestion(
+    client,
+    dataset_id: str,
+    vs_path: str,
+    constraints: Optional[List[dict]] = None,
+    batch_size: Optional[int] = None,
+    checkpoint_dir: Optional[str] = None,
+    resume: bool = True,
+    qualify_tables: bool = False,
+    summaries: Optional[List[dict]] = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    Ingest every table of dataset_id into the vector store at vs_path and
+    save its join graph. Resumes from checkpoint_dir when possible.
+    With qualify_tables, doc texts name tables as <dataset>.<table> (used for
+    per-dataset shards, where the SQL must say which dataset it reads).
+    summaries are summary table proposals (src/rag/summary_tables.py); the
+    ones found in the dataset are annotated and registered with the store.
+    Returns per-stage throughput (see StageStats.report).
+
+    Raises:
+        RuntimeError: If the dataset has no readable tables, or a batch
+            fails (earlier batches stay checkpointed for the next run).
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    checkpoint_dir = checkpoint_dir or f"{vs_path.rstrip(os.sep)}_ingest"
+    summaries = summaries or []
+    summary_by_name = {s["name"]: s for s in summaries}
+    stats = StageStats()
+
+    with stats.measure("fetch", 0):
+        tables = sorted(t.table_id for t in client.list_tables(dataset_id))
+    if not tables:
+        raise RuntimeError(f"No tables found in dataset '{dataset_id}'.")
+    plan = {
+        "dataset": dataset_id,
+        "embedding_model": settings.EMBEDDING_MODEL,
+        "batch_size": batch_size,
+        "qualify_tables": qualify_tables,
+        "summaries": sorted(summary_by_name),
+        "tables": tables,
+    }
+    num_batches = -(-len(tables) // batch_size)
+    done = _prepare_checkpoint(checkpoint_dir, plan, resume)
+    if done:
+        logger.info(f"Resuming ingestion at batch {done + 1}/{num_batches}")
+
+    with EmbeddingPool() as pool:
+        for batch in range(done, num_batches):
+            names = tables[batch * batch_size:(batch + 1) * batch_size]
+            with stats.measure("fetch", len(names)):
+                schemas = _fetch_schemas(client, dataset_id, names)
+            with stats.measure("text", len(schemas)):
+                texts = [
+                    schema_to_text(f"{dataset_id}.{t}" if qualify_tables else t, fields)
+                    for t, fields in schemas.items()
+                ]
+                texts = [
+                    f"{text}\n{summary_note(summary_by_name[t])}" if t in summary_by_name else text
+                    for t, text in zip(schemas, texts)
+                ]
+                metadatas = [{"table": t} for t in schemas]
+            with stats.measure("embed", len(texts)):
+                embeddings = pool.embed(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+
+            npy_path, json_path = _part_paths(checkpoint_dir, batch)
+            np.save(npy_path, embeddings)
+            _write_json(json_path, {
+                "texts": texts,
+                "metadatas": metadatas,
+                "columns": {t: [f.name for f in fields] for t, fields in schemas.items()},
+            })
+            logger.info(f"Ingested batch {batch + 1}/{num_batches}: {stats.report()}")
+
+    columns, docs = _build_index(checkpoint_dir, num_batches, vs_path, stats)
+    save_join_graph(build_join_graph(columns, constraints, docs=docs), vs_path)
+    save_summary_tables(summaries, docs, vs_path)
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+    report = stats.report()
+    logger.info(f"Ingestion finished: {report}")
+    return report
@@ -2,11 +2,12 @@
 
 # src/rag/generator.py
 
-from typing import List
-from langchain.schema import Document
-from src.sql_generator import generate_sql as _generate_sql
+from typing import List, TYPE_CHECKING
 
-def generate_sql(docs: List[Document], question: str) -> str:
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+def generate_sql(docs: List["Document"], question: str) -> str:
     """
     Given a list of retrieved schema Documents and a user question,
     build a schema context string and generate a BigQuery SQL query.
@@ -17,5 +18,6 @@ def generate_sql(docs: List[Document], question: str) -> str:
     # Concatenate each document's text into a single schema context
     schema_context = "\n\n".join(doc.page_content for doc in docs)
 
-    # Delegate to the core generator that uses the LLM
+    # Delegate to the core generator that uses the LLM (imported on demand)
+    from src.sql_generator import generate_sql as _generate_sql
     return _generate_sql(schema_context, question)
\ No newline at end of file
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+src/rag/join_graph.py
+
+Join graph between schema tables, built at ingestion time and used during
+retrieval to add the "bridge" tables that connect independently retrieved
+hits (e.g. order_items between orders and products).
+
+Edges come from three sources, strongest first:
+  - declared PRIMARY KEY / FOREIGN KEY constraints
+  - name heuristics (orders.customer_id -> customers)
+  - shared key-like columns (*_id, *_key, *_code) present in both tables
+
+The graph is persisted as JSON next to the vector store, together with the
+schema text of each table so connector docs can be added without a search.
+"""
+
+import os
+import json
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+JOIN_GRAPH_FILENAME = "join_graph.json"
+
+# Column suffixes treated as join keys when shared between tables
+_KEY_SUFFIXES = ("_id", "_key", "_code")
+
+# path -> (mtime, graph)
+_graph_cache: Dict[str, Tuple[float, dict]] = {}
+
+
+def _table_aliases(table: str) -> List[str]:
+    """
+    Singular/plural spellings a foreign key column might use for a table.
+    """
+    name = table.lower()
+    aliases = {name}
+    if name.endswith("ies"):
+        aliases.add(name[:-3] + "y")
+    elif name.endswith("s"):
+        aliases.add(name[:-1])
+    return list(aliases)
+
+
+def _add_edge(edges: Dict[str, Dict[str, List[str]]], a: str, b: str, label: str) -> None:
+    if a == b:
+        return
+    for src, dst in ((a, b), (b, a)):
+        labels = edges.setdefault(src, {}).setdefault(dst, [])
+        if label not in labels:
+            labels.append(label)
+
+
+def build_join_graph(
+    columns: Dict[str, List[str]],
+    constraints: Optional[Iterable[dict]] = None,
+    docs: Optional[Dict[str, str]] = None
+) -> dict:
+    """
+    Build the join graph.
+
+    Args:
+        columns: table name -> list of column names
+        constraints: rows with keys constraint_type, table_name, column_name,
+            ref_table, ref_column (from INFORMATION_SCHEMA)
+        docs: table name -> schema text, stored for connector expansion
+
+    Returns:
+        {"edges": {table: {neighbor: [join labels]}}, "docs": {...}}
+    """
+    edges: Dict[str, Dict[str, List[str]]] = {}
+    lower_cols = {t: {c.lower() for c in cols} for t, cols in columns.items()}
+
+    # 1) Declared foreign keys
+    for row in constraints or ():
+        if row.get("constraint_type") != "FOREIGN KEY":
+            continue
+        a, b = row.get("table_name"), row.get("ref_table")
+        if a in columns and b in columns:
+            _add_edge(edges, a, b, f"{a}.{row['column_name']} = {b}.{row['ref_column']}")
+
+    # 2) Name heuristics: <table>_id in another table
+    alias_to_table = {}
+    for table in columns:
+        for alias in _table_aliases(table):
+            alias_to_table[alias] = table
+    for table, cols in lower_cols.items():
+        for col in cols:
+            for suffix in _KEY_SUFFIXES:
+                if not col.endswith(suffix):
+                    continue
+                target = alias_to_table.get(col[: -len(suffix)])
+                if target is None or target == table:
+                    continue
+                target_col = col if col in lower_cols[target] else suffix.lstrip("_")
+                _add_edge(edges, table, target, f"{table}.{col} = {target}.{target_col}")
+
+    # 3) Shared key-like columns
+    tables = sorted(columns)
+    for i, a in enumerate(tables):
+        for b in tables[i + 1:]:
+            for col in sorted(lower_cols[a] & lower_cols[b]):
+                if col.endswith(_KEY_SUFFIXES):
+                    _add_edge(edges, a, b, f"{a}.{col} = {b}.{col}")
+
+    return {"edges": edges, "docs": dict(docs or {})}
+
+
+def save_join_graph(graph: dict, vs_path: str) -> str:
+    """
+    Write the graph to <vs_path>/join_graph.json and return the file path.
+    """
+    os.makedirs(vs_path, exist_ok=True)
+    path = os.path.join(vs_path, JOIN_GRAPH_FILENAME)
+    with open(path, "w") as f:
+        json.dump(graph, f)
+    return path
+
+
+def load_join_graph(vs_path: str) -> Optional[dict]:
+    """
+    Load the graph saved next to a vector store, or None if there is none.
+    The parsed graph is cached until the file changes.
+    """
+    path = os.path.join(vs_path, JOIN_GRAPH_FILENAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _graph_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r") as f:
+        graph = json.load(f)
+    _graph_cache[path] = (mtime, graph)
+    return graph
+
+
+def shortest_path(graph: dict, start: str, goal: str, max_hops: int) -> Optional[List[str]]:
+    """
+    Breadth-first shortest path from start to goal (inclusive), or None if
+    the tables are not connected within max_hops edges.
+    """
+    edges = graph.get("edges", {})
+    if start not in edges or goal not in edges:
+        return None
+    parents = {start: None}
+    frontier = deque([(start, 0)])
+    while frontier:
+        node, depth = frontier.popleft()
+        if node == goal:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = parents[node]
+            return path[::-1]
+        if depth >= max_hops:
+            continue
+        for nxt in edges[node]:
+            if nxt not in parents:
+                parents[nxt] = node
+                frontier.append((nxt, depth + 1))
+    return None
+
+
+def connector_tables(graph: dict, tables: List[str], max_hops: int) -> List[str]:
+    """
+    Return tables that lie on shortest paths between pairs of the given
+    tables but are not themselves in the list, shortest paths first.
+    """
+    paths = []
+    for i, a in enumerate(tables):
+        for b in tables[i + 1:]:
+            path = shortest_path(graph, a, b, max_hops)
+            if path and len(path) > 2:
+                paths.append(path)
+    connectors: List[str] = []
+    for path in sorted(paths, key=len):
+        for table in path[1:-1]:
+            if table not in tables and table not in connectors:
+                connectors.append(table)
+    return connectors
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token).
+    """
+    return len(text) // 4 + 1
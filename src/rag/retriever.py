@@ -1,28 +1,166 @@
 import os
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 from src.config import settings
-from src.embedder import embed_texts
-from langchain.vectorstores import FAISS
-from langchain.schema import Document
+from src.embeddings.embedder import embed_texts
+from src.rag.join_graph import load_join_graph, connector_tables, estimate_tokens
+from src.rag.summary_tables import prioritize_summaries
+from src.store.vector_store import LocalVectorStore, ROUTER_DIRNAME, SHARDS_DIRNAME
 
-def retrieve_schema_docs(question: str, top_k: int = None) -> List[Document]:
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+# (name, mtime_ns, size) of every file in a store directory
+StoreSignature = Optional[Tuple[Tuple[str, int, int], ...]]
+
+# vs_path -> (signature, store); reloaded when a file in the store changes
+_store_cache: Dict[str, Tuple[StoreSignature, Any]] = {}
+
+# vs_path -> (router signature, sharded store); re-created when the router is rebuilt
+_sharded_cache: Dict[str, Tuple[StoreSignature, LocalVectorStore]] = {}
+
+def clear_store_cache() -> None:
     """
-    Retrieve the top-k relevant schema documents for a natural language question.
-    Embeds the question, loads the FAISS vector store, and performs a similarity search.
+    Drop loaded vector stores so the next retrieval reloads from disk.
     """
-    # Determine vector store path (override via VECTORSTORE_PATH env var)
-    vs_path = os.getenv("VECTORSTORE_PATH", "./vector_store")
+    _store_cache.clear()
+    _sharded_cache.clear()
 
-    # Load the FAISS vector store saved by ingest_schema.py
+def _store_signature(vs_path: str) -> StoreSignature:
+    # Per-file mtime and size: save_local() overwrites index files in place,
+    # which leaves the directory's own mtime unchanged
     try:
-        # embedding_function is used internally if you call similarity_search(text)
-        store = FAISS.load_local(vs_path, embedding_function=embed_texts)
+        with os.scandir(vs_path) as entries:
+            files = [(e.name, e.stat()) for e in entries if e.is_file()]
+    except OSError:
+        return None
+    return tuple(sorted((name, st.st_mtime_ns, st.st_size) for name, st in files))
+
+def load_store(vs_path: str):
+    """
+    Load the vector store saved by ingest_schema.py (FAISS, or the NumPy
+    engine when settings.VECTOR_STORE_TYPE is "numpy"), reusing the
+    in-memory copy until files in the store directory change.
+    """
+    signature = _store_signature(vs_path)
+    cached = _store_cache.get(vs_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    try:
+        if settings.VECTOR_STORE_TYPE.lower() == "numpy":
+            from src.store.numpy_store import NumpyVectorStore
+            store = NumpyVectorStore(vs_path)
+            if store.matrix is None:
+                raise RuntimeError("no embeddings.npy/docs.json found")
+            store.embedding_fn = embed_texts
+        else:
+            # langchain is heavy to import; defer it until the store is needed
+            from langchain.vectorstores import FAISS
+            # embedding_function is used internally if you call similarity_search(text)
+            store = FAISS.load_local(vs_path, embedding_function=embed_texts)
     except Exception as e:
         raise RuntimeError(f"Failed to load vector store at '{vs_path}': {e}")
+    _store_cache[vs_path] = (signature, store)
+    return store
+
+def is_sharded(vs_path: str) -> bool:
+    """
+    True if vs_path holds per-dataset shards (see src/store/vector_store.py).
+    """
+    return os.path.isdir(os.path.join(vs_path, SHARDS_DIRNAME))
+
+def load_sharded_store(vs_path: str) -> LocalVectorStore:
+    """
+    Return the sharded store at vs_path. Shards load lazily; a new store
+    (with an empty shard cache) is created after re-ingestion rebuilds the router.
+    """
+    signature = _store_signature(os.path.join(vs_path, ROUTER_DIRNAME))
+    cached = _sharded_cache.get(vs_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    store = LocalVectorStore(vs_path)
+    _sharded_cache[vs_path] = (signature, store)
+    return store
+
+def expand_with_connectors(docs: List["Document"], vs_path: str) -> List["Document"]:
+    """
+    Append schema docs for the connector tables that join the retrieved
+    tables together, using the join graph saved at ingestion.
+    Connectors on the shortest paths are added first, until
+    settings.JOIN_TOKEN_BUDGET is spent.
+    """
+    from langchain.schema import Document
+
+    graph = load_join_graph(vs_path)
+    if not graph:
+        return docs
+
+    tables = [d.metadata.get("table") for d in docs if d.metadata.get("table")]
+    if len(tables) < 2:
+        return docs
+
+    budget = settings.JOIN_TOKEN_BUDGET
+    expanded = list(docs)
+    for table in connector_tables(graph, tables, settings.JOIN_MAX_HOPS):
+        text = graph.get("docs", {}).get(table)
+        if not text:
+            continue
+        cost = estimate_tokens(text)
+        if cost > budget:
+            break
+        budget -= cost
+        expanded.append(Document(page_content=text, metadata={"table": table, "connector": True}))
+    return expanded
+
+def retrieve_schema_docs(question: str, top_k: int = None, dataset: Optional[str] = None) -> List["Document"]:
+    """
+    Retrieve the top-k relevant schema documents for a natural language question.
+    Embeds the question, loads the vector store, and performs a similarity search.
+    If a join graph was saved with the store, connector tables linking the
+    hits are appended (see expand_with_connectors). Summary tables registered
+    for a retrieved table are moved to the front (settings.SUMMARY_ROUTING).
+
+    On a sharded store, only the dataset shard is searched if given, otherwise
+    the shards picked by the router.
+
+    Raises:
+        KeyError: If dataset names no shard of the store.
+    """
+    # Determine vector store path (override via VECTORSTORE_PATH env var)
+    vs_path = os.getenv("VECTORSTORE_PATH", "./vector_store")
 
     # Number of docs to retrieve
     k = top_k or settings.TOP_K
 
+    if is_sharded(vs_path):
+        store = load_sharded_store(vs_path)
+        docs = store.query(question, k, shard=dataset)
+        if not (settings.JOIN_EXPANSION or settings.SUMMARY_ROUTING):
+            return docs
+        # Expand within each shard, using that shard's join graph and summaries
+        by_shard: Dict[str, List["Document"]] = {}
+        for doc in docs:
+            by_shard.setdefault(doc.metadata["shard"], []).append(doc)
+        expanded, summaries = [], []
+        for name, shard_docs in by_shard.items():
+            shard_path = store.shard_path(name)
+            if settings.JOIN_EXPANSION:
+                shard_docs = expand_with_connectors(shard_docs, shard_path)
+            if settings.SUMMARY_ROUTING:
+                shard_docs = prioritize_summaries(shard_docs, shard_path)
+                for doc in shard_docs:
+                    if "summary_of" in doc.metadata:
+                        doc.metadata["shard"] = name
+                        summaries.append(doc)
+            expanded.extend(d for d in shard_docs if "summary_of" not in d.metadata)
+        return summaries + expanded
+
+    if dataset and dataset != settings.BIGQUERY_DATASET:
+        raise KeyError(f"Unknown vector store shard '{dataset}'")
+
+    # Load (or reuse) the FAISS vector store saved by ingest_schema.py
+    store = load_store(vs_path)
+
     # Perform retrieval. Try text-based first, then fallback to raw vector.
     try:
         docs = store.similarity_search(question, k=k)
@@ -30,4 +168,12 @@ def retrieve_schema_docs(question: str, top_k: int = None) -> List[Document]:
         query_emb = embed_texts([question])[0]
         docs = store.similarity_search_by_vector(query_emb, k)
 
-    return docs
\ No newline at end of file
+    # Add bridge tables so multi-table questions can be joined
+    if settings.JOIN_EXPANSION:
+        docs = expand_with_connectors(docs, vs_path)
+
+    # Point the generator at pre-aggregated tables before the fact tables they summarize
+    if settings.SUMMARY_ROUTING:
+        docs = prioritize_summaries(docs, vs_path)
+
+    return docs
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+src/rag/summary_tables.py
+
+Summary tables (materialized views or pre-aggregated tables) for frequent
+aggregation patterns found in the query log, and their use in retrieval.
+
+  - query_shape() reduces an aggregation query over a single table to its
+    source table, dimensions (GROUP BY and filter columns) and measures.
+  - propose_summary_tables() clusters logged queries by shape, folds each
+    shape into a proposal whose dimensions cover it, and returns proposals
+    with their CREATE statement, ranked by bytes scanned.
+  - At ingestion, summary tables that exist in the dataset get a note in
+    their schema doc saying what they summarize and how to re-aggregate
+    each measure; the registry is saved next to the vector store as JSON.
+  - At retrieval, prioritize_summaries() puts the summary docs of any
+    retrieved source table first, so the generator reads the summary
+    instead of scanning the fact table.
+
+Parsing is regex-based like src/utils/sql_parsing.py: joins, subqueries,
+set operations and COUNT(DISTINCT ...) are not summarized.
+"""
+
+import os
+import re
+import json
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from src.config import settings
+from src.utils.sql_parsing import extract_table_refs, normalize_table_name, protect_literals, restore_literals
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+SUMMARY_TABLES_FILENAME = "summary_tables.json"
+
+# Summary table names longer than this are shortened with a hash
+_MAX_NAME_LENGTH = 64
+
+_AGGREGATE = re.compile(r"\b(COUNT|COUNTIF|SUM|AVG|MIN|MAX)\s*\(", re.IGNORECASE)
+_CLAUSE_END = r"(?=\b(?:GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|QUALIFY|WINDOW)\b|$)"
+_WHERE = re.compile(rf"\bWHERE\b(.*?){_CLAUSE_END}", re.IGNORECASE | re.DOTALL)
+_GROUP_BY = re.compile(r"\bGROUP\s+BY\b(.*?)(?=\b(?:HAVING|ORDER\s+BY|LIMIT|QUALIFY|WINDOW)\b|$)", re.IGNORECASE | re.DOTALL)
+_HAVING = re.compile(r"\bHAVING\b(.*?)(?=\b(?:ORDER\s+BY|LIMIT|QUALIFY|WINDOW)\b|$)", re.IGNORECASE | re.DOTALL)
+# Column-like words, skipping function names and string placeholders
+_IDENTIFIER = re.compile(r"\b(?!__str\d+__)([A-Za-z_]\w*)\b(?!\s*\()")
+_ALIAS = re.compile(r"^(.*?[\w)`\]])\s+(?:AS\s+)?([A-Za-z_]\w*)$", re.IGNORECASE | re.DOTALL)
+
+# Words in WHERE clauses that are not column names
+_NOT_COLUMNS = {
+    "and", "or", "not", "in", "is", "null", "between", "like", "true", "false",
+    "case", "when", "then", "else", "end", "interval", "date", "datetime",
+    "timestamp", "time", "day", "week", "month", "quarter", "year", "hour",
+    "minute", "second", "current_date", "current_timestamp", "current_datetime",
+    "unnest", "exists", "select", "any", "all", "escape", "as", "int64",
+    "float64", "numeric", "bignumeric", "string", "bytes", "bool", "from",
+}
+# WHERE predicates that become summary dimensions: equality / IN / IS tests
+# of a column against literals. Ranges, LIKE, numeric equality and *_id
+# columns are too fine-grained, so such filters must be on a GROUP BY column.
+_FILTER_LITERAL = r"(?:__str\d+__|true|false)"
+_FILTER_PREDICATES = [
+    re.compile(rf"^([a-z_]\w*)\s*(?:=|!=|<>)\s*{_FILTER_LITERAL}$"),
+    re.compile(rf"^{_FILTER_LITERAL}\s*(?:=|!=|<>)\s*([a-z_]\w*)$"),
+    re.compile(rf"^([a-z_]\w*)\s+(?:not\s+)?in\s*\(\s*{_FILTER_LITERAL}(?:\s*,\s*{_FILTER_LITERAL})*\s*\)$"),
+    re.compile(r"^([a-z_]\w*)\s+is\s+(?:not\s+)?(?:null|true|false)$"),
+]
+_ID_COLUMN = re.compile(r"(?:^|_)id$")
+
+# Trailing words of a select item that are not an alias
+_NOT_ALIASES = {"end", "null", "true", "false"}
+
+# Dimensions that need no alias in the summary table
+_PLAIN_COLUMN = re.compile(r"^[a-z_]\w*$")
+
+
+def _split_top_level(text: str) -> List[str]:
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _closing_paren(text: str, open_idx: int) -> int:
+    depth = 0
+    for i in range(open_idx, len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def _split_top_level_on(text: str, word: str) -> List[str]:
+    # Split on a keyword (AND / OR) outside parentheses
+    parts, depth, start = [], 0, 0
+    for m in re.finditer(rf"[()]|\b{word}\b", text):
+        if m.group(0) == "(":
+            depth += 1
+        elif m.group(0) == ")":
+            depth -= 1
+        elif depth == 0:
+            parts.append(text[start:m.start()])
+            start = m.end()
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _unwrap(text: str) -> str:
+    # Drop parentheses around the whole predicate
+    while text.startswith("(") and _closing_paren(text, 0) == len(text) - 1:
+        text = text[1:-1].strip()
+    return text
+
+
+def _filter_column(predicate: str) -> Optional[str]:
+    """
+    The column of an equality / IN / IS filter on literals, or None.
+    """
+    for pattern in _FILTER_PREDICATES:
+        m = pattern.match(predicate)
+        if m and m.group(1) not in _NOT_COLUMNS and not _ID_COLUMN.search(m.group(1)):
+            return m.group(1)
+    return None
+
+
+def _column_name(expr: str) -> str:
+    name = re.sub(r"\W+", "_", expr).strip("_").lower()
+    return name or "value"
+
+
+def query_shape(sql: str) -> Optional[Dict[str, Any]]:
+    """
+    Describe an aggregation over a single table as
+    {"table", "dimensions", "measures"}, or None if the query is not one
+    (no aggregate, joins, subqueries, DISTINCT aggregates, sampled preview
+    runs, ...). Dimensions are the GROUP BY expressions plus the columns of
+    equality / IN filters in WHERE; any other filter must be on a GROUP BY
+    column. Measures are the aggregate calls, normalized to FUNC(args).
+    """
+    cleaned, literals = protect_literals(sql)
+    cleaned = re.sub(r"\s+", " ", cleaned).strip()
+    if len(re.findall(r"\bSELECT\b", cleaned, re.IGNORECASE)) != 1:
+        return None
+    if re.search(r"\b(?:JOIN|UNION|INTERSECT|EXCEPT|UNNEST|OVER|TABLESAMPLE)\b", cleaned, re.IGNORECASE):
+        return None
+    refs = extract_table_refs(sql)
+    m = re.match(r"SELECT\s+(.*?)\s+FROM\s+(`[^`]+`|[\w.\-]+)(.*)$", cleaned, re.IGNORECASE | re.DOTALL)
+    if len(refs) != 1 or not m:
+        return None
+    select_text, rest = m.group(1), m.group(3)
+
+    # Drop qualifiers such as o.amount or orders.amount
+    qualifiers = {normalize_table_name(refs[0])}
+    alias = re.match(r"\s+(?:AS\s+)?([A-Za-z_]\w*)", rest, re.IGNORECASE)
+    if alias and alias.group(1).upper() not in ("WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "QUALIFY", "WINDOW"):
+        qualifiers.add(alias.group(1).lower())
+    def norm(expr: str) -> str:
+        # Function calls such as EXTRACT(... FROM col) are put back; strings stay placeholders
+        expr = re.sub(r"__fn\d+__", lambda m: literals[m.group(0)], expr)
+        expr = re.sub(rf"\b(?:{'|'.join(map(re.escape, qualifiers))})\s*\.\s*", "", expr, flags=re.IGNORECASE)
+        return re.sub(r"\s*([(),])\s*", r"\1", expr).replace(",", ", ").lower()
+
+    items, aliases = [], {}
+    for item in _split_top_level(select_text):
+        am = _ALIAS.match(item)
+        if am and am.group(2).lower() not in _NOT_ALIASES:
+            item = am.group(1)
+            aliases[am.group(2).lower()] = norm(item)
+        items.append(norm(item))
+
+    measures = set()
+    having = _HAVING.search(rest)
+    if having:
+        items_and_having = items + [norm(having.group(1))]
+    else:
+        items_and_having = items
+    for text in items_and_having:
+        for am in _AGGREGATE.finditer(text):
+            close = _closing_paren(text, am.end() - 1)
+            args = text[am.end():close].strip()
+            if close < 0 or re.match(r"distinct\b", args):
+                return None
+            measures.add(f"{am.group(1).upper()}({args})")
+    if not measures:
+        return None
+
+    dimensions = set()
+    group_by = _GROUP_BY.search(rest)
+    for expr in _split_top_level(group_by.group(1)) if group_by else []:
+        expr = norm(expr)
+        if expr.isdigit():
+            index = int(expr) - 1
+            if not 0 <= index < len(items):
+                return None
+            expr = items[index]
+        dimensions.add(aliases.get(expr, expr))
+    where = _WHERE.search(rest)
+    filters, other_columns = set(), set()
+    for conjunct in _split_top_level_on(norm(where.group(1)), "and") if where else []:
+        columns = [_filter_column(_unwrap(d)) for d in _split_top_level_on(_unwrap(conjunct), "or")]
+        if all(columns):
+            filters.update(columns)
+        else:
+            other_columns.update(c for c in _IDENTIFIER.findall(conjunct) if c not in _NOT_COLUMNS)
+    # A range or other fine-grained filter can only be answered on a dimension
+    if not other_columns <= dimensions:
+        return None
+    dimensions |= filters
+    return {
+        "table": refs[0],
+        "dimensions": sorted(restore_literals(d, literals) for d in dimensions),
+        "measures": sorted(restore_literals(m, literals) for m in measures),
+    }
+
+
+def _rollup(measure: str) -> Tuple[List[Tuple[str, str]], str]:
+    """
+    Columns a summary stores for measure, as (name, aggregate) pairs, and
+    the expression that re-aggregates them into the measure.
+    """
+    func, args = re.match(r"(\w+)\((.*)\)$", measure, re.DOTALL).groups()
+    arg_name = "rows" if args == "*" else _column_name(args)
+    if func == "COUNT" and args == "*":
+        return [("row_count", "COUNT(*)")], "SUM(row_count)"
+    if func in ("COUNT", "COUNTIF", "SUM"):
+        col = f"{func.lower()}_{arg_name}"
+        return [(col, measure)], f"SUM({col})"
+    if func == "AVG":
+        total, count = f"sum_{arg_name}", f"count_{arg_name}"
+        return [(total, f"SUM({args})"), (count, f"COUNT({args})")], f"SUM({total}) / SUM({count})"
+    col = f"{func.lower()}_{arg_name}"
+    return [(col, measure)], f"{func}({col})"
+
+
+def _summary_name(source: str, dimensions: List[str]) -> str:
+    dims = [_column_name(d) for d in dimensions]
+    name = f"agg_{normalize_table_name(source)}_" + ("by_" + "_".join(dims) if dims else "totals")
+    if len(name) > _MAX_NAME_LENGTH:
+        digest = hashlib.sha1(name.encode()).hexdigest()[:8]
+        name = f"{name[:_MAX_NAME_LENGTH - 9]}_{digest}"
+    return name
+
+
+def _create_statement(proposal: Dict[str, Any], kind: str) -> str:
+    source = proposal["table"]
+    dataset = source.rsplit(".", 1)[0] if "." in source else settings.BIGQUERY_DATASET
+    columns = [
+        expr if _PLAIN_COLUMN.match(expr) else f"{expr} AS {_column_name(expr)}"
+        for expr in proposal["dimensions"]
+    ]
+    columns += [f"{agg} AS {name}" for name, agg in proposal["columns"]]
+    create = "CREATE MATERIALIZED VIEW" if kind == "view" else "CREATE OR REPLACE TABLE"
+    sql = f"{create} `{dataset}.{proposal['name']}` AS\nSELECT\n  " + ",\n  ".join(columns)
+    sql += f"\nFROM `{source}`"
+    if proposal["dimensions"]:
+        sql += "\nGROUP BY " + ", ".join(str(i + 1) for i in range(len(proposal["dimensions"])))
+    return sql
+
+
+def propose_summary_tables(
+    entries: Iterable[Dict[str, Any]],
+    min_queries: Optional[int] = None,
+    max_dimensions: Optional[int] = None,
+    kind: str = "view"
+) -> List[Dict[str, Any]]:
+    """
+    Cluster query log entries (see src/execution/query_log.py) by shape and
+    propose one summary table per cluster that occurred at least
+    min_queries times, most bytes scanned first.
+
+    A shape is folded into an existing proposal for the same table whose
+    dimensions include its own, so one summary serves every coarser
+    grouping of the same measures. kind is "view" (CREATE MATERIALIZED
+    VIEW) or "table" (CREATE OR REPLACE TABLE ... AS).
+    """
+    min_queries = settings.SUMMARY_MIN_QUERIES if min_queries is None else min_queries
+    max_dimensions = max_dimensions or settings.SUMMARY_MAX_DIMENSIONS
+
+    clusters: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+    for entry in entries:
+        shape = query_shape(entry.get("sql", ""))
+        if shape is None or len(shape["dimensions"]) > max_dimensions:
+            continue
+        key = (shape["table"].lower(), tuple(shape["dimensions"]))
+        cluster = clusters.setdefault(key, {
+            "table": shape["table"],
+            "dimensions": shape["dimensions"],
+            "measures": set(),
+            "queries": 0,
+            "bytes_processed": 0,
+            "seconds": 0.0,
+            "example": entry["sql"],
+        })
+        cluster["measures"].update(shape["measures"])
+        cluster["queries"] += 1
+        cluster["bytes_processed"] += entry.get("bytes_processed") or 0
+        cluster["seconds"] += entry.get("seconds") or 0.0
+
+    # Widest groupings first, so narrower ones can fold into them
+    proposals: List[Dict[str, Any]] = []
+    for cluster in sorted(clusters.values(), key=lambda c: (-len(c["dimensions"]), -c["bytes_processed"])):
+        target = next((
+            p for p in proposals
+            if p["table"].lower() == cluster["table"].lower()
+            and set(cluster["dimensions"]) <= set(p["dimensions"])
+        ), None)
+        if target is None:
+            proposals.append(cluster)
+            continue
+        target["measures"] |= cluster["measures"]
+        for field in ("queries", "bytes_processed", "seconds"):
+            target[field] += cluster[field]
+
+    result = []
+    for proposal in proposals:
+        if proposal["queries"] < min_queries:
+            continue
+        proposal["measures"] = sorted(proposal["measures"])
+        columns, rollups = [], {}
+        for measure in proposal["measures"]:
+            stored, rollup = _rollup(measure)
+            columns.extend(c for c in stored if c not in columns)
+            rollups[measure] = rollup
+        proposal.update(
+            name=_summary_name(proposal["table"], proposal["dimensions"]),
+            columns=columns,
+            rollups=rollups,
+            seconds=round(proposal["seconds"], 3),
+        )
+        proposal["sql"] = _create_statement(proposal, kind)
+        result.append(proposal)
+    result.sort(key=lambda p: (p["bytes_processed"], p["queries"]), reverse=True)
+    return result
+
+
+def summary_note(summary: Dict[str, Any]) -> str:
+    """
+    Schema doc lines telling the generator what a summary table covers.
+    """
+    source = summary["table"]
+    dims = ", ".join(summary["dimensions"]) or "nothing (grand totals)"
+    rollups = "; ".join(f"{m} -> {r}" for m, r in summary["rollups"].items())
+    return (
+        f"Summary of {source}, pre-aggregated by {dims}.\n"
+        f"Prefer this table over {source} when the question only groups or filters by those columns. "
+        f"Re-aggregate its measures as: {rollups}"
+    )
+
+
+def save_summary_tables(summaries: List[Dict[str, Any]], docs: Dict[str, str], vs_path: str) -> Optional[str]:
+    """
+    Write the registry of ingested summary tables (those present in docs,
+    the schema text per table) to <vs_path>/summary_tables.json and return
+    its path. Without any, a previous registry is removed and None returned.
+    """
+    path = os.path.join(vs_path, SUMMARY_TABLES_FILENAME)
+    by_source: Dict[str, List[str]] = {}
+    summary_docs = {}
+    for summary in summaries:
+        if summary["name"] in docs:
+            by_source.setdefault(normalize_table_name(summary["table"]), []).append(summary["name"])
+            summary_docs[summary["name"]] = docs[summary["name"]]
+    if not summary_docs:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    os.makedirs(vs_path, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"by_source": by_source, "docs": summary_docs}, f)
+    return path
+
+
+# path -> (mtime, registry)
+_registry_cache: Dict[str, Tuple[float, dict]] = {}
+
+
+def load_summary_tables(vs_path: str) -> Optional[dict]:
+    """
+    Load the summary table registry saved next to a vector store, or None.
+    The parsed registry is cached until the file changes.
+    """
+    path = os.path.join(vs_path, SUMMARY_TABLES_FILENAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _registry_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r") as f:
+        registry = json.load(f)
+    _registry_cache[path] = (mtime, registry)
+    return registry
+
+
+def prioritize_summaries(docs: List["Document"], vs_path: str) -> List["Document"]:
+    """
+    Put the docs of the summary tables of every retrieved source table
+    first, ahead of the other retrieved docs.
+    """
+    registry = load_summary_tables(vs_path)
+    if not registry:
+        return docs
+    from langchain.schema import Document
+
+    summaries: List["Document"] = []
+    seen = set()
+    for doc in docs:
+        source = doc.metadata.get("table")
+        # Registry keys are lower-cased bare names; table ids keep their case
+        for name in registry["by_source"].get(normalize_table_name(source), []) if source else []:
+            if name in seen:
+                continue
+            seen.add(name)
+            summaries.append(Document(
+                page_content=registry["docs"][name],
+                metadata={"table": name, "summary_of": source}
+            ))
+    if not summaries:
+        return docs
+    return summaries + [d for d in docs if d.metadata.get("table") not in seen]
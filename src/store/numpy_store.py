@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+src/store/numpy_store.py
+
+Lightweight exact-search vector store for small catalogs (a few thousand
+schema docs), with no LangChain/FAISS overhead on the query path.
+
+Embeddings are L2-normalized and kept in one contiguous float32 (or float16)
+matrix; a query is a single matrix-vector (or matrix-matrix, for batches)
+product followed by argpartition. Doc texts and metadata live in flat lists.
+
+On disk (under the store path):
+  - embeddings.npy : (n_docs, dim) normalized matrix
+  - docs.json      : {"texts": [...], "metadatas": [...]}
+"""
+
+import os
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from src.config import settings
+from src.embeddings.embedder import embed_texts
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+EMBEDDINGS_FILENAME = "embeddings.npy"
+DOCS_FILENAME = "docs.json"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class NumpyVectorStore:
+    """
+    Exact cosine-similarity search over an in-memory NumPy matrix.
+    Offers the same add/query interface as LocalVectorStore, plus the
+    similarity_search / similarity_search_by_vector methods used by the retriever.
+    """
+
+    def __init__(self, path: Optional[str] = None, dtype: Optional[str] = None):
+        self.vs_path = path or os.getenv("VECTORSTORE_PATH", "./vector_store")
+        self.dtype = np.dtype(dtype or settings.VECTOR_STORE_DTYPE)
+        self.embedding_fn = embed_texts
+        self.matrix: Optional[np.ndarray] = None
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        # Normalized batches appended by add_embeddings, merged on save()
+        self._pending: List[np.ndarray] = []
+
+        # Attempt to load existing store
+        try:
+            self.load()
+        except (OSError, ValueError):
+            self.matrix = None
+
+    def load(self) -> None:
+        """
+        Load the matrix and docs saved under vs_path.
+        """
+        matrix = np.load(os.path.join(self.vs_path, EMBEDDINGS_FILENAME))
+        with open(os.path.join(self.vs_path, DOCS_FILENAME), "r") as f:
+            docs = json.load(f)
+        self.matrix = np.ascontiguousarray(matrix, dtype=self.dtype)
+        self.texts = docs["texts"]
+        self.metadatas = docs["metadatas"]
+
+    def save(self) -> None:
+        self._merge_pending()
+        os.makedirs(self.vs_path, exist_ok=True)
+        np.save(os.path.join(self.vs_path, EMBEDDINGS_FILENAME), self.matrix)
+        with open(os.path.join(self.vs_path, DOCS_FILENAME), "w") as f:
+            json.dump({"texts": self.texts, "metadatas": self.metadatas}, f)
+
+    def add(self, docs: List["Document"], embeddings: Optional[Sequence[Sequence[float]]] = None) -> None:
+        """
+        Replace the store contents with docs and persist.
+        Precomputed embeddings (one per doc) skip the embedding call.
+        """
+        texts = [d.page_content for d in docs]
+        vectors = embeddings if embeddings is not None else self.embedding_fn(texts)
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        self.matrix = np.ascontiguousarray(matrix, dtype=self.dtype)
+        self.texts = texts
+        self.metadatas = [dict(d.metadata) for d in docs]
+        self.save()
+
+    def clear(self) -> None:
+        """
+        Drop all docs in memory (the files on disk are replaced on save()).
+        """
+        self.matrix = None
+        self.texts = []
+        self.metadatas = []
+        self._pending = []
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]]
+    ) -> None:
+        """
+        Append already-embedded docs without persisting, e.g. batch by batch
+        during streaming ingestion. Call save() once all batches are added.
+        """
+        matrix = _normalize(np.asarray(embeddings, dtype=np.float32))
+        self._pending.append(matrix.astype(self.dtype, copy=False))
+        self.texts.extend(texts)
+        self.metadatas.extend(dict(m) for m in metadatas)
+
+    def _merge_pending(self) -> None:
+        if self._pending:
+            parts = ([self.matrix] if self.matrix is not None else []) + self._pending
+            self.matrix = np.ascontiguousarray(np.concatenate(parts))
+            self._pending = []
+
+    def search_by_vectors(self, vectors: Sequence[Sequence[float]], k: int) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k (doc index, cosine score) for each query vector, best first.
+        """
+        self._merge_pending()
+        if self.matrix is None:
+            raise RuntimeError(
+                f"Vector store not initialized at {self.vs_path}, call add() first."
+            )
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        queries = _normalize(queries).astype(self.dtype, copy=False)
+        scores = queries @ self.matrix.T  # (n_queries, n_docs)
+        n_docs = scores.shape[1]
+        k = min(k, n_docs)
+        if k < n_docs:
+            top = np.argpartition(scores, n_docs - k, axis=1)[:, n_docs - k:]
+        else:
+            top = np.broadcast_to(np.arange(n_docs), (scores.shape[0], n_docs))
+        results = []
+        for row, idx in zip(scores, top):
+            top_scores = row[idx]
+            order = np.argsort(top_scores)[::-1]
+            results.append(list(zip(idx[order].tolist(), top_scores[order].astype(float).tolist())))
+        return results
+
+    def _to_documents(self, hits: List[Tuple[int, float]]) -> List["Document"]:
+        from langchain.schema import Document
+        return [Document(page_content=self.texts[i], metadata=dict(self.metadatas[i])) for i, _ in hits]
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4) -> List["Document"]:
+        vector = np.asarray(embedding, dtype=np.float32)[None, :]
+        return self._to_documents(self.search_by_vectors(vector, k)[0])
+
+    def similarity_search(self, query: str, k: int = 4) -> List["Document"]:
+        return self.similarity_search_by_vector(self.embedding_fn([query])[0], k)
+
+    def query(self, query: str, k: Optional[int] = None) -> List["Document"]:
+        """
+        Perform a similarity search given a text query.
+        """
+        return self.similarity_search(query, k or settings.TOP_K)
+
+    def query_batch(self, queries: List[str], k: Optional[int] = None) -> List[List["Document"]]:
+        """
+        Search several text queries with one embedding call and one matmul.
+        """
+        vectors = np.asarray(self.embedding_fn(queries), dtype=np.float32)
+        return [self._to_documents(hits) for hits in self.search_by_vectors(vectors, k or settings.TOP_K)]
@@ -1,23 +1,95 @@
-
-
 #!/usr/bin/env python3
 """
 src/store/vector_store.py
 
-Abstracts a local vector store using FAISS or Chroma, with unified add/query interface.
+Abstracts a local vector store using FAISS, Chroma or the NumPy engine, with unified add/query interface.
+
+Sharded layout: when <path>/shards/ exists, each subdirectory is a complete
+store for one dataset or tenant, and <path>/router/ is a small NumPy index
+with one vector per shard (the normalized mean of the shard's embeddings).
+Queries go to the requested shard, or to the shards the router ranks
+highest. Shards are loaded lazily and the least recently used are evicted
+once their on-disk size exceeds settings.SHARD_CACHE_MAX_BYTES. Sharding
+supports FAISS and NumPy stores, not Chroma.
 """
 
 import os
-from typing import List, Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
 from src.config import settings
-from src.embedder import embed_texts
-from langchain.schema import Document
-from langchain.vectorstores import FAISS, Chroma
+from src.embeddings.embedder import embed_texts
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+SHARDS_DIRNAME = "shards"
+ROUTER_DIRNAME = "router"
+# Store types whose vectors and scores the sharded layout can read
+SHARDED_STORE_TYPES = ("faiss", "numpy")
+
+
+def _open_store(path: str, store_type: str, embedding_fn):
+    """
+    Load the store saved at path, or return None if there is none.
+    """
+    if store_type == "numpy":
+        from src.store.numpy_store import NumpyVectorStore
+        numpy_store = NumpyVectorStore(path)
+        return numpy_store if numpy_store.matrix is not None else None
+    if store_type == "chroma":
+        from langchain.vectorstores import Chroma
+        # For Chroma, pass persist_directory
+        try:
+            return Chroma(persist_directory=path, embedding_function=embedding_fn)
+        except Exception:
+            # no existing store or load failed
+            return None
+    # Default to FAISS
+    from langchain.vectorstores import FAISS
+    try:
+        return FAISS.load_local(path, embedding_function=embedding_fn)
+    except Exception:
+        return None
+
+
+def _dir_size(path: str) -> int:
+    # On-disk size approximates in-memory size for flat FAISS / NumPy indexes
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def _store_vectors(store) -> np.ndarray:
+    """
+    Return every embedding held by a FAISS or NumPy store.
+    """
+    if getattr(store, "matrix", None) is not None:
+        return np.asarray(store.matrix, dtype=np.float32)
+    return store.index.reconstruct_n(0, store.index.ntotal)
+
+
+def _scored_search(store, query_emb: List[float], k: int) -> List[Tuple[float, "Document"]]:
+    """
+    Top-k docs with a higher-is-better score, comparable across shards of
+    the same store type.
+    """
+    if hasattr(store, "search_by_vectors"):
+        hits = store.search_by_vectors([query_emb], k)[0]
+        docs = store._to_documents(hits)
+        return [(score, doc) for (_, score), doc in zip(hits, docs)]
+    # FAISS returns L2 distances (lower is better)
+    return [(-dist, doc) for doc, dist in store.similarity_search_with_score_by_vector(query_emb, k)]
+
 
 class LocalVectorStore:
     """
-    A wrapper around a local vector store (FAISS or Chroma).
-    Select via settings.VECTOR_STORE_TYPE ("faiss" or "chroma").
+    A wrapper around a local vector store (FAISS, Chroma or NumPy).
+    Select via settings.VECTOR_STORE_TYPE ("faiss", "chroma" or "numpy").
     """
 
     def __init__(self, path: Optional[str] = None):
@@ -27,32 +99,161 @@ class LocalVectorStore:
         self.embedding_fn = embed_texts
         self.store = None
 
-        # Attempt to load existing store
-        if self.store_type == "chroma":
-            # For Chroma, pass persist_directory
-            try:
-                self.store = Chroma(
-                    persist_directory=self.vs_path,
-                    embedding_function=self.embedding_fn
-                )
-            except Exception:
-                # no existing store or load failed
-                self.store = None
-        else:
-            # Default to FAISS
-            try:
-                self.store = FAISS.load_local(
-                    self.vs_path,
-                    embedding_function=self.embedding_fn
-                )
-            except Exception:
-                self.store = None
-
-    def add(self, docs: List[Document]) -> None:
+        # Loaded shards, least recently used first: name -> (size_bytes, store)
+        self._shards: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._shards_lock = threading.Lock()
+        self._router = None
+
+        # Attempt to load existing store (sharded stores load lazily)
+        if not self.is_sharded:
+            self.store = _open_store(self.vs_path, self.store_type, self.embedding_fn)
+
+    # --- Sharding ---
+
+    @property
+    def is_sharded(self) -> bool:
+        return os.path.isdir(os.path.join(self.vs_path, SHARDS_DIRNAME))
+
+    def _require_shardable(self) -> None:
+        if self.store_type not in SHARDED_STORE_TYPES:
+            raise RuntimeError(
+                f"Sharded vector stores support {', '.join(SHARDED_STORE_TYPES)}, "
+                f"not VECTOR_STORE_TYPE='{self.store_type}'"
+            )
+
+    def shard_path(self, name: str) -> str:
+        """
+        Directory of shard name (which need not exist yet).
+
+        Raises:
+            KeyError: If name is not a plain directory name.
+        """
+        if not name or ".." in name or os.sep in name or "/" in name or (os.altsep and os.altsep in name):
+            raise KeyError(f"Invalid vector store shard name '{name}'")
+        return os.path.join(self.vs_path, SHARDS_DIRNAME, name)
+
+    def shard_names(self) -> List[str]:
+        root = os.path.join(self.vs_path, SHARDS_DIRNAME)
+        try:
+            return sorted(e.name for e in os.scandir(root) if e.is_dir())
+        except OSError:
+            return []
+
+    def loaded_shards(self) -> List[str]:
+        with self._shards_lock:
+            return list(self._shards)
+
+    def get_shard(self, name: str):
+        """
+        Return the store for shard name, loading it on first use and
+        evicting least recently used shards beyond SHARD_CACHE_MAX_BYTES.
+
+        Raises:
+            KeyError: If there is no such shard.
+            RuntimeError: If the store type cannot be sharded.
+        """
+        self._require_shardable()
+        with self._shards_lock:
+            if name in self._shards:
+                self._shards.move_to_end(name)
+                return self._shards[name][1]
+
+        # Only names found on disk, so a request can never point outside the store
+        if name not in self.shard_names():
+            raise KeyError(f"Unknown vector store shard '{name}'")
+        path = self.shard_path(name)
+        store = _open_store(path, self.store_type, self.embedding_fn)
+        if store is None:
+            raise KeyError(f"Unknown vector store shard '{name}'")
+        size = _dir_size(path)
+
+        with self._shards_lock:
+            self._shards[name] = (size, store)
+            self._shards.move_to_end(name)
+            total = sum(s for s, _ in self._shards.values())
+            # Always keep the shard just loaded, even if it alone exceeds the bound
+            while total > settings.SHARD_CACHE_MAX_BYTES and len(self._shards) > 1:
+                _, (evicted_size, _) = self._shards.popitem(last=False)
+                total -= evicted_size
+        return store
+
+    def route(self, query_emb: List[float], n: Optional[int] = None) -> List[str]:
+        """
+        Names of the n shards whose centroid is closest to the query.
+        Without a router index, or if none of its picks is still on disk,
+        every shard is a candidate.
+        """
+        n = n or settings.SHARD_ROUTER_TOP
+        if self._router is None:
+            from src.store.numpy_store import NumpyVectorStore
+            router = NumpyVectorStore(os.path.join(self.vs_path, ROUTER_DIRNAME), dtype="float32")
+            if router.matrix is None:
+                return self.shard_names()
+            self._router = router
+        hits = self._router.search_by_vectors([query_emb], n)[0]
+        # Shards deleted since the router was built are skipped
+        on_disk = set(self.shard_names())
+        names = [self._router.metadatas[i]["shard"] for i, _ in hits]
+        return [name for name in names if name in on_disk] or sorted(on_disk)
+
+    def build_router(self) -> None:
+        """
+        (Re)build the router index from the shards on disk.
+
+        Raises:
+            RuntimeError: If there are no shards, or the store type cannot be sharded.
+        """
+        self._require_shardable()
+        from langchain.schema import Document
+        from src.store.numpy_store import NumpyVectorStore
+        docs, centroids = [], []
+        for name in self.shard_names():
+            store = _open_store(self.shard_path(name), self.store_type, self.embedding_fn)
+            if store is None:
+                continue
+            vectors = _store_vectors(store)
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            centroids.append(vectors.mean(axis=0))
+            docs.append(Document(page_content=name, metadata={"shard": name}))
+        if not docs:
+            raise RuntimeError(f"No shards found under {self.vs_path}")
+        router = NumpyVectorStore(os.path.join(self.vs_path, ROUTER_DIRNAME), dtype="float32")
+        router.add(docs, embeddings=np.stack(centroids))
+        self._router = router
+
+    def query_shards(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        shards: Optional[List[str]] = None
+    ) -> List["Document"]:
+        """
+        Search the given shards (or the router's candidates) and merge the
+        hits by score. Each doc's metadata records its shard.
+        """
+        self._require_shardable()
+        top_k = k or settings.TOP_K
+        q_emb = self.embedding_fn([query])[0]
+        scored = []
+        for name in shards or self.route(q_emb):
+            for score, doc in _scored_search(self.get_shard(name), q_emb, top_k):
+                doc.metadata["shard"] = name
+                scored.append((score, doc))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [doc for _, doc in scored[:top_k]]
+
+    # --- Single store ---
+
+    def add(self, docs: List["Document"]) -> None:
         """
         Add a batch of Documents to the vector store and persist.
         """
-        if self.store_type == "chroma":
+        if self.store_type == "numpy":
+            from src.store.numpy_store import NumpyVectorStore
+            self.store = NumpyVectorStore(self.vs_path)
+            self.store.add(docs)
+        elif self.store_type == "chroma":
+            from langchain.vectorstores import Chroma
             # Overwrite or create new Chroma collection
             self.store = Chroma.from_documents(
                 docs,
@@ -62,16 +263,21 @@ class LocalVectorStore:
             self.store.persist()
         else:
             # Use FAISS
+            from langchain.vectorstores import FAISS
             self.store = FAISS.from_documents(
                 docs,
                 embedding_function=self.embedding_fn
             )
             self.store.save_local(self.vs_path)
 
-    def query(self, query: str, k: Optional[int] = None) -> List[Document]:
+    def query(self, query: str, k: Optional[int] = None, shard: Optional[str] = None) -> List["Document"]:
         """
         Perform a similarity search given a text query.
+        On a sharded store, search only shard if given, else the routed shards.
         """
+        if self.is_sharded:
+            return self.query_shards(query, k, [shard] if shard else None)
+
         if not self.store:
             raise RuntimeError(
                 f"Vector store not initialized at {self.vs_path}, call add() first."
@@ -84,4 +290,4 @@ class LocalVectorStore:
         except Exception:
             # Fallback to vector-based
             q_emb = self.embedding_fn([query])[0]
-            return self.store.similarity_search_by_vector(q_emb, top_k)
\ No newline at end of file
+            return self.store.similarity_search_by_vector(q_emb, top_k)
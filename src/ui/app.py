@@ -1,79 +1,339 @@
-
-
 #!/usr/bin/env python3
 """
 src/ui/app.py
 
 Streamlit UI for the Text2SQL RAG pipeline.
+
+Streamlit re-runs this script on every widget interaction, so:
+  - the vector store, embedding model and BigQuery client are loaded once
+    per server process with st.cache_resource;
+  - the last result is kept in st.session_state, so paging or picking
+    columns re-renders it without re-running the pipeline;
+  - only the selected page and columns are turned into a DataFrame;
+  - "Run in background" submits the SQL as a job (src/execution/jobs.py)
+    and polls it in a fragment, so the page stays responsive;
+  - "Preview" runs a sampled, approximate version of the SQL
+    (src/utils/sql_preview.py); "Run exact query" then runs the SQL that
+    was generated for it, without generating again.
 """
 
+import os
+from typing import Any, Dict, List, Optional
+
 import streamlit as st
 import pandas as pd
 
-from src.rag.retriever import retrieve_schema_docs
+from src.config import settings
+from src.rag.retriever import retrieve_schema_docs, is_sharded, load_sharded_store
 from src.rag.generator import generate_sql
 from src.utils.validation import validate_sql
+from src.utils.sql_preview import to_preview_sql
 from src.execution.bigquery_client import run_query
-from src.cache.redis_cache import get_cache, set_cache
+from src.execution import jobs
+from src.cache.redis_cache import get_query_result, cache_query_result, query_cache_key, record_question
+from src.utils.serialization import dataframe_to_records
+
+PAGE_SIZES = [50, 100, 500, 1000]
+# Columns shown by default; the rest can be added from the column picker
+DEFAULT_MAX_COLUMNS = 20
+# Dataset selector entry that lets the router pick shards
+ALL_DATASETS = "All datasets"
+
+
+# --- Shared resources (once per server process) ---
+
+@st.cache_resource(show_spinner=False)
+def get_vector_store(vs_path: str):
+    # Shards of a sharded store load lazily on first search
+    from src.rag.retriever import load_store
+    return load_sharded_store(vs_path) if is_sharded(vs_path) else load_store(vs_path)
+
+
+@st.cache_resource(show_spinner=False)
+def get_embedding_model(model: str) -> str:
+    from src.embeddings.embedder import load_embedding_model
+    load_embedding_model()
+    return model
+
+
+@st.cache_resource(show_spinner=False)
+def get_bigquery_client():
+    from src.execution.bigquery_client import get_client
+    return get_client()
+
+
+def init_resources() -> None:
+    """
+    Load shared resources; a failure is shown once per run and retried on the next.
+    """
+    loaders = [
+        ("vector store", lambda: get_vector_store(os.getenv("VECTORSTORE_PATH", "./vector_store"))),
+        ("embedding model", lambda: get_embedding_model(settings.EMBEDDING_MODEL)),
+        ("BigQuery client", get_bigquery_client),
+    ]
+    with st.spinner("Loading models and indexes..."):
+        for name, load in loaders:
+            try:
+                load()
+            except Exception as e:
+                st.warning(f"Could not load {name}: {e}")
+
+
+@st.cache_data(ttl=settings.JOB_RESULT_TTL, max_entries=256, show_spinner=False)
+def get_job_page(job_id: str, page: int) -> List[Dict[str, Any]]:
+    # Pages of a finished job never change, so they can be shared across sessions
+    return jobs.get_job_page(job_id, page)
+
+
+# --- Pipeline ---
+
+def run_pipeline(
+    question: str,
+    background: bool,
+    dataset: Optional[str] = None,
+    preview: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Answer question from cache, or generate, validate and execute its SQL.
+    Returns the result record kept in session state, or None on error.
+    """
+    cache_key = query_cache_key(question, dataset, preview=preview)
+    cached = get_query_result(cache_key)
+    if cached:
+        if not dataset:
+            record_question(question)
+        return {
+            "question": question,
+            "dataset": dataset,
+            "sql": cached["sql"],
+            "records": cached["data"],
+            "truncation": cached.get("truncation"),
+            "preview": cached.get("preview"),
+            "source": "cache",
+        }
+
+    with st.spinner("🔍 Retrieving relevant schema documents..."):
+        try:
+            docs = retrieve_schema_docs(question, dataset=dataset)
+        except Exception as e:
+            st.error(f"Error retrieving schema docs: {e}")
+            return None
+
+    with st.spinner("🤖 Generating SQL with RAG..."):
+        try:
+            sql = generate_sql(docs, question)
+        except Exception as e:
+            st.error(f"Error generating SQL: {e}")
+            return None
+
+    valid, err = validate_sql(sql)
+    if not valid:
+        st.code(sql, language="sql")
+        st.error(f"SQL validation failed: {err}")
+        return None
+    if not dataset:
+        record_question(question, sql)
+
+    preview_info = None
+    if preview:
+        preview_sql, info = to_preview_sql(sql)
+        valid, err = validate_sql(preview_sql)
+        if not valid:
+            st.code(preview_sql, language="sql")
+            st.error(f"Preview SQL validation failed: {err}")
+            return None
+        preview_info = {**info, "exact_sql": sql}
+        sql = preview_sql
+    return execute(question, sql, cache_key, background, dataset, preview_info)
+
+
+def execute(
+    question: str,
+    sql: str,
+    cache_key: str,
+    background: bool,
+    dataset: Optional[str] = None,
+    preview: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Run validated SQL now or as a background job and cache its result.
+    """
+    if background:
+        return {
+            "question": question,
+            "dataset": dataset,
+            "sql": sql,
+            "job_id": jobs.submit_job(sql, cache_key, preview=preview),
+            "truncation": None,
+            "preview": preview,
+            "source": "job",
+        }
+
+    with st.spinner("⚡ Executing SQL against BigQuery..."):
+        try:
+            df = run_query(sql)
+        except Exception as e:
+            st.error(f"Error executing SQL: {e}")
+            return None
+
+    records = dataframe_to_records(df)
+    truncation = df.attrs.get("truncation")
+    cache_query_result(
+        cache_key, sql, records, truncation, query_stats=df.attrs.get("query_stats"), preview=preview
+    )
+    return {
+        "question": question,
+        "dataset": dataset,
+        "sql": sql,
+        "records": records,
+        "truncation": truncation,
+        "preview": preview,
+        "source": "live",
+    }
+
+
+def promote(result: Dict[str, Any], background: bool) -> Optional[Dict[str, Any]]:
+    """
+    Run the exact SQL behind a preview result (served from cache if present).
+    """
+    question, dataset = result["question"], result.get("dataset")
+    cache_key = query_cache_key(question, dataset)
+    cached = get_query_result(cache_key)
+    if cached:
+        return {
+            "question": question,
+            "dataset": dataset,
+            "sql": cached["sql"],
+            "records": cached["data"],
+            "truncation": cached.get("truncation"),
+            "preview": None,
+            "source": "cache",
+        }
+    return execute(question, result["preview"]["exact_sql"], cache_key, background, dataset)
+
+
+# --- Rendering ---
+
+@st.fragment(run_every=settings.JOB_POLL_INTERVAL)
+def poll_job(result: Dict[str, Any]) -> None:
+    """
+    Show job progress; once the job has finished, re-run the app to render it.
+    """
+    job = jobs.get_job(result["job_id"])
+    if job is None:
+        st.error("The background job is unknown or has expired.")
+        return
+    if job["status"] in (jobs.JOB_PENDING, jobs.JOB_RUNNING):
+        st.progress(job.get("progress") or 0.0, text=f"Query {job['status']}...")
+        return
+    result["job"] = job
+    st.rerun()
+
+
+def render_page(result: Dict[str, Any]) -> None:
+    """
+    Render one page of the result, projected to the selected columns.
+    """
+    key = f"{result['source']}::{result.get('job_id') or result['question']}"
+    if result["source"] == "job":
+        job = result["job"]
+        total = job.get("total_rows") or 0
+        page_size = settings.JOB_PAGE_SIZE
+    else:
+        total = len(result["records"])
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}::size")
+
+    num_pages = max(1, -(-total // page_size))
+    page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, key=f"{key}::page") - 1
+
+    if result["source"] == "job":
+        rows = get_job_page(result["job_id"], page)
+    else:
+        rows = result["records"][page * page_size:(page + 1) * page_size]
+
+    all_columns = list(rows[0].keys()) if rows else []
+    columns = st.multiselect(
+        "Columns", all_columns, default=all_columns[:DEFAULT_MAX_COLUMNS], key=f"{key}::columns"
+    )
+    st.dataframe(pd.DataFrame.from_records(rows, columns=columns or all_columns))
+    start = page * page_size
+    st.caption(f"Rows {min(start + 1, total)}–{min(start + page_size, total)} of {total}")
+
+
+def render_preview_notice(result: Dict[str, Any], background: bool) -> None:
+    """
+    Label an approximate preview result and offer to run the exact query.
+    """
+    preview = result["preview"]
+    if preview["sample_percent"]:
+        tables = ", ".join(preview["sampled_tables"])
+        st.warning(
+            f"⚠️ Approximate results: estimated from a {preview['sample_percent']:g}% sample of {tables}; "
+            "counts and sums are scaled up, distinct counts are approximate."
+        )
+    else:
+        st.warning("⚠️ Approximate results: distinct counts are estimated.")
+    if st.button("Run exact query", key=f"exact::{result['question']}"):
+        st.session_state["result"] = promote(result, background)
+        st.rerun()
+
+
+def render_result(result: Dict[str, Any], background: bool = False) -> None:
+    if result["source"] == "cache":
+        st.success("✅ Loaded results from cache.")
+    if result.get("preview") and result["preview"]["approximate"]:
+        render_preview_notice(result, background)
+
+    st.subheader("Generated SQL")
+    st.code(result["sql"], language="sql")
+
+    if result["source"] == "job" and "job" not in result:
+        poll_job(result)
+        return
+    job = result.get("job")
+    if job and job["status"] == jobs.JOB_FAILED:
+        st.error(f"Error executing SQL: {job.get('error')}")
+        return
+
+    truncation = (job or result).get("truncation")
+    if truncation:
+        st.warning(f"Result truncated: {truncation}")
+
+    st.subheader("Query Results")
+    render_page(result)
+
 
 def main():
     st.set_page_config(page_title="Text2SQL RAG Demo", layout="wide")
     st.title("🗣️  Text2SQL RAG Demo")
     st.write("Ask a natural language question about your BigQuery data and get back SQL results.")
 
+    init_resources()
+
     question = st.text_input("Enter your question here:", placeholder="e.g., How many orders in the last month?")
+    background = st.checkbox("Run in background", help="Submit the query as a job and keep using the page.")
+    preview = st.checkbox(
+        "Preview (approximate)",
+        help=f"Run on a {settings.PREVIEW_SAMPLE_PERCENT:g}% sample with approximate aggregates for a fast, cheap first look."
+    )
+    dataset = None
+    vs_path = os.getenv("VECTORSTORE_PATH", "./vector_store")
+    if is_sharded(vs_path):
+        choice = st.selectbox("Dataset", [ALL_DATASETS] + load_sharded_store(vs_path).shard_names())
+        dataset = None if choice == ALL_DATASETS else choice
     if not question:
         st.info("Please enter a question to generate SQL and execute it.")
         return
 
     if st.button("Run Query"):
-        cache_key = f"query::{question}"
-        # 1) Attempt cache
-        cached = get_cache(cache_key)
-        if cached:
-            st.success("✅ Loaded results from cache.")
-            sql = cached["sql"]
-            df = pd.DataFrame(cached["data"])
-        else:
-            # 2) Retrieve schema docs
-            with st.spinner("🔍 Retrieving relevant schema documents..."):
-                try:
-                    docs = retrieve_schema_docs(question)
-                except Exception as e:
-                    st.error(f"Error retrieving schema docs: {e}")
-                    return
-
-            # 3) Generate SQL
-            with st.spinner("🤖 Generating SQL with RAG..."):
-                try:
-                    sql = generate_sql(docs, question)
-                except Exception as e:
-                    st.error(f"Error generating SQL: {e}")
-                    return
-
-            st.subheader("Generated SQL")
-            st.code(sql, language="sql")
-
-            # 4) Validate SQL
-            valid, err = validate_sql(sql)
-            if not valid:
-                st.error(f"SQL validation failed: {err}")
-                return
-
-            # 5) Execute SQL
-            with st.spinner("⚡ Executing SQL against BigQuery..."):
-                try:
-                    df = run_query(sql)
-                except Exception as e:
-                    st.error(f"Error executing SQL: {e}")
-                    return
-
-            # 6) Cache results
-            set_cache(cache_key, {"sql": sql, "data": df.to_dict(orient="records")})
-
-        # Display results
-        st.subheader("Query Results")
-        st.dataframe(df)
+        st.session_state["result"] = run_pipeline(question, background, dataset, preview)
+
+    # Re-render the last result on every rerun (paging, column changes, polling)
+    result = st.session_state.get("result")
+    if result is not None:
+        if result["question"] != question:
+            st.caption(f"Showing results for: {result['question']}")
+        render_result(result, background)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
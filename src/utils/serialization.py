@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+src/utils/serialization.py
+
+Fast JSON encoding for query results and cache payloads.
+
+Uses orjson if available, otherwise falls back to the standard json module.
+DataFrames are converted column by column (timestamps to ISO strings,
+NaN/NaT to null) instead of row by row, which keeps encoding cheap for
+large results.
+"""
+
+import json
+import base64
+import decimal
+import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Attempt to import orjson for fast encoding
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """
+    Encode values the JSON backend does not handle natively.
+    """
+    if obj is None or obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (pd.Timestamp, datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, pd.Timedelta):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode("ascii")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize obj to JSON bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(obj, default=_default).encode("utf-8")
+
+
+def loads(raw: Any) -> Any:
+    """
+    Deserialize JSON from bytes or str.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """
+    Convert one column to a list of JSON-friendly Python values.
+    """
+    mask = series.isna().to_numpy()
+    dtype = series.dtype
+
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, "tz", None) is not None:
+            arr = series.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy()
+            values = np.datetime_as_string(arr, unit="us", timezone="UTC").astype(object)
+        else:
+            values = np.datetime_as_string(series.to_numpy(), unit="us").astype(object)
+    elif pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        values = series.to_numpy(dtype=object, na_value=None)
+    else:
+        values = series.to_numpy(dtype=object)
+
+    if mask.any():
+        values = values.copy()
+        values[mask] = None
+    return values.tolist()
+
+
+def dataframe_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Convert a DataFrame to a list of row dicts ready for JSON encoding.
+    Equivalent to df.to_dict(orient="records") but with timestamps as ISO
+    strings and missing values as None.
+    """
+    columns = [str(c) for c in df.columns]
+    if df.empty:
+        return []
+    col_values = [_column_values(df.iloc[:, i]) for i in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*col_values)]
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+src/utils/sql_parsing.py
+
+Lightweight, regex-based helpers for inspecting generated SQL.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Matches the table reference after FROM / JOIN, optionally backtick-quoted,
+# e.g. FROM `proj.ds.orders`, JOIN ds.customers, FROM orders
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN)\s+(`[^`]+`|[A-Za-z_][\w\-]*(?:\.[A-Za-z_][\w\-]*){0,2})",
+    re.IGNORECASE
+)
+
+# Function calls whose arguments use FROM without referring to a table
+_FROM_FUNCTIONS = re.compile(r"\b(?:EXTRACT|TRIM|SUBSTRING)\s*\([^()]*\)", re.IGNORECASE)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_COMMENTS = re.compile(r"--[^\n]*|#[^\n]*|/\*.*?\*/", re.DOTALL)
+# A common table expression: WITH name AS ( ... or , name AS ( ...
+_CTE = re.compile(r"(?:\bWITH|,)\s*([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+
+
+def strip_noise(sql: str) -> str:
+    """
+    Remove comments, string literals and FROM-using function calls so that
+    keyword regexes only see SQL structure.
+    """
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _STRINGS.sub("''", sql)
+    return _FROM_FUNCTIONS.sub("NULL", sql)
+
+
+def mask_noise(sql: str) -> str:
+    """
+    Like strip_noise, but blank the removed parts out with spaces, so that
+    match offsets in the result are valid offsets into sql.
+    """
+    blank = lambda m: " " * len(m.group(0))
+    sql = _COMMENTS.sub(blank, sql)
+    sql = _STRINGS.sub(blank, sql)
+    return _FROM_FUNCTIONS.sub(blank, sql)
+
+
+def protect_literals(sql: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Remove comments and swap string literals (__str0__, ...) and FROM-using
+    function calls (__fn0__, ...) for placeholders, so keyword regexes only
+    see SQL structure while the original text can be put back with
+    restore_literals. Returns the text and the placeholder -> text map.
+    """
+    literals: Dict[str, str] = {}
+    def swap(kind: str):
+        def replace(m: "re.Match") -> str:
+            key = f"__{kind}{len(literals)}__"
+            literals[key] = m.group(0)
+            return key
+        return replace
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _STRINGS.sub(swap("str"), sql)
+    return _FROM_FUNCTIONS.sub(swap("fn"), sql), literals
+
+
+def restore_literals(text: str, literals: Dict[str, str]) -> str:
+    """
+    Put back the text replaced by protect_literals.
+    """
+    restore = lambda m: restore_literals(literals[m.group(0)], literals) if m.group(0) in literals else m.group(0)
+    return re.sub(r"__(?:str|fn)\d+__", restore, text)
+
+
+def normalize_table_name(ref: str) -> str:
+    """
+    Reduce a table reference to its lower-cased bare table id
+    (`proj.ds.Orders` -> orders).
+    """
+    return ref.strip("`").split(".")[-1].lower()
+
+
+def qualify_table_name(ref: str, default_dataset: Optional[str] = None) -> str:
+    """
+    Reduce a table reference to its lower-cased dataset.table name
+    (`proj.ds.Orders` -> ds.orders). A bare table name is qualified with
+    default_dataset when given.
+    """
+    parts = ref.strip("`").lower().split(".")
+    if len(parts) == 1:
+        return f"{default_dataset.lower()}.{parts[0]}" if default_dataset else parts[0]
+    return ".".join(parts[-2:])
+
+
+def find_ctes(sql: str) -> Dict[str, int]:
+    """
+    Map each CTE name (lower-cased) to the offset of the "(" opening its
+    body. sql should already be stripped or masked of literals.
+    """
+    return {m.group(1).lower(): m.end() - 1 for m in _CTE.finditer(sql)}
+
+
+def extract_table_refs(sql: str) -> List[str]:
+    """
+    Return the distinct table references in FROM / JOIN clauses as written
+    (backticks removed, e.g. proj.ds.Orders), in order of first appearance.
+    Unqualified CTE names and table functions such as UNNEST(...) are
+    excluded.
+    """
+    sql = strip_noise(sql)
+    ctes = find_ctes(sql)
+    refs: List[str] = []
+    for m in _TABLE_REF.finditer(sql):
+        # Skip table functions such as UNNEST(...)
+        if sql[m.end():].lstrip().startswith("("):
+            continue
+        ref = m.group(1).strip("`")
+        # Only an unqualified name can refer to a CTE
+        if ("." not in ref and ref.lower() in ctes) or ref in refs:
+            continue
+        refs.append(ref)
+    return refs
+
+
+def extract_tables(sql: str) -> List[str]:
+    """
+    Return the distinct bare table names referenced in FROM / JOIN clauses,
+    in order of first appearance. CTE names are excluded.
+    """
+    tables: List[str] = []
+    for ref in extract_table_refs(sql):
+        name = normalize_table_name(ref)
+        if name not in tables:
+            tables.append(name)
+    return tables
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+src/utils/sql_preview.py
+
+Rewrite generated SQL into a cheap, approximate "preview" query.
+
+  - The table read by each FROM clause is sampled with
+    TABLESAMPLE SYSTEM (settings.PREVIEW_SAMPLE_PERCENT PERCENT). Joined
+    tables are read in full, so join matches are not thinned out twice.
+    CTE names, tables read inside IN / EXISTS / scalar subqueries and
+    tables already sampled elsewhere in the query are read in full too.
+  - COUNT / COUNTIF / SUM in a SELECT that reads a sampled table directly
+    are scaled up by 100 / percent to estimate the full-table value.
+  - COUNT(DISTINCT x) becomes APPROX_COUNT_DISTINCT(x) (not scaled: distinct
+    counts do not grow linearly with the sample).
+
+A table is only sampled if its rows never reach an aggregate that cannot
+be scaled (e.g. a COUNT over a sampled subquery or CTE), a filter subquery,
+or a join with other sampled rows. If no table qualifies, the SQL is
+returned unchanged and the preview is exact.
+
+The rewrite is regex-based like src/utils/sql_parsing.py; callers should
+run the result through validate_sql again.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.config import settings
+from src.utils.sql_parsing import find_ctes, mask_noise, normalize_table_name, qualify_table_name
+
+_FROM_REF = re.compile(
+    r"\bFROM\s+(`[^`]+`|[A-Za-z_][\w\-]*(?:\.[A-Za-z_][\w\-]*){0,2})",
+    re.IGNORECASE
+)
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN)\s+(`[^`]+`|[A-Za-z_][\w\-]*(?:\.[A-Za-z_][\w\-]*){0,2})",
+    re.IGNORECASE
+)
+
+# Words that may follow a table reference and are not an alias
+_CLAUSE_WORDS = (
+    "WHERE|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|ON|USING|GROUP|ORDER|LIMIT|HAVING|"
+    "UNION|INTERSECT|EXCEPT|WINDOW|QUALIFY|FOR|TABLESAMPLE|PIVOT|UNPIVOT"
+)
+_ALIAS = re.compile(rf"\s+(?:AS\s+)?(?!(?:{_CLAUSE_WORDS})\b)[A-Za-z_]\w*", re.IGNORECASE)
+# Table references that must not be sampled (time travel, already sampled)
+_NO_SAMPLE = re.compile(r"\s*\b(?:FOR|TABLESAMPLE)\b", re.IGNORECASE)
+
+_AGGREGATE = re.compile(r"\b(COUNT|COUNTIF|SUM)\s*\(", re.IGNORECASE)
+_DISTINCT = re.compile(r"\s*DISTINCT\b", re.IGNORECASE)
+_OVER = re.compile(r"\s*OVER\b", re.IGNORECASE)
+
+# Subquery bodies, set operators between SELECTs, and what a subquery is read as
+_QUERY_START = re.compile(r"\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+# (BigQuery set operators always say ALL / DISTINCT; SELECT * EXCEPT (...) does not)
+_SET_OP = re.compile(r"\b(?:UNION|INTERSECT|EXCEPT)\s+(?:ALL|DISTINCT)\b", re.IGNORECASE)
+_SOURCE_BEFORE = re.compile(r"\b(?:FROM|JOIN)\s*$", re.IGNORECASE)
+
+# A SELECT: (offset of the "(" opening its subquery or -1 for the top level,
+# index of its branch among the set operators at that level)
+Scope = Tuple[int, int]
+
+
+def _closing_paren(sql: str, open_idx: int) -> int:
+    depth = 0
+    for i in range(open_idx, len(sql)):
+        if sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+class _Scopes:
+    """
+    The SELECTs of a masked query: which subquery and set-operator branch
+    each offset belongs to, and how each subquery is read.
+    """
+
+    def __init__(self, masked: str):
+        self.masked = masked
+        self.ctes = find_ctes(masked)
+        # Subqueries: "(" offset -> ")" offset
+        self.groups: Dict[int, int] = {}
+        stack = []
+        for i, ch in enumerate(masked):
+            if ch == "(":
+                stack.append(i)
+            elif ch == ")" and stack:
+                start = stack.pop()
+                if _QUERY_START.match(masked, start + 1):
+                    self.groups[start] = i
+        self.set_ops = [(self.group_of(m.start()), m.start()) for m in _SET_OP.finditer(masked)]
+
+    def cte_name(self, ref: str) -> Optional[str]:
+        # Only an unqualified name can refer to a CTE
+        name = ref.strip("`").lower()
+        return name if "." not in name and name in self.ctes else None
+
+    def group_of(self, pos: int) -> int:
+        return max((o for o, c in self.groups.items() if o < pos < c), default=-1)
+
+    def scope_of(self, pos: int) -> Scope:
+        group = self.group_of(pos)
+        return group, sum(1 for g, p in self.set_ops if g == group and p < pos)
+
+    def branches(self, group: int) -> List[Scope]:
+        return [(group, b) for b in range(1 + sum(1 for g, _ in self.set_ops if g == group))]
+
+    def all_scopes(self) -> List[Scope]:
+        return [s for group in [-1, *self.groups] for s in self.branches(group)]
+
+    def kind(self, group: int) -> str:
+        """
+        "cte" (a CTE body), "source" (read by FROM / JOIN) or "filter"
+        (IN / EXISTS / scalar subqueries and anything else).
+        """
+        if group in self.ctes.values():
+            return "cte"
+        return "source" if _SOURCE_BEFORE.search(self.masked, 0, group) else "filter"
+
+    def only_sources(self, scope: Scope) -> bool:
+        # True if scope and every subquery around it are read as tables
+        group = scope[0]
+        while group != -1:
+            if self.kind(group) == "filter":
+                return False
+            group = self.group_of(group)
+        return True
+
+
+def _aggregate_calls(masked: str) -> List[Tuple[int, int, str, Optional[int]]]:
+    """
+    Outermost COUNT / COUNTIF / SUM calls that are not window functions, as
+    (start, closing paren, function, end of DISTINCT or None).
+    """
+    calls = []
+    covered = 0
+    for m in _AGGREGATE.finditer(masked):
+        if m.start() < covered:
+            continue
+        open_idx = m.end() - 1
+        close_idx = _closing_paren(masked, open_idx)
+        if close_idx < 0:
+            break
+        # Window aggregates are left alone: wrapping them would split OVER (...) off
+        if _OVER.match(masked, close_idx + 1):
+            continue
+        distinct = _DISTINCT.match(masked, open_idx + 1)
+        calls.append((m.start(), close_idx, m.group(1).upper(), distinct.end() if distinct else None))
+        covered = close_idx + 1
+    return calls
+
+
+def _is_safe(scopes: _Scopes, sampled: Set[Scope], scaled_calls: List[Tuple[int, int, str, Optional[int]]]) -> bool:
+    """
+    Check that sampled rows only reach aggregates that are scaled in the
+    SELECT that samples them, and are never joined with other sampled rows
+    or used as a filter.
+    """
+    cte_refs: Dict[Scope, List[int]] = {}
+    for m in _TABLE_REF.finditer(scopes.masked):
+        name = scopes.cte_name(m.group(1))
+        if name:
+            cte_refs.setdefault(scopes.scope_of(m.start()), []).append(scopes.ctes[name])
+    children: Dict[Scope, List[int]] = {}
+    for group in scopes.groups:
+        if scopes.kind(group) != "cte":
+            children.setdefault(scopes.scope_of(group), []).append(group)
+
+    tainted_groups: Dict[int, bool] = {}
+    def group_tainted(group: int) -> bool:
+        if group not in tainted_groups:
+            # Guards against a CTE that reads itself
+            tainted_groups[group] = False
+            tainted_groups[group] = any(sources(s) for s in scopes.branches(group))
+        return tainted_groups[group]
+
+    def sources(scope: Scope) -> int:
+        # Number of inputs of scope that carry sampled rows
+        inputs = cte_refs.get(scope, []) + children.get(scope, [])
+        return (scope in sampled) + sum(group_tainted(g) for g in inputs)
+
+    if any(scopes.kind(g) == "filter" and group_tainted(g) for g in scopes.groups):
+        return False
+    for scope in scopes.all_scopes():
+        if sources(scope) > 1:
+            return False
+    scaled_scopes = {scopes.scope_of(start) for start, _, _, _ in scaled_calls}
+    return all(scope in sampled or not sources(scope) for scope in scaled_scopes)
+
+
+def _sample_edits(
+    scopes: _Scopes,
+    percent: float,
+    to_scale: List[Tuple[int, int, str, Optional[int]]]
+) -> Tuple[List[Tuple[int, int, str]], List[str], Set[Scope], int]:
+    """
+    Pick the FROM tables to sample, in order, skipping any that would make
+    the query unsafe to estimate (see _is_safe).
+    Returns (edits, sampled table names, sampled scopes, candidates seen).
+    """
+    edits, tables, seen, sampled = [], [], set(), set()
+    candidates = 0
+    masked = scopes.masked
+    clause = f" TABLESAMPLE SYSTEM ({percent:g} PERCENT)"
+    for m in _FROM_REF.finditer(masked):
+        end = m.end()
+        # Skip table functions such as UNNEST(...)
+        if masked[end:].lstrip().startswith("("):
+            continue
+        ref = m.group(1)
+        table = qualify_table_name(ref)
+        if scopes.cte_name(ref) or table in seen:
+            continue
+        scope = scopes.scope_of(m.start())
+        if not scopes.only_sources(scope):
+            continue
+        alias = _ALIAS.match(masked, end)
+        if alias:
+            end = alias.end()
+        if _NO_SAMPLE.match(masked, end):
+            continue
+        candidates += 1
+        if not _is_safe(scopes, sampled | {scope}, to_scale):
+            continue
+        edits.append((end, end, clause))
+        tables.append(normalize_table_name(ref))
+        seen.add(table)
+        sampled.add(scope)
+    return edits, tables, sampled, candidates
+
+
+def to_preview_sql(sql: str, percent: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Rewrite sql into its approximate preview form.
+    Returns (preview_sql, info) where info holds sample_percent,
+    sampled_tables, scaled_aggregates, approx_distinct and approximate
+    (False if nothing could be rewritten; sql is returned unchanged when
+    no table can be sampled without skewing the result).
+    """
+    percent = settings.PREVIEW_SAMPLE_PERCENT if percent is None else percent
+    masked = mask_noise(sql)
+    scopes = _Scopes(masked)
+    calls = _aggregate_calls(masked)
+    to_scale = [c for c in calls if c[3] is None]
+    edits, tables, sampled, candidates = (
+        # Nothing to sample outside (0, 100) percent
+        _sample_edits(scopes, percent, to_scale) if 0 < percent < 100 else ([], [], set(), 0)
+    )
+    if candidates and not sampled:
+        # No table can be sampled without skewing the result
+        return sql, {
+            "sample_percent": None,
+            "sampled_tables": [],
+            "scaled_aggregates": 0,
+            "approx_distinct": 0,
+            "approximate": False,
+        }
+
+    factor = 100.0 / percent if sampled else 1
+    scaled = approx_distinct = 0
+    for start, close_idx, func, distinct_end in calls:
+        if distinct_end is not None and func == "COUNT":
+            arg = sql[distinct_end:close_idx].strip()
+            edits.append((start, close_idx + 1, f"APPROX_COUNT_DISTINCT({arg})"))
+            approx_distinct += 1
+        elif distinct_end is None and scopes.scope_of(start) in sampled:
+            call = sql[start:close_idx + 1]
+            if func == "SUM":
+                edits.append((start, close_idx + 1, f"({call} * {factor:g})"))
+            else:
+                edits.append((start, close_idx + 1, f"CAST(ROUND({call} * {factor:g}) AS INT64)"))
+            scaled += 1
+
+    # Apply back to front so earlier offsets stay valid
+    for start, end, text in sorted(edits, key=lambda e: e[0], reverse=True):
+        sql = sql[:start] + text + sql[end:]
+    info = {
+        "sample_percent": percent if tables else None,
+        "sampled_tables": tables,
+        "scaled_aggregates": scaled,
+        "approx_distinct": approx_distinct,
+        "approximate": bool(tables or approx_distinct),
+    }
+    return sql, info
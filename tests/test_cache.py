@@ -0,0 +1,380 @@
+import time
+import pytest
+from src.cache import redis_cache
+from src.cache.circuit_breaker import CircuitBreaker
+from src.cache.local_cache import LocalLRUCache
+
+# --- LocalLRUCache ---
+
+def test_lru_evicts_by_bytes():
+    cache = LocalLRUCache(max_bytes=10, ttl=60)
+    cache.set("a", 1, size=4)
+    cache.set("b", 2, size=4)
+    assert cache.get("a") == 1          # "a" is now most recently used
+    cache.set("c", 3, size=4)           # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.current_bytes == 8
+
+def test_lru_skips_oversized_values():
+    cache = LocalLRUCache(max_bytes=10, ttl=60)
+    cache.set("big", "x", size=11)
+    assert cache.get("big") is None
+    assert cache.current_bytes == 0
+
+def test_lru_expires_entries(monkeypatch):
+    cache = LocalLRUCache(max_bytes=10, ttl=5)
+    cache.set("a", 1, size=1)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+# --- L1 in front of Redis ---
+
+class DummyRedis:
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+@pytest.fixture
+def dummy_redis(monkeypatch):
+    client = DummyRedis()
+    monkeypatch.setattr(redis_cache, "_redis_client", client)
+    monkeypatch.setattr(redis_cache, "_client_initialized", True)
+    monkeypatch.setattr(redis_cache, "_l1", LocalLRUCache(1024, 60))
+    monkeypatch.setattr(redis_cache, "_breaker", CircuitBreaker("test", 5, 30))
+    monkeypatch.setattr(redis_cache, "_listener", None)
+    monkeypatch.setattr(redis_cache, "_listener_wanted", False)
+    return client
+
+def test_get_cache_populates_l1(dummy_redis):
+    dummy_redis.data["query::q"] = b'{"sql": "SELECT 1"}'
+    assert redis_cache.get_cache("query::q") == {"sql": "SELECT 1"}
+    assert redis_cache.get_cache("query::q") == {"sql": "SELECT 1"}
+    assert dummy_redis.gets == 1
+
+def test_invalidation_message_evicts_l1(dummy_redis):
+    dummy_redis.data["query::q"] = b'{"sql": "SELECT 1"}'
+    redis_cache.get_cache("query::q")
+    redis_cache._on_invalidation({"data": b"other-worker:query::q"})
+    redis_cache.get_cache("query::q")
+    assert dummy_redis.gets == 2
+
+def test_own_invalidation_message_is_ignored(dummy_redis):
+    dummy_redis.data["query::q"] = b'{"sql": "SELECT 1"}'
+    redis_cache.get_cache("query::q")
+    redis_cache._on_invalidation({"data": f"{redis_cache._instance_id}:query::q".encode()})
+    redis_cache.get_cache("query::q")
+    assert dummy_redis.gets == 1
+
+def test_non_l1_prefix_goes_to_redis(dummy_redis):
+    dummy_redis.data["job::1"] = b'{"status": "done"}'
+    redis_cache.get_cache("job::1")
+    redis_cache.get_cache("job::1")
+    assert dummy_redis.gets == 2
+
+# --- Circuit breaker ---
+
+class FailingRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        raise redis_cache.redis.ConnectionError("down")
+
+def test_breaker_opens_after_repeated_failures(monkeypatch):
+    from src.cache.circuit_breaker import OPEN
+    client = FailingRedis()
+    breaker = CircuitBreaker("test", failure_threshold=2, cooldown=60)
+    monkeypatch.setattr(redis_cache, "_redis_client", client)
+    monkeypatch.setattr(redis_cache, "_client_initialized", True)
+    monkeypatch.setattr(redis_cache, "_breaker", breaker)
+
+    for _ in range(5):
+        assert redis_cache.get_cache("job::1") is None
+    # Only the first two calls reach Redis; the rest are short-circuited
+    assert client.calls == 2
+    assert breaker.state == OPEN
+    assert breaker.stats()["short_circuited"] == 3
+    assert redis_cache.is_available() is False
+
+def test_breaker_half_open_recovers(monkeypatch):
+    from src.cache.circuit_breaker import CLOSED, OPEN
+    breaker = CircuitBreaker("test", failure_threshold=1, cooldown=10)
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert breaker.allow() is True       # single trial call
+    assert breaker.allow() is False      # others still skipped
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() is True
+
+def test_listener_noop_does_not_take_half_open_trial(monkeypatch):
+    from src.cache.circuit_breaker import OPEN
+    breaker = CircuitBreaker("test", failure_threshold=1, cooldown=10)
+    breaker.record_failure()
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    monkeypatch.setattr(redis_cache, "_redis_client", DummyRedis())
+    monkeypatch.setattr(redis_cache, "_client_initialized", True)
+    monkeypatch.setattr(redis_cache, "_breaker", breaker)
+    monkeypatch.setattr(redis_cache, "_listener_wanted", False)
+    monkeypatch.setattr(redis_cache, "_listener_retry_at", 0.0)
+
+    # L1 disabled / listener already running: nothing to do, no trial used
+    monkeypatch.setattr(redis_cache, "_l1", None)
+    redis_cache.start_invalidation_listener()
+    monkeypatch.setattr(redis_cache, "_l1", LocalLRUCache(1024, 60))
+    monkeypatch.setattr(redis_cache, "_listener", object())
+    redis_cache.start_invalidation_listener()
+    assert breaker.allow() is True
+
+    # A failed subscription reports the trial's outcome instead of holding it
+    class DownRedis(DummyRedis):
+        def pubsub(self, **kwargs):
+            raise redis_cache.redis.ConnectionError("down")
+    breaker.record_failure()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 22)
+    monkeypatch.setattr(redis_cache, "_redis_client", DownRedis())
+    monkeypatch.setattr(redis_cache, "_listener", None)
+    redis_cache.start_invalidation_listener()
+    assert breaker.state == OPEN
+    monkeypatch.setattr(time, "monotonic", lambda: now + 33)
+    assert breaker.allow() is True
+
+def test_listener_started_while_redis_is_down_retries(dummy_redis, monkeypatch):
+    class Listener:
+        def stop(self):
+            pass
+    class PubSub:
+        def subscribe(self, **handlers):
+            pass
+        def run_in_thread(self, **kwargs):
+            return Listener()
+    up = []
+    def pubsub(**kwargs):
+        if not up:
+            raise redis_cache.redis.ConnectionError("down")
+        return PubSub()
+    dummy_redis.pubsub = pubsub
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    monkeypatch.setattr(redis_cache, "_listener_retry_at", 0.0)
+
+    redis_cache.start_invalidation_listener()
+    assert redis_cache._listener is None
+
+    # Redis is back: the next successful call subscribes once the retry interval passed
+    up.append(True)
+    dummy_redis.data["query::q"] = b'{"sql": "SELECT 1"}'
+    redis_cache.get_cache("query::q")
+    assert redis_cache._listener is None
+    monkeypatch.setattr(time, "monotonic", lambda: now + redis_cache.LISTENER_RETRY_INTERVAL)
+    redis_cache.get_cache("job::1")
+    assert isinstance(redis_cache._listener, Listener)
+    # L1 entries cached while unsubscribed may have missed invalidations
+    assert redis_cache._l1.get("query::q") is None
+    redis_cache.stop_invalidation_listener()
+
+# --- Refresh-ahead warmer ---
+
+def test_warmer_refreshes_expiring_questions(monkeypatch):
+    from src.cache import warmer
+    top = [("hot", 10.0, "SELECT 1 LIMIT 1"), ("fresh", 8.0, "SELECT 2 LIMIT 1"),
+           ("gone", 5.0, "SELECT 3 LIMIT 1"), ("bad", 1.0, "SELECT 4 LIMIT 1")]
+    ttls = {"query::hot": 30, "query::fresh": 3000, "query::gone": -2, "query::bad": 10}
+    monkeypatch.setattr(redis_cache, "top_questions", lambda n: top[:n])
+    monkeypatch.setattr(redis_cache, "get_ttls", lambda keys: [ttls[k] for k in keys])
+    monkeypatch.setattr(redis_cache, "decay_question_stats", lambda factor: None)
+
+    refreshed = []
+    def fake_refresh(question, sql, regenerate=False):
+        if question == "bad":
+            raise RuntimeError("Error executing query")
+        refreshed.append(question)
+    monkeypatch.setattr(warmer, "refresh_question", fake_refresh)
+
+    stats = warmer.warm_cache(top_n=4, ttl_threshold=300)
+    assert refreshed == ["hot", "gone"]
+    assert stats == {"checked": 4, "refreshed": 2, "failed": 1}
+
+    refreshed.clear()
+    warmer.warm_cache(top_n=2, ttl_threshold=300, force=True)
+    assert refreshed == ["hot", "fresh"]
+
+def test_question_stats_are_buffered_until_flush(dummy_redis, monkeypatch):
+    sent = []
+    class Pipe:
+        def zincrby(self, key, count, question):
+            sent.append(("zincrby", question, count))
+        def hset(self, key, mapping):
+            sent.append(("hset", mapping))
+        def execute(self):
+            pass
+    dummy_redis.pipeline = lambda transaction=False: Pipe()
+    monkeypatch.setattr(redis_cache, "QUESTION_FLUSH_INTERVAL", 60)
+    monkeypatch.setattr(redis_cache, "_last_question_flush", time.monotonic())
+    monkeypatch.setattr(redis_cache, "_question_counts", {})
+    monkeypatch.setattr(redis_cache, "_question_sql", {})
+
+    redis_cache.record_question("q", "SELECT 1 LIMIT 1")
+    redis_cache.record_question("q")
+    redis_cache.record_question("other")
+    assert sent == []
+
+    redis_cache.flush_question_stats()
+    assert sent == [("zincrby", "q", 2), ("zincrby", "other", 1), ("hset", {"q": "SELECT 1 LIMIT 1"})]
+    redis_cache.flush_question_stats()
+    assert len(sent) == 3
+
+def test_decay_prunes_low_and_excess_questions(dummy_redis, monkeypatch):
+    scores = {"hot": 10.0, "warm": 4.0, "cool": 2.0, "cold": 0.5}
+    sqls = {q: f"SELECT '{q}'" for q in scores}
+    class Pipe:
+        def __init__(self):
+            self.ops = []
+        def __getattr__(self, name):
+            return lambda *args: self.ops.append((name, args))
+        def execute(self):
+            results = []
+            for name, args in self.ops:
+                ranked = sorted(scores, key=scores.get)
+                if name == "zunionstore":
+                    factor = args[1][redis_cache.QUESTION_STATS_KEY]
+                    scores.update({q: v * factor for q, v in scores.items()})
+                    results.append(len(scores))
+                elif name in ("zrangebyscore", "zremrangebyscore"):
+                    low = [q for q in ranked if scores[q] < float(args[2].lstrip("("))]
+                    results.append(low)
+                    if name == "zremrangebyscore":
+                        for q in low:
+                            del scores[q]
+                else:
+                    excess = ranked[:len(ranked) + args[2] + 1]
+                    results.append(excess)
+                    if name == "zremrangebyrank":
+                        for q in excess:
+                            del scores[q]
+            return results
+    dummy_redis.pipeline = lambda transaction=False: Pipe()
+    dummy_redis.hdel = lambda key, *fields: [sqls.pop(f) for f in fields]
+    monkeypatch.setattr(redis_cache, "QUESTION_STATS_MIN_SCORE", 0.5)
+    monkeypatch.setattr(redis_cache, "QUESTION_STATS_MAX", 2)
+
+    redis_cache.decay_question_stats(0.5)
+    assert scores == {"hot": 5.0, "warm": 2.0}
+    assert set(sqls) == {"hot", "warm"}
+
+# --- Freshness-aware caching ---
+
+class FreshnessRedis(DummyRedis):
+    def __init__(self):
+        super().__init__()
+        self.unlinked = []
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value
+
+    def sadd(self, *args):
+        pass
+
+    def expire(self, *args, **kwargs):
+        pass
+
+    def publish(self, *args):
+        pass
+
+    def unlink(self, key):
+        self.unlinked.append(key)
+        self.data.pop(key, None)
+
+    def pipeline(self, transaction=False):
+        return self
+
+    def execute(self):
+        pass
+
+def test_tag_ttl_is_only_extended(dummy_redis):
+    ttls = {}
+    class Pipe:
+        def set(self, name, value, ex=None):
+            ttls[name] = ex
+        def sadd(self, name, *values):
+            pass
+        def expire(self, name, time, nx=False, gt=False):
+            current = ttls.get(name, -1)
+            if (nx and current == -1) or (gt and current != -1 and time > current):
+                ttls[name] = time
+        def publish(self, *args):
+            pass
+        def execute(self):
+            pass
+    dummy_redis.pipeline = lambda transaction=False: Pipe()
+    tag = redis_cache.table_tag_key("ds.orders")
+
+    redis_cache.set_cache("query::week", {"sql": "x"}, ttl=7 * 86400, tables=["ds.orders"])
+    redis_cache.set_cache("query::hour", {"sql": "y"}, ttl=3600, tables=["ds.orders"])
+    assert ttls[tag] == 7 * 86400
+    redis_cache.set_cache("query::month", {"sql": "z"}, ttl=30 * 86400, tables=["ds.orders"])
+    assert ttls[tag] == 30 * 86400
+
+@pytest.fixture
+def freshness(monkeypatch):
+    import src.cache.freshness as freshness
+    import src.execution.bigquery_client as bq_client
+    from src.config import settings
+    client = FreshnessRedis()
+    monkeypatch.setattr(redis_cache, "_redis_client", client)
+    monkeypatch.setattr(redis_cache, "_client_initialized", True)
+    monkeypatch.setattr(redis_cache, "_l1", None)
+    monkeypatch.setattr(redis_cache, "_breaker", CircuitBreaker("test", 5, 30))
+    monkeypatch.setattr(settings, "CACHE_FRESHNESS", True)
+    monkeypatch.setattr(settings, "FRESHNESS_CHECK_TTL", 0)
+    modified = {"p.d.orders": 100.0}
+    calls = []
+    def fake_times(tables):
+        calls.append(list(tables))
+        return {t: modified.get(t) for t in tables}
+    monkeypatch.setattr(bq_client, "get_table_modified_times", fake_times)
+    freshness.clear()
+    yield client, modified, calls
+    freshness.clear()
+
+def test_fresh_result_is_served_until_table_changes(freshness):
+    client, modified, _ = freshness
+    stats = {"referenced_tables": ["p.d.orders"], "started_at": 150.0}
+    redis_cache.cache_query_result("query::q", "SELECT 1 FROM orders", [{"n": 1}], query_stats=stats)
+
+    cached = redis_cache.get_query_result("query::q")
+    assert cached["tables_modified"] == {"p.d.orders": 100.0}
+    assert cached["data"] == [{"n": 1}]
+
+    modified["p.d.orders"] = 200.0
+    assert redis_cache.get_query_result("query::q") is None
+    assert client.unlinked == ["query::q"]
+
+def test_table_changed_during_query_is_not_recorded(freshness):
+    stats = {"referenced_tables": ["p.d.orders"], "started_at": 50.0}
+    redis_cache.cache_query_result("query::q", "SELECT 1 FROM orders", [], query_stats=stats)
+    assert "tables_modified" not in redis_cache.get_query_result("query::q")
+
+def test_metadata_checks_are_cached(freshness, monkeypatch):
+    import src.cache.freshness as freshness_mod
+    from src.config import settings
+    _, _, calls = freshness
+    monkeypatch.setattr(settings, "FRESHNESS_CHECK_TTL", 60)
+    assert freshness_mod.is_fresh({"p.d.orders": 100.0})
+    assert freshness_mod.is_fresh({"p.d.orders": 100.0})
+    # Unknown tables count as changed and are not cached
+    assert not freshness_mod.is_fresh({"p.d.missing": 1.0})
+    assert calls == [["p.d.orders"], ["p.d.missing"]]
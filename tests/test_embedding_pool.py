@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+
+import src.embeddings.pool as pool
+from src.config import settings
+
+
+class DummyEncoder:
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        # Each embedding: [len(text), 1.0]
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def _init_dummy_worker(model, batch_size, threads):
+    # Runs in the spawned workers, which import this module to find it
+    pool._encoder = DummyEncoder()
+    pool._batch_size = batch_size
+
+
+def test_length_sorted_chunks_roundtrip():
+    texts = ["a", "ccc", "bb", "dddd", "e"]
+    order, chunks = pool.length_sorted_chunks(texts, chunk_size=2)
+
+    assert [texts[i] for i in order] == ["dddd", "ccc", "bb", "a", "e"]
+    assert [start for start, _ in chunks] == [0, 2, 4]
+    assert [len(c) for _, c in chunks] == [2, 2, 1]
+
+
+def test_encode_chunk_writes_shared_memory(monkeypatch):
+    monkeypatch.setattr(pool, "_encoder", DummyEncoder())
+    shape = (4, 2)
+    shm = shared_memory.SharedMemory(create=True, size=4 * 2 * 4)
+    try:
+        written = pool._encode_chunk((shm.name, shape, 1, ["xx", "yyy"]))
+        buf = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        assert written == 2
+        assert buf[1].tolist() == [2.0, 1.0]
+        assert buf[2].tolist() == [3.0, 1.0]
+        del buf
+    finally:
+        attached, _ = pool._attached.pop(shm.name)
+        attached.close()
+        shm.close()
+        shm.unlink()
+
+
+def test_spawn_pool_restores_input_order(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "sentence-transformers/m")
+    monkeypatch.setattr(pool, "_init_worker", _init_dummy_worker)
+    texts = ["a" * n for n in (3, 9, 1, 7, 5, 2, 8, 4, 6, 10)]
+
+    with pool.EmbeddingPool(workers=2, chunk_size=3, batch_size=2) as p:
+        out = p.embed(texts)
+        again = p.embed(texts[:4])
+
+    assert out.dtype == np.float32
+    assert out[:, 0].tolist() == [3.0, 9.0, 1.0, 7.0, 5.0, 2.0, 8.0, 4.0, 6.0, 10.0]
+    assert out[:, 1].tolist() == [1.0] * 10
+    assert again[:, 0].tolist() == [3.0, 9.0, 1.0, 7.0]
+
+
+@pytest.mark.parametrize("workers, model", [
+    (1, "sentence-transformers/m"),
+    (4, "textembedding-gecko@001"),
+])
+def test_falls_back_to_in_process(monkeypatch, workers, model):
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", model)
+    monkeypatch.setattr(pool, "embed_texts", lambda texts: [[float(len(t))] for t in texts])
+
+    out = pool.embed_texts_parallel(["a", "bb"] * 10, workers=workers, chunk_size=2)
+    assert out.dtype == np.float32
+    assert out.shape == (20, 1)
+    assert out[1, 0] == 2.0
+
+
+def test_resolve_workers(monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_WORKERS", -1)
+    assert pool.resolve_workers() >= 1
+    assert pool.resolve_workers(3) == 3
@@ -5,32 +5,65 @@ from src.config import settings
 
 # --- Dummy classes to simulate BigQuery behavior ---
 
+class DummyField:
+    def __init__(self, name):
+        self.name = name
+
+class DummyRow:
+    def __init__(self, values):
+        self._values = tuple(values)
+
+    def values(self):
+        return self._values
+
 class DummyResult:
-    def __init__(self, df):
+    def __init__(self, df, page_size=None):
         self._df = df
+        self._page_size = page_size or len(df) or 1
+        self.schema = [DummyField(c) for c in df.columns]
+        self.total_rows = len(df)
 
     def to_dataframe(self):
         return self._df
 
+    @property
+    def pages(self):
+        rows = [DummyRow(r) for r in self._df.itertuples(index=False)]
+        for i in range(0, len(rows), self._page_size):
+            yield rows[i:i + self._page_size]
+
+class DummyTableRef:
+    def __init__(self, table_id):
+        self.project, self.dataset_id, self.table_id = "proj", "ds", table_id
+
 class DummyQueryJob:
-    def __init__(self, df):
+    def __init__(self, df, cache_hit=False):
         self._df = df
+        self.cache_hit = cache_hit
+        self.total_bytes_processed = 0 if cache_hit else 1024
+        self.referenced_tables = [DummyTableRef("my_table")]
+        self.started = None
 
-    def result(self):
-        return DummyResult(self._df)
+    def result(self, page_size=None):
+        return DummyResult(self._df, page_size)
 
 class DummyClient:
     def __init__(self, project):
         # Assert that the correct project is passed in
         assert project == settings.GCP_PROJECT
 
-    def query(self, sql: str):
+    def query(self, sql: str, job_config=None):
+        # Results must be allowed to come from BigQuery's cache
+        assert job_config.use_query_cache is True
         # Simulate an error when SQL is exactly "RAISE"
         if sql == "RAISE":
             raise Exception("Simulated BigQuery failure")
-        # Otherwise return a small dummy DataFrame
+        # Return a wide dummy DataFrame for "WIDE", else a small one
+        if sql == "WIDE":
+            df = pd.DataFrame({f"c{i}": list(range(5)) for i in range(4)})
+            return DummyQueryJob(df)
         df = pd.DataFrame({"col1": [10, 20], "col2": ["a", "b"]})
-        return DummyQueryJob(df)
+        return DummyQueryJob(df, cache_hit=sql == "CACHED")
 
 # --- Fixture to patch out the real BigQuery Client ---
 
@@ -40,7 +73,11 @@ def patch_bigquery_client(monkeypatch):
     Monkey-patch google.cloud.bigquery.Client to return our DummyClient.
     """
     import google.cloud.bigquery as bq_mod
+    import src.execution.bigquery_client as bq_client
     monkeypatch.setattr(bq_mod, "Client", lambda project: DummyClient(project))
+    # Drop any shared client so the dummy is picked up
+    monkeypatch.setattr(bq_client, "_client", None)
+    monkeypatch.setattr(bq_client, "_stats", {"queries": 0, "cache_hits": 0, "bytes_processed": 0})
 
 # --- Tests ---
 
@@ -57,4 +94,49 @@ def test_run_query_failure():
     with pytest.raises(RuntimeError) as excinfo:
         run_query("RAISE")
     # The wrapper should catch the Exception and raise RuntimeError
-    assert "Error executing query" in str(excinfo.value)
\ No newline at end of file
+    assert "Error executing query" in str(excinfo.value)
+
+def test_run_query_within_budget():
+    df = run_query("SELECT * FROM my_table")
+    assert df.attrs["truncation"]["truncated"] is False
+    assert df.attrs["truncation"]["returned_rows"] == 2
+
+def test_run_query_row_and_column_budget(monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_PAGE_SIZE", 2)
+    df = run_query("WIDE", max_rows=3, max_columns=2)
+    assert list(df.columns) == ["c0", "c1"]
+    assert df["c0"].tolist() == [0, 1, 2]
+    info = df.attrs["truncation"]
+    assert info["truncated"] is True
+    assert info["truncated_by"] == ["max_columns", "max_rows"]
+    assert info["total_rows"] == 5
+    assert info["total_columns"] == 4
+
+def test_run_query_byte_budget():
+    # Each row of four ints is estimated at 32 bytes
+    df = run_query("WIDE", max_bytes=70)
+    assert len(df) == 2
+    assert df.attrs["truncation"]["truncated_by"] == ["max_bytes"]
+
+def test_run_query_progress_callback(monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_PAGE_SIZE", 2)
+    calls = []
+    run_query("WIDE", progress_callback=lambda read, total: calls.append((read, total)))
+    assert calls == [(2, 5), (4, 5), (5, 5)]
+
+def test_run_query_unbudgeted_uses_to_dataframe():
+    df = run_query("SELECT * FROM my_table", max_rows=0, max_bytes=0, max_columns=0)
+    assert "truncation" not in df.attrs
+
+def test_run_query_reports_bigquery_cache_hits():
+    import src.execution.bigquery_client as bq_client
+    df = run_query("SELECT * FROM my_table")
+    assert df.attrs["query_stats"]["cache_hit"] is False
+    assert df.attrs["query_stats"]["referenced_tables"] == ["proj.ds.my_table"]
+    assert run_query("CACHED").attrs["query_stats"]["cache_hit"] is True
+
+    stats = bq_client.query_stats()
+    assert stats["queries"] == 2
+    assert stats["cache_hits"] == 1
+    assert stats["cache_hit_rate"] == 0.5
+    assert stats["bytes_processed"] == 1024
@@ -0,0 +1,151 @@
+import os
+import json
+import pytest
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+
+import src.embeddings.pool as pool
+from src.config import settings
+from src.ingestion import pipeline
+from src.rag.join_graph import load_join_graph
+from src.store.numpy_store import NumpyVectorStore
+
+# --- Dummy BigQuery client ---
+
+class DummyField:
+    def __init__(self, name, field_type="STRING"):
+        self.name = name
+        self.field_type = field_type
+
+class DummyTable:
+    def __init__(self, table_id, schema=None):
+        self.table_id = table_id
+        self.schema = schema
+
+class DummyClient:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def list_tables(self, dataset_id):
+        return [DummyTable(t) for t in self.tables]
+
+    def get_table(self, ref):
+        table = ref.split(".")[-1]
+        if table not in self.tables:
+            raise NotFound(f"Table {ref} not found")
+        if isinstance(self.tables[table], Exception):
+            raise self.tables[table]
+        return DummyTable(table, [DummyField(c) for c in self.tables[table]])
+
+TABLES = {
+    "customers": ["customer_id", "name"],
+    "orders": ["order_id", "customer_id"],
+    "order_items": ["order_id", "product_id"],
+    "products": ["product_id", "title"],
+    "regions": ["region_code"],
+}
+
+@pytest.fixture
+def embed_calls(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_STORE_TYPE", "numpy")
+    monkeypatch.setattr(settings, "EMBED_WORKERS", 0)
+    calls = []
+    def fake_embed(texts):
+        calls.append(len(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+    monkeypatch.setattr(pool, "embed_texts", fake_embed)
+    return calls
+
+def test_ingestion_streams_batches(tmp_path, embed_calls):
+    vs_path = str(tmp_path / "vs")
+    report = pipeline.run_ingestion(DummyClient(TABLES), "ds", vs_path, batch_size=2)
+
+    assert embed_calls == [2, 2, 1]
+    assert report["embed"]["items"] == 5
+    assert report["index"]["items"] == 5
+    store = NumpyVectorStore(vs_path)
+    assert sorted(m["table"] for m in store.metadatas) == sorted(TABLES)
+    graph = load_join_graph(vs_path)
+    assert "order_items" in graph["edges"]["orders"]
+    # Checkpoint directory is removed after a successful run
+    assert not os.path.exists(f"{vs_path}_ingest")
+
+def test_interrupted_ingestion_resumes(tmp_path, embed_calls, monkeypatch):
+    vs_path = str(tmp_path / "vs")
+    original = pool.embed_texts
+    def failing_embed(texts):
+        if len(embed_calls) == 2:
+            raise RuntimeError("embedding backend down")
+        return original(texts)
+    monkeypatch.setattr(pool, "embed_texts", failing_embed)
+
+    with pytest.raises(RuntimeError):
+        pipeline.run_ingestion(DummyClient(TABLES), "ds", vs_path, batch_size=2)
+    checkpoint = f"{vs_path}_ingest"
+    assert sorted(os.listdir(checkpoint)) == [
+        "part-00000.json", "part-00000.npy", "part-00001.json", "part-00001.npy", "plan.json"
+    ]
+
+    monkeypatch.setattr(pool, "embed_texts", original)
+    pipeline.run_ingestion(DummyClient(TABLES), "ds", vs_path, batch_size=2)
+    # Only the last batch is embedded again
+    assert embed_calls == [2, 2, 1]
+    assert len(NumpyVectorStore(vs_path).texts) == 5
+
+def test_failed_table_fetch_fails_batch_and_resumes(tmp_path, embed_calls):
+    vs_path = str(tmp_path / "vs")
+    flaky = dict(TABLES, orders=ServiceUnavailable("backend error"))
+
+    with pytest.raises(RuntimeError, match="orders"):
+        pipeline.run_ingestion(DummyClient(flaky), "ds", vs_path, batch_size=2)
+    # The first batch is checkpointed; the batch holding orders is not
+    assert embed_calls == [2]
+    checkpoint = f"{vs_path}_ingest"
+    assert os.path.exists(os.path.join(checkpoint, "part-00000.json"))
+    assert not os.path.exists(os.path.join(checkpoint, "part-00001.json"))
+
+    pipeline.run_ingestion(DummyClient(TABLES), "ds", vs_path, batch_size=2)
+    assert embed_calls == [2, 2, 1]
+    assert len(NumpyVectorStore(vs_path).texts) == 5
+
+def test_dropped_table_is_skipped(tmp_path, embed_calls):
+    class DroppingClient(DummyClient):
+        def list_tables(self, dataset_id):
+            return super().list_tables(dataset_id) + [DummyTable("dropped")]
+
+    vs_path = str(tmp_path / "vs")
+    pipeline.run_ingestion(DroppingClient(TABLES), "ds", vs_path, batch_size=10)
+    assert len(NumpyVectorStore(vs_path).texts) == 5
+
+def test_changed_plan_starts_over(tmp_path, embed_calls):
+    checkpoint = str(tmp_path / "ckpt")
+    os.makedirs(checkpoint)
+    with open(os.path.join(checkpoint, "plan.json"), "w") as f:
+        json.dump({"dataset": "other"}, f)
+    open(os.path.join(checkpoint, "part-00000.json"), "w").close()
+
+    pipeline.run_ingestion(
+        DummyClient(TABLES), "ds", str(tmp_path / "vs"), batch_size=10, checkpoint_dir=checkpoint
+    )
+    assert embed_calls == [5]
+
+def test_empty_dataset_raises(tmp_path, embed_calls):
+    with pytest.raises(RuntimeError):
+        pipeline.run_ingestion(DummyClient({}), "ds", str(tmp_path / "vs"))
+
+def test_summary_tables_are_annotated_and_registered(tmp_path, embed_calls):
+    from src.rag.summary_tables import load_summary_tables
+    vs_path = str(tmp_path / "vs")
+    tables = dict(TABLES, agg_orders_by_customer_id=["customer_id", "row_count"])
+    summaries = [
+        {"name": "agg_orders_by_customer_id", "table": "ds.orders", "dimensions": ["customer_id"],
+         "rollups": {"COUNT(*)": "SUM(row_count)"}},
+        {"name": "agg_missing", "table": "ds.orders", "dimensions": [], "rollups": {}},
+    ]
+    pipeline.run_ingestion(DummyClient(tables), "ds", vs_path, summaries=summaries)
+
+    store = NumpyVectorStore(vs_path)
+    text = store.texts[[m["table"] for m in store.metadatas].index("agg_orders_by_customer_id")]
+    assert "Summary of ds.orders, pre-aggregated by customer_id." in text
+    assert "COUNT(*) -> SUM(row_count)" in text
+    registry = load_summary_tables(vs_path)
+    assert registry["by_source"] == {"orders": ["agg_orders_by_customer_id"]}
@@ -0,0 +1,79 @@
+import pytest
+import pandas as pd
+import src.execution.jobs as jobs
+from src.cache import redis_cache
+from src.config import settings
+
+# --- Dummy executor that runs jobs inline ---
+
+class InlineExecutor:
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+@pytest.fixture(autouse=True)
+def inline_jobs(monkeypatch):
+    # Force the in-process store and run jobs synchronously
+    monkeypatch.setattr(redis_cache, "_redis_client", None)
+    monkeypatch.setattr(redis_cache, "_client_initialized", True)
+    monkeypatch.setattr(jobs, "_get_executor", lambda: InlineExecutor())
+    monkeypatch.setattr(jobs, "_local_store", {})
+    monkeypatch.setattr(settings, "JOB_PAGE_SIZE", 2)
+    yield
+
+# --- Tests ---
+
+def test_job_success_paged(monkeypatch):
+    df = pd.DataFrame({"n": [1, 2, 3]})
+    monkeypatch.setattr(jobs, "run_query", lambda sql, **kwargs: df)
+
+    job_id = jobs.submit_job("SELECT n FROM t LIMIT 3")
+    job = jobs.get_job(job_id)
+
+    assert job["status"] == jobs.JOB_DONE
+    assert job["progress"] == 1.0
+    assert job["total_rows"] == 3
+    assert job["num_pages"] == 2
+    assert jobs.get_job_page(job_id, 0) == [{"n": 1}, {"n": 2}]
+    assert jobs.get_job_page(job_id, 1) == [{"n": 3}]
+    assert jobs.get_job_page(job_id, 2) == []
+
+def test_job_failure(monkeypatch):
+    def boom(sql, **kwargs):
+        raise RuntimeError("Error executing query: boom")
+    monkeypatch.setattr(jobs, "run_query", boom)
+
+    job_id = jobs.submit_job("SELECT 1 LIMIT 1")
+    job = jobs.get_job(job_id)
+
+    assert job["status"] == jobs.JOB_FAILED
+    assert "boom" in job["error"]
+
+def test_unknown_job():
+    assert jobs.get_job("missing") is None
+
+def test_job_keeps_its_store_when_redis_availability_changes(monkeypatch):
+    df = pd.DataFrame({"n": [1, 2, 3]})
+    monkeypatch.setattr(jobs, "run_query", lambda sql, **kwargs: df)
+
+    # Submitted while Redis is down: found locally after Redis comes back
+    job_id = jobs.submit_job("SELECT n FROM t LIMIT 3")
+    assert job_id.startswith(jobs.LOCAL_JOB_PREFIX)
+    redis = {}
+    monkeypatch.setattr(redis_cache, "is_available", lambda: True)
+    monkeypatch.setattr(redis_cache, "get_cache", redis.get)
+    assert jobs.get_job(job_id)["status"] == jobs.JOB_DONE
+
+    # Submitted to Redis; later writes are dropped (breaker half-open)
+    def set_cache(key, value, ttl=None):
+        if key.endswith("::page::0") or redis:
+            return False
+        redis[key] = value
+        return True
+    monkeypatch.setattr(redis_cache, "set_cache", set_cache)
+    job_id = jobs.submit_job("SELECT n FROM t LIMIT 3")
+    assert not job_id.startswith(jobs.LOCAL_JOB_PREFIX)
+    assert redis[f"job::{job_id}"]["status"] == jobs.JOB_PENDING
+    job = jobs.get_job(job_id)
+    assert job["status"] == jobs.JOB_DONE and job["sql"] == "SELECT n FROM t LIMIT 3"
+    assert jobs.get_job_page(job_id, 0) == [{"n": 1}, {"n": 2}]
+    assert jobs._running == {}
@@ -0,0 +1,38 @@
+from src.rag.join_graph import build_join_graph, connector_tables, shortest_path
+
+COLUMNS = {
+    "customers": ["id", "name"],
+    "orders": ["order_id", "customer_id"],
+    "order_items": ["order_id", "sku_code"],
+    "skus": ["sku_code", "price"],
+    "audit": ["id", "created_at"],
+}
+
+def test_edges_from_heuristics():
+    edges = build_join_graph(COLUMNS)["edges"]
+    # name heuristic: orders.customer_id -> customers.id
+    assert edges["orders"]["customers"] == ["orders.customer_id = customers.id"]
+    # shared key-like column
+    assert "order_items" in edges["orders"]
+    assert "skus" in edges["order_items"]
+    # generic "id" columns alone do not create edges
+    assert "audit" not in edges
+
+def test_edges_from_constraints():
+    constraints = [
+        {"constraint_type": "FOREIGN KEY", "table_name": "audit", "column_name": "id",
+         "ref_table": "customers", "ref_column": "id"},
+        {"constraint_type": "PRIMARY KEY", "table_name": "skus", "column_name": "sku_code",
+         "ref_table": "skus", "ref_column": "sku_code"},
+    ]
+    edges = build_join_graph(COLUMNS, constraints)["edges"]
+    assert edges["audit"]["customers"] == ["audit.id = customers.id"]
+
+def test_connectors_on_shortest_paths():
+    graph = build_join_graph(COLUMNS)
+    assert shortest_path(graph, "customers", "skus", max_hops=3) == [
+        "customers", "orders", "order_items", "skus"
+    ]
+    assert shortest_path(graph, "customers", "skus", max_hops=2) is None
+    assert connector_tables(graph, ["customers", "skus"], max_hops=3) == ["orders", "order_items"]
+    assert connector_tables(graph, ["customers", "orders"], max_hops=3) == []
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+pytest.importorskip("pyinstrument")
+
+from src.api import profiling
+from src.config import settings
+
+def busy_work():
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 0)
+    monkeypatch.setattr(profiling, "_request_count", 0)
+    monkeypatch.setattr(profiling, "_aggregate", None)
+    monkeypatch.setattr(profiling, "_aggregate_samples", 0)
+
+    app = FastAPI()
+    app.middleware("http")(profiling.profiling_middleware)
+
+    @app.post("/query/")
+    async def query():
+        busy_work()
+        return {"ok": True}
+
+    return TestClient(app)
+
+def test_unprofiled_request_passes_through(client):
+    response = client.post("/query/")
+    assert response.status_code == 200
+    assert profiling.PROFILE_ID_HEADER not in response.headers
+
+def test_profile_requires_admin_token(client):
+    response = client.post("/query/", headers={"X-Profile": "speedscope"})
+    assert response.status_code == 403
+    response = client.post("/query/?profile=html", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+
+def test_on_demand_profile_is_stored(client):
+    response = client.post(
+        "/query/", headers={"X-Profile": "speedscope", "X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    path = profiling.profile_path(response.headers[profiling.PROFILE_ID_HEADER])
+    with open(path) as f:
+        profile = json.load(f)
+    frames = [frame["name"] for frame in profile["shared"]["frames"]]
+    assert "busy_work" in frames
+
+def test_sampled_profiles_are_aggregated(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 2)
+    monkeypatch.setattr(settings, "PROFILE_FLUSH_EVERY", 2)
+    for _ in range(4):
+        assert client.post("/query/").status_code == 200
+    # Requests 2 and 4 were sampled and flushed together
+    files = os.listdir(settings.PROFILE_DIR)
+    assert len(files) == 1
+    assert files[0].startswith("sampled-") and "2req" in files[0]
+    assert profiling.flush_sampled() is None
+
+def test_profile_dir_keeps_newest_files(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 2)
+    headers = {"X-Profile": "speedscope", "X-Admin-Token": "secret"}
+    ids = [client.post("/query/", headers=headers).headers[profiling.PROFILE_ID_HEADER] for _ in range(3)]
+    assert len(os.listdir(settings.PROFILE_DIR)) == 2
+    assert profiling.profile_path(ids[-1]) is not None
+
+def test_profile_path_rejects_traversal(client):
+    assert profiling.profile_path("../etc/passwd") is None
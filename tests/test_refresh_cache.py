@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+import refresh_cache  # noqa: E402
+
+from src.config import settings
+from src.cache.redis_cache import table_tag_key
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def unlink(self, *keys):
+        self.commands.append(keys)
+
+    def execute(self):
+        self.client.round_trips += 1
+        results = [self.client.unlink(*keys) for keys in self.commands]
+        self.commands = []
+        return results
+
+class FakeRedis:
+    def __init__(self, data=None, sets=None):
+        self.data = dict(data or {})
+        self.sets = {k: set(v) for k, v in (sets or {}).items()}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def unlink(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += int(self.data.pop(key, None) is not None or self.sets.pop(key, None) is not None)
+        return removed
+
+    def scard(self, key):
+        return len(self.sets.get(key, ()))
+
+    def sscan_iter(self, key, count=None):
+        return iter(list(self.sets.get(key, ())))
+
+@pytest.fixture(autouse=True)
+def default_dataset(monkeypatch):
+    monkeypatch.setattr(settings, "BIGQUERY_DATASET", "ds1")
+
+def test_unlink_in_batches():
+    client = FakeRedis({f"query::{i}": 1 for i in range(7)})
+    removed = refresh_cache.unlink_in_batches(client, [f"query::{i}" for i in range(8)], batch_size=3)
+    assert removed == 7
+    assert client.round_trips == 3
+    assert client.data == {}
+
+def test_table_tags_are_dataset_qualified():
+    assert table_tag_key("orders") == table_tag_key("`proj.ds1.Orders`") == "tables::ds1.orders"
+    assert table_tag_key("ds2.orders") == "tables::ds2.orders"
+
+def test_purge_tables_only_touches_that_dataset():
+    client = FakeRedis(
+        {"query::a": 1, "query::b": 1, "query::c": 1},
+        {"tables::ds1.orders": {"query::a", "query::b"}, "tables::ds2.orders": {"query::c"}},
+    )
+    assert refresh_cache.purge_tables(client, ["orders"], 100, 10, dry_run=True) == 2
+    assert refresh_cache.purge_tables(client, ["ds1.orders"], 100, 10, dry_run=False) == 2
+    assert client.data == {"query::c": 1}
+    assert "tables::ds1.orders" not in client.sets
+    assert client.sets["tables::ds2.orders"] == {"query::c"}
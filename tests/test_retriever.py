@@ -26,6 +26,8 @@ def reset_env_and_settings(monkeypatch):
     settings.TOP_K = 3
     # Patch embed_texts in retriever to avoid real embedding calls
     monkeypatch.setattr(retriever, "embed_texts", lambda texts: [[0.0]] * len(texts))
+    # Each test installs its own dummy store
+    retriever.clear_store_cache()
     yield
 
 def test_retrieve_normal(monkeypatch):
@@ -60,4 +62,72 @@ def test_retrieve_fallback(monkeypatch):
     result = retriever.retrieve_schema_docs("any question")
 
     # Assert: fallback returns last TOP_K docs
-    assert result == docs[-3:]
\ No newline at end of file
+    assert result == docs[-3:]
+
+def test_store_reloads_when_index_is_overwritten_in_place(monkeypatch, tmp_path):
+    index = tmp_path / "index.faiss"
+    index.write_bytes(b"v1")
+    loads = []
+    def load_local(path, embedding_function):
+        loads.append(index.read_bytes())
+        return DummyStore([])
+    monkeypatch.setattr(FAISS, "load_local", staticmethod(load_local))
+
+    retriever.load_store(str(tmp_path))
+    retriever.load_store(str(tmp_path))
+    assert loads == [b"v1"]
+
+    # Rewrite the file in place, keeping the directory's mtime
+    dir_mtime = os.stat(tmp_path).st_mtime_ns
+    with open(index, "wb") as f:
+        f.write(b"v2-larger")
+    os.utime(tmp_path, ns=(dir_mtime, dir_mtime))
+    retriever.load_store(str(tmp_path))
+    assert loads == [b"v1", b"v2-larger"]
+
+def test_retrieve_adds_connector_tables(monkeypatch, tmp_path):
+    from src.rag.join_graph import build_join_graph, save_join_graph
+
+    # orders and products only connect through order_items
+    graph = build_join_graph(
+        {
+            "orders": ["order_id", "customer_id"],
+            "order_items": ["order_id", "product_id"],
+            "products": ["id", "name"],
+        },
+        docs={"order_items": "Table: order_items"}
+    )
+    save_join_graph(graph, str(tmp_path))
+    monkeypatch.setenv("VECTORSTORE_PATH", str(tmp_path))
+
+    docs = [
+        Document(page_content="Table: orders", metadata={"table": "orders"}),
+        Document(page_content="Table: products", metadata={"table": "products"}),
+    ]
+    monkeypatch.setattr(FAISS, "load_local", staticmethod(lambda path, embedding_function: DummyStore(docs)))
+
+    result = retriever.retrieve_schema_docs("revenue per product", top_k=2)
+    assert [d.metadata["table"] for d in result] == ["orders", "products", "order_items"]
+    assert result[-1].metadata["connector"] is True
+
+    # A zero budget disables expansion
+    monkeypatch.setattr(settings, "JOIN_TOKEN_BUDGET", 0)
+    assert retriever.retrieve_schema_docs("revenue per product", top_k=2) == docs
+
+def test_retrieve_from_dataset_shard(monkeypatch, tmp_path):
+    import numpy as np
+    from src.store.numpy_store import NumpyVectorStore
+    from src.store import vector_store
+    monkeypatch.setattr(settings, "VECTOR_STORE_TYPE", "numpy")
+    monkeypatch.setattr(settings, "JOIN_EXPANSION", True)
+    for name in ["sales", "hr"]:
+        docs = [Document(page_content=f"{name} table", metadata={"table": f"{name}_t"})]
+        NumpyVectorStore(str(tmp_path / "shards" / name)).add(docs, embeddings=np.ones((1, 2)))
+    monkeypatch.setenv("VECTORSTORE_PATH", str(tmp_path))
+    monkeypatch.setattr(vector_store, "embed_texts", lambda texts: [[1.0, 1.0]] * len(texts))
+
+    docs = retriever.retrieve_schema_docs("anything", dataset="hr")
+    assert [d.page_content for d in docs] == ["hr table"]
+    assert docs[0].metadata["shard"] == "hr"
+    with pytest.raises(KeyError):
+        retriever.retrieve_schema_docs("anything", dataset="nope")
@@ -0,0 +1,28 @@
+import decimal
+import json
+import numpy as np
+import pandas as pd
+from src.utils.serialization import dataframe_to_records, dumps, loads
+
+def test_dataframe_to_records_types():
+    df = pd.DataFrame({
+        "ts": pd.to_datetime(["2024-01-01 10:00:00", None]),
+        "num": [1.5, np.nan],
+        "cnt": [1, 2],
+        "dec": [decimal.Decimal("1.25"), None],
+        "name": ["a", None],
+    })
+    records = dataframe_to_records(df)
+    assert records[0]["ts"] == "2024-01-01T10:00:00.000000"
+    assert records[0]["cnt"] == 1
+    assert records[1] == {"ts": None, "num": None, "cnt": 2, "dec": None, "name": None}
+
+def test_dumps_roundtrip():
+    df = pd.DataFrame({"dec": [decimal.Decimal("1.25")], "n": [np.int64(3)]})
+    payload = {"sql": "SELECT 1", "data": dataframe_to_records(df)}
+    raw = dumps(payload)
+    assert json.loads(raw) == {"sql": "SELECT 1", "data": [{"dec": 1.25, "n": 3}]}
+    assert loads(raw) == json.loads(raw)
+
+def test_empty_dataframe():
+    assert dataframe_to_records(pd.DataFrame({"a": []})) == []
@@ -0,0 +1,31 @@
+from src.utils.sql_parsing import extract_tables, extract_table_refs, qualify_table_name
+
+def test_extract_tables_excludes_ctes():
+    sql = (
+        "WITH recent AS (SELECT * FROM ds.orders WHERE d > '2024-01-01'), "
+        "totals AS (SELECT customer_id, COUNT(*) n FROM recent GROUP BY 1) "
+        "SELECT * FROM totals JOIN ds.customers c USING (customer_id) LIMIT 10"
+    )
+    assert extract_tables(sql) == ["orders", "customers"]
+
+def test_qualified_table_named_like_a_cte_is_kept():
+    sql = (
+        "WITH orders AS (SELECT * FROM ds.orders WHERE status = 'done') "
+        "SELECT COUNT(*) FROM orders JOIN `proj.ds.orders` o2 USING (id) LIMIT 1"
+    )
+    assert extract_table_refs(sql) == ["ds.orders", "proj.ds.orders"]
+
+def test_extract_tables_handles_quoted_and_qualified_names():
+    sql = (
+        "SELECT EXTRACT(YEAR FROM o.d), 'FROM fake' FROM `proj.ds.Orders` o "
+        "JOIN ds.customers c ON o.cid = c.id, UNNEST(o.items) -- FROM commented\n"
+        "JOIN items ON TRUE LIMIT 5"
+    )
+    assert extract_table_refs(sql) == ["proj.ds.Orders", "ds.customers", "items"]
+    assert extract_tables(sql) == ["orders", "customers", "items"]
+
+def test_qualify_table_name():
+    assert qualify_table_name("`proj.ds.Orders`") == "ds.orders"
+    assert qualify_table_name("ds.orders", "other") == "ds.orders"
+    assert qualify_table_name("orders", "Sales") == "sales.orders"
+    assert qualify_table_name("orders") == "orders"
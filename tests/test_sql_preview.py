@@ -0,0 +1,119 @@
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import routes
+from src.utils.sql_preview import to_preview_sql
+from src.utils.validation import validate_sql
+
+SQL = (
+    "SELECT c.country, COUNT(*) AS n, COUNT(DISTINCT o.user_id) AS users, AVG(o.amount) AS avg_amount "
+    "FROM `proj.ds.orders` AS o JOIN ds.customers c ON o.customer_id = c.id "
+    "WHERE o.note != 'from x' GROUP BY c.country LIMIT 100"
+)
+
+def test_preview_samples_from_table_and_approximates_aggregates():
+    preview_sql, info = to_preview_sql(SQL, percent=10)
+    assert "FROM `proj.ds.orders` AS o TABLESAMPLE SYSTEM (10 PERCENT) JOIN ds.customers c ON" in preview_sql
+    assert "CAST(ROUND(COUNT(*) * 10) AS INT64) AS n" in preview_sql
+    assert "APPROX_COUNT_DISTINCT(o.user_id) AS users" in preview_sql
+    assert "AVG(o.amount)" in preview_sql and "'from x'" in preview_sql
+    assert info["sampled_tables"] == ["orders"]
+    assert info["approximate"] and info["scaled_aggregates"] == 1 and info["approx_distinct"] == 1
+    assert validate_sql(preview_sql) == (True, None)
+
+def test_preview_leaves_window_aggregates_and_table_functions_alone():
+    sql = "SELECT a, SUM(x) OVER (PARTITION BY a) FROM t, UNNEST(arr) AS x LIMIT 5"
+    preview_sql, info = to_preview_sql(sql, percent=50)
+    assert preview_sql == "SELECT a, SUM(x) OVER (PARTITION BY a) FROM t TABLESAMPLE SYSTEM (50 PERCENT), UNNEST(arr) AS x LIMIT 5"
+    assert info["scaled_aggregates"] == 0
+
+@pytest.mark.parametrize("percent", [100, 0, -5])
+def test_full_or_invalid_sample_is_exact(percent):
+    preview_sql, info = to_preview_sql("SELECT COUNT(*) FROM t LIMIT 1", percent=percent)
+    assert preview_sql == "SELECT COUNT(*) FROM t LIMIT 1"
+    assert not info["approximate"]
+
+@pytest.mark.parametrize("value", ["0", "-1", "150"])
+def test_sample_percent_setting_is_validated(monkeypatch, value):
+    from src.config import Settings
+    monkeypatch.setenv("PREVIEW_SAMPLE_PERCENT", value)
+    with pytest.raises(ValueError, match="PREVIEW_SAMPLE_PERCENT"):
+        Settings()
+
+def test_preview_never_samples_cte_names_or_filter_subqueries():
+    sql = (
+        "WITH vip AS (SELECT id FROM ds.customers WHERE tier = 'gold') "
+        "SELECT COUNT(*) AS n FROM ds.orders o JOIN vip ON o.customer_id = vip.id "
+        "WHERE o.item_id IN (SELECT id FROM ds.items WHERE active) LIMIT 1"
+    )
+    preview_sql, info = to_preview_sql(sql, percent=10)
+    # Sampling customers as well would thin the join twice
+    assert info["sampled_tables"] == ["orders"]
+    assert "FROM ds.orders o TABLESAMPLE SYSTEM (10 PERCENT) JOIN vip ON" in preview_sql
+    assert "FROM ds.customers WHERE" in preview_sql and "FROM ds.items WHERE" in preview_sql
+    assert preview_sql.count("TABLESAMPLE") == 1
+
+def test_preview_samples_qualified_table_named_like_a_cte():
+    sql = "WITH orders AS (SELECT 1 AS x) SELECT COUNT(*) AS n FROM ds.orders LIMIT 1"
+    preview_sql, info = to_preview_sql(sql, percent=10)
+    assert info["sampled_tables"] == ["orders"]
+    assert "FROM ds.orders TABLESAMPLE SYSTEM (10 PERCENT) LIMIT 1" in preview_sql
+
+def test_preview_samples_each_table_once():
+    sql = (
+        "SELECT 'a' AS k, COUNT(*) AS n FROM orders WHERE a "
+        "UNION ALL SELECT 'b' AS k, COUNT(*) AS n FROM orders WHERE b LIMIT 2"
+    )
+    preview_sql, info = to_preview_sql(sql, percent=10)
+    assert info["sampled_tables"] == ["orders"]
+    assert preview_sql == (
+        "SELECT 'a' AS k, CAST(ROUND(COUNT(*) * 10) AS INT64) AS n FROM orders TABLESAMPLE SYSTEM (10 PERCENT) WHERE a "
+        "UNION ALL SELECT 'b' AS k, COUNT(*) AS n FROM orders WHERE b LIMIT 2"
+    )
+
+@pytest.mark.parametrize("sql", [
+    # COUNT over a sampled subquery / CTE cannot be scaled
+    "SELECT COUNT(*) AS n FROM (SELECT user_id FROM orders GROUP BY user_id) LIMIT 1",
+    "WITH recent AS (SELECT * FROM orders WHERE d > '2024-01-01') SELECT SUM(amount) FROM recent LIMIT 1",
+])
+def test_unsafe_preview_is_left_exact(sql):
+    assert to_preview_sql(sql, percent=10) == (sql, {
+        "sample_percent": None, "sampled_tables": [], "scaled_aggregates": 0,
+        "approx_distinct": 0, "approximate": False,
+    })
+
+def test_preview_scales_only_the_sampling_select():
+    sql = "SELECT AVG(n) AS avg_n FROM (SELECT user_id, COUNT(*) AS n FROM orders GROUP BY user_id) LIMIT 1"
+    preview_sql, info = to_preview_sql(sql, percent=10)
+    assert preview_sql == (
+        "SELECT AVG(n) AS avg_n FROM (SELECT user_id, CAST(ROUND(COUNT(*) * 10) AS INT64) AS n "
+        "FROM orders TABLESAMPLE SYSTEM (10 PERCENT) GROUP BY user_id) LIMIT 1"
+    )
+    assert info["scaled_aggregates"] == 1
+
+def test_preview_then_promote_reuses_generated_sql(monkeypatch):
+    cache, generated, executed = {}, [], []
+    monkeypatch.setattr(routes, "get_query_result", cache.get)
+    monkeypatch.setattr(routes, "cache_query_result", lambda key, sql, data, truncation, query_stats=None, preview=None:
+                        cache.__setitem__(key, {"sql": sql, "data": data, "truncation": truncation, "preview": preview}))
+    monkeypatch.setattr(routes, "record_question", lambda *args: None)
+    monkeypatch.setattr(routes, "retrieve_schema_docs", lambda question, dataset=None: [])
+    monkeypatch.setattr(routes, "generate_sql", lambda docs, question: generated.append(question) or "SELECT COUNT(*) AS n FROM orders LIMIT 1")
+    monkeypatch.setattr(routes, "run_query", lambda sql: executed.append(sql) or pd.DataFrame({"n": [7]}))
+
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/query")
+    client = TestClient(app)
+
+    body = client.post("/query/", json={"question": "how many orders", "preview": True}).json()
+    assert body["approximate"]
+    assert "TABLESAMPLE SYSTEM" in body["sql"]
+    assert body["preview"]["exact_sql"] == "SELECT COUNT(*) AS n FROM orders LIMIT 1"
+
+    body = client.post("/query/", json={"question": "how many orders"}).json()
+    assert not body["approximate"]
+    assert body["sql"] == "SELECT COUNT(*) AS n FROM orders LIMIT 1"
+    assert generated == ["how many orders"]
+    assert executed[-1] == body["sql"]
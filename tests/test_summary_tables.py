@@ -0,0 +1,94 @@
+import json
+from langchain.schema import Document
+
+from src.config import settings
+from src.execution import query_log
+from src.rag.summary_tables import (
+    query_shape, propose_summary_tables, save_summary_tables, prioritize_summaries
+)
+
+def test_query_shape():
+    shape = query_shape(
+        "SELECT o.country, DATE_TRUNC(o.order_date, MONTH) AS month, AVG(o.amount) AS avg_amount, "
+        "COUNTIF(o.status = 'Done') FROM `proj.ds.orders` AS o "
+        "WHERE o.channel IN ('web', 'app') GROUP BY 1, month LIMIT 100"
+    )
+    assert shape == {
+        "table": "proj.ds.orders",
+        "dimensions": ["channel", "country", "date_trunc(order_date, month)"],
+        "measures": ["AVG(amount)", "COUNTIF(status = 'Done')"],
+    }
+
+def test_query_shape_skips_unsummarizable_queries():
+    assert query_shape("SELECT name FROM ds.customers LIMIT 10") is None
+    assert query_shape("SELECT COUNT(DISTINCT user_id) FROM ds.orders LIMIT 1") is None
+    assert query_shape("SELECT c.name, COUNT(*) FROM ds.orders o JOIN ds.customers c ON o.cid = c.id GROUP BY 1 LIMIT 5") is None
+
+def test_query_shape_only_promotes_equality_filters():
+    shape = query_shape(
+        "SELECT country, SUM(amount) FROM ds.orders WHERE (channel = 'web' OR channel = 'app') "
+        "AND refunded IS NULL AND country != 'XX' GROUP BY country LIMIT 10"
+    )
+    assert shape["dimensions"] == ["channel", "country", "refunded"]
+    # Range filters are fine on a GROUP BY column only
+    shape = query_shape(
+        "SELECT order_date, SUM(amount) FROM ds.orders "
+        "WHERE order_date BETWEEN '2024-01-01' AND '2024-02-01' GROUP BY order_date LIMIT 10"
+    )
+    assert shape["dimensions"] == ["order_date"]
+    assert query_shape("SELECT country, SUM(amount) FROM ds.orders WHERE amount > 100 GROUP BY 1 LIMIT 10") is None
+    assert query_shape("SELECT SUM(amount) FROM ds.orders WHERE DATE(created_at) >= '2024-01-01' LIMIT 1") is None
+    assert query_shape("SELECT SUM(amount) FROM ds.orders WHERE customer_id = 'c1' LIMIT 1") is None
+
+def test_query_shape_skips_preview_runs():
+    assert query_shape("SELECT SUM(amount) FROM ds.orders TABLESAMPLE SYSTEM (10 PERCENT) LIMIT 1") is None
+
+def test_proposals_fold_narrower_patterns():
+    entries = (
+        [{"sql": "SELECT country, status, SUM(amount) FROM ds.orders GROUP BY country, status LIMIT 10",
+          "bytes_processed": 100}] * 3
+        + [{"sql": "SELECT country, AVG(amount) FROM ds.orders WHERE country = 'NL' GROUP BY country LIMIT 10",
+            "bytes_processed": 100}] * 2
+        + [{"sql": "SELECT region, COUNT(*) FROM ds.stores GROUP BY region LIMIT 10", "bytes_processed": 5}]
+    )
+    proposals = propose_summary_tables(entries, min_queries=3)
+    assert len(proposals) == 1
+    p = proposals[0]
+    assert p["name"] == "agg_orders_by_country_status"
+    assert p["queries"] == 5 and p["bytes_processed"] == 500
+    assert p["rollups"] == {"AVG(amount)": "SUM(sum_amount) / SUM(count_amount)", "SUM(amount)": "SUM(sum_amount)"}
+    assert p["sql"] == (
+        "CREATE MATERIALIZED VIEW `ds.agg_orders_by_country_status` AS\n"
+        "SELECT\n  country,\n  status,\n  SUM(amount) AS sum_amount,\n  COUNT(amount) AS count_amount\n"
+        "FROM `ds.orders`\nGROUP BY 1, 2"
+    )
+
+def test_query_log_roundtrip_and_rotation(tmp_path, monkeypatch):
+    path = str(tmp_path / "queries.jsonl")
+    monkeypatch.setattr(settings, "QUERY_LOG_PATH", path)
+    monkeypatch.setattr(settings, "QUERY_LOG_MAX_BYTES", 1)
+    query_log.log_query("SELECT 1 LIMIT 1", 0.5, {"bytes_processed": 10}, rows=1)
+    query_log.log_query("SELECT 2 LIMIT 1", 0.25, None, rows=1)
+    entries = list(query_log.read_query_log())
+    assert [e["sql"] for e in entries] == ["SELECT 1 LIMIT 1", "SELECT 2 LIMIT 1"]
+    assert entries[0]["bytes_processed"] == 10 and entries[1]["seconds"] == 0.25
+
+def test_summaries_are_retrieved_first(tmp_path):
+    vs_path = str(tmp_path)
+    summary = {"name": "agg_orders_by_country", "table": "ds.orders"}
+    save_summary_tables([summary], {"agg_orders_by_country": "Table: agg_orders_by_country"}, vs_path)
+    docs = [Document(page_content="Table: customers", metadata={"table": "customers"}),
+            Document(page_content="Table: orders", metadata={"table": "orders"})]
+    result = prioritize_summaries(docs, vs_path)
+    assert [d.metadata["table"] for d in result] == ["agg_orders_by_country", "customers", "orders"]
+    assert result[0].metadata["summary_of"] == "orders"
+    assert prioritize_summaries(docs[:1], vs_path) == docs[:1]
+
+def test_summaries_are_found_for_mixed_case_tables(tmp_path):
+    vs_path = str(tmp_path)
+    summary = {"name": "agg_orders_by_country", "table": "ds.Orders"}
+    save_summary_tables([summary], {"agg_orders_by_country": "Table: agg_orders_by_country"}, vs_path)
+    docs = [Document(page_content="Table: Orders", metadata={"table": "Orders"})]
+    result = prioritize_summaries(docs, vs_path)
+    assert [d.metadata["table"] for d in result] == ["agg_orders_by_country", "Orders"]
+    assert result[0].metadata["summary_of"] == "Orders"
@@ -0,0 +1,138 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+
+from src.store.numpy_store import NumpyVectorStore
+
+
+@pytest.fixture
+def docs():
+    return [Document(page_content=f"doc{i}", metadata={"table": f"t{i}"}) for i in range(4)]
+
+
+@pytest.fixture
+def vectors():
+    # One axis per doc, so doc i is the exact match for unit vector i
+    return np.eye(4, dtype=np.float32) * 3.0
+
+
+def test_add_and_load_roundtrip(tmp_path, docs, vectors):
+    store = NumpyVectorStore(str(tmp_path), dtype="float32")
+    store.add(docs, embeddings=vectors)
+
+    reloaded = NumpyVectorStore(str(tmp_path), dtype="float32")
+    assert reloaded.texts == [d.page_content for d in docs]
+    assert reloaded.metadatas[2] == {"table": "t2"}
+    # Rows are stored L2-normalized
+    assert np.allclose(np.linalg.norm(reloaded.matrix, axis=1), 1.0)
+
+
+def test_search_orders_by_similarity(tmp_path, docs, vectors):
+    store = NumpyVectorStore(str(tmp_path))
+    store.add(docs, embeddings=vectors)
+
+    hits = store.search_by_vectors([[0.1, 0.0, 1.0, 0.5]], k=3)[0]
+    assert [i for i, _ in hits] == [2, 3, 0]
+    assert hits[0][1] > hits[1][1] > hits[2][1]
+
+    results = store.similarity_search_by_vector([0.0, 1.0, 0.0, 0.0], k=10)
+    assert len(results) == 4
+    assert results[0].page_content == "doc1"
+    assert results[0].metadata == {"table": "t1"}
+
+
+def test_query_and_query_batch_use_embedding_fn(tmp_path, docs, vectors):
+    store = NumpyVectorStore(str(tmp_path))
+    store.add(docs, embeddings=vectors)
+    store.embedding_fn = lambda texts: [vectors[int(t[-1])] for t in texts]
+
+    assert store.query("q3", k=1)[0].page_content == "doc3"
+    batch = store.query_batch(["q0", "q2"], k=2)
+    assert [r[0].page_content for r in batch] == ["doc0", "doc2"]
+    assert all(len(r) == 2 for r in batch)
+
+
+def test_float16_matrix(tmp_path, docs, vectors):
+    store = NumpyVectorStore(str(tmp_path), dtype="float16")
+    store.add(docs, embeddings=vectors)
+    assert store.matrix.dtype == np.float16
+    assert store.similarity_search_by_vector([0, 0, 0, 1], k=1)[0].page_content == "doc3"
+
+
+def test_search_before_add_raises(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "missing"))
+    with pytest.raises(RuntimeError):
+        store.search_by_vectors([[1.0]], k=1)
+
+
+# --- Sharded LocalVectorStore ---
+
+def _make_shard(root, name, axis):
+    # Every doc of a shard points along one axis, so the router can tell shards apart
+    docs = [Document(page_content=f"{name}{i}", metadata={"table": f"{name}{i}"}) for i in range(3)]
+    vectors = np.zeros((3, 4), dtype=np.float32)
+    vectors[:, axis] = 1.0
+    vectors[:, 3] = [0.1, 0.2, 0.3]
+    NumpyVectorStore(str(root / "shards" / name)).add(docs, embeddings=vectors)
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    from src.config import settings
+    from src.store.vector_store import LocalVectorStore
+    monkeypatch.setattr(settings, "VECTOR_STORE_TYPE", "numpy")
+    monkeypatch.setattr(settings, "SHARD_ROUTER_TOP", 1)
+    for axis, name in enumerate(["sales", "hr", "ops"]):
+        _make_shard(tmp_path, name, axis)
+    store = LocalVectorStore(str(tmp_path))
+    store.build_router()
+    query_vectors = {"revenue": [1.0, 0, 0, 0.3], "salaries": [0, 1.0, 0, 0.3]}
+    store.embedding_fn = lambda texts: [query_vectors[t] for t in texts]
+    return store
+
+def test_router_picks_shard(sharded):
+    assert sharded.is_sharded
+    assert sharded.shard_names() == ["hr", "ops", "sales"]
+
+    docs = sharded.query("revenue", k=2)
+    assert [d.metadata["shard"] for d in docs] == ["sales", "sales"]
+    assert docs[0].page_content == "sales2"
+    # Only the routed shard was loaded
+    assert sharded.loaded_shards() == ["sales"]
+
+def test_explicit_shard_skips_router(sharded):
+    docs = sharded.query("revenue", k=1, shard="hr")
+    assert docs[0].metadata["shard"] == "hr"
+    with pytest.raises(KeyError):
+        sharded.query("revenue", shard="missing")
+
+def test_chroma_cannot_be_sharded(sharded):
+    sharded.store_type = "chroma"
+    with pytest.raises(RuntimeError, match="chroma"):
+        sharded.build_router()
+    with pytest.raises(RuntimeError, match="chroma"):
+        sharded.query("revenue", shard="hr")
+
+def test_router_skips_deleted_shards(sharded):
+    import shutil
+    shutil.rmtree(sharded.shard_path("sales"))
+    # The router still picks sales; the remaining shards are searched instead
+    docs = sharded.query("revenue", k=1)
+    assert docs[0].metadata["shard"] in ("hr", "ops")
+
+@pytest.mark.parametrize("name", ["", "..", "../vs", "hr/../sales", "sales/x"])
+def test_shard_names_cannot_escape_the_store(sharded, name):
+    with pytest.raises(KeyError):
+        sharded.get_shard(name)
+    with pytest.raises(KeyError):
+        sharded.shard_path(name)
+
+def test_shards_are_evicted_lru(sharded, monkeypatch):
+    from src.config import settings
+    # Room for roughly two shards
+    one_shard = sum(f.stat().st_size for f in (Path(sharded.shard_path("hr"))).iterdir())
+    monkeypatch.setattr(settings, "SHARD_CACHE_MAX_BYTES", int(one_shard * 2.5))
+    for name in ["sales", "hr", "sales", "ops"]:
+        sharded.get_shard(name)
+    assert sharded.loaded_shards() == ["sales", "ops"]